@@ -0,0 +1,499 @@
+"""Microbenchmarks for the pipeline hot paths.
+
+Run them from the repository root (or anywhere datapipelines is importable):
+
+    python benchmarks/bench_pipelines.py --output results.json
+
+The results are printed as a table and written as JSON, which a later run can be compared against with `--compare results.json`. Use `--filter`
+to run only the benchmarks whose names contain any of the given strings.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from threading import Barrier
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Type, TypeVar
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datapipelines import DataPipeline, DataSource, DataSink, DataTransformer, CompositeDataSource, PipelineContext, NotFoundError, Query, PipelineMetrics  # noqa: E402
+
+T = TypeVar("T")
+F = TypeVar("F")
+
+ID_KEY = "id"
+IDS_KEY = "ids"
+BATCH_SIZE = 1000
+THREADS = 8
+CHAIN_LENGTHS = (1, 2, 4, 8)
+
+
+##############################
+# Synthetic pipeline elements #
+##############################
+
+
+class Record(object):
+    __slots__ = ("id",)
+
+    def __init__(self, id: int) -> None:
+        self.id = id
+
+
+def _stage(index: int) -> Type:
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    return type("Stage{index}".format(index=index), (object,), {"__slots__": ("value",), "__init__": __init__})
+
+
+STAGES = [_stage(index) for index in range(max(CHAIN_LENGTHS) + 1)]
+
+
+class RecordSource(DataSource):
+    """Provides Records and Stage0s for any id, either all at once or lazily."""
+
+    def __init__(self, lazy: bool = False) -> None:
+        self._lazy = lazy
+
+    def combine(self, type: Type[T], queries: List[Mapping[str, Any]]) -> Mapping[str, Any]:
+        return {IDS_KEY: [query[ID_KEY] for query in queries]}
+
+    @DataSource.dispatch
+    def get(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+        pass
+
+    @DataSource.dispatch
+    def get_many(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[T]:
+        pass
+
+    @get.register(Record)
+    def get_record(self, query: Mapping[str, Any], context: PipelineContext = None) -> Record:
+        return Record(query[ID_KEY])
+
+    @get_many.register(Record)
+    def get_many_records(self, query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[Record]:
+        if self._lazy:
+            return (Record(id) for id in query[IDS_KEY])
+        return [Record(id) for id in query[IDS_KEY]]
+
+    @get.register(STAGES[0])
+    def get_stage(self, query: Mapping[str, Any], context: PipelineContext = None) -> Any:
+        return STAGES[0](query[ID_KEY])
+
+    @get_many.register(STAGES[0])
+    def get_many_stages(self, query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[Any]:
+        return [STAGES[0](id) for id in query[IDS_KEY]]
+
+
+class MissingSource(DataSource):
+    """Provides Records, but never finds any."""
+
+    @DataSource.dispatch
+    def get(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+        pass
+
+    @DataSource.dispatch
+    def get_many(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[T]:
+        pass
+
+    @get.register(Record)
+    def get_record(self, query: Mapping[str, Any], context: PipelineContext = None) -> Record:
+        raise NotFoundError()
+
+    @get_many.register(Record)
+    def get_many_records(self, query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[Record]:
+        raise NotFoundError()
+
+
+class ValidatedSource(RecordSource):
+    """A RecordSource which validates its queries like a real source would."""
+
+    VALIDATOR = Query.has(ID_KEY).as_(int).also.can_have("region").with_default("NA").also.can_have("version").as_(str)
+
+    @DataSource.dispatch
+    def get(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+        pass
+
+    @get.register(Record)
+    def get_record(self, query: Mapping[str, Any], context: PipelineContext = None) -> Record:
+        ValidatedSource.VALIDATOR(query, context)
+        return Record(query[ID_KEY])
+
+
+class NullSink(DataSink):
+    """Accepts Records and throws them away."""
+
+    @DataSink.dispatch
+    def put(self, type: Type[T], item: T, context: PipelineContext = None) -> None:
+        pass
+
+    @DataSink.dispatch
+    def put_many(self, type: Type[T], items: Iterable[T], context: PipelineContext = None) -> None:
+        pass
+
+    @put.register(Record)
+    def put_record(self, item: Record, context: PipelineContext = None) -> None:
+        pass
+
+    @put_many.register(Record)
+    def put_many_records(self, items: Iterable[Record], context: PipelineContext = None) -> None:
+        for _ in items:
+            pass
+
+
+class ChainTransformer(DataTransformer):
+    """Converts each StageN into a StageN+1."""
+
+    @DataTransformer.dispatch
+    def transform(self, target_type: Type[T], value: F, context: PipelineContext = None) -> T:
+        pass
+
+
+def _converter(to_type: Type) -> Callable[[Any, Any, PipelineContext], Any]:
+    def convert(self: ChainTransformer, value: Any, context: PipelineContext = None) -> Any:
+        return to_type(value.value)
+    return convert
+
+
+for _from_type, _to_type in zip(STAGES, STAGES[1:]):
+    ChainTransformer.transform.register(_from_type, _to_type)(_converter(_to_type))
+
+
+##############
+# Benchmarks #
+##############
+
+
+_BENCHMARKS = []  # type: List[Dict[str, Any]]
+
+
+def benchmark(name: str, items: int = 1) -> Callable[[Callable[[], Callable[[], Any]]], Callable[[], Callable[[], Any]]]:
+    """Registers a benchmark. The decorated function sets the benchmark up and returns the operation to be timed.
+
+    Args:
+        name: The benchmark's name.
+        items: The number of objects handled by one operation, used to report the time per object.
+    """
+    def decorator(setup: Callable[[], Callable[[], Any]]) -> Callable[[], Callable[[], Any]]:
+        _BENCHMARKS.append({"name": name, "items": items, "setup": setup})
+        return setup
+    return decorator
+
+
+@benchmark("get")
+def _get() -> Callable[[], Any]:
+    pipeline = DataPipeline([RecordSource()])
+    query = {ID_KEY: 1}
+    return lambda: pipeline.get(Record, query)
+
+
+@benchmark("get_traced")
+def _get_traced() -> Callable[[], Any]:
+    pipeline = DataPipeline([RecordSource()], subscribers=[lambda event: None])
+    query = {ID_KEY: 1}
+    return lambda: pipeline.get(Record, query)
+
+
+@benchmark("get_metrics")
+def _get_metrics() -> Callable[[], Any]:
+    pipeline = DataPipeline([RecordSource()], metrics=PipelineMetrics())
+    query = {ID_KEY: 1}
+    return lambda: pipeline.get(Record, query)
+
+
+@benchmark("get_sink")
+def _get_sink() -> Callable[[], Any]:
+    pipeline = DataPipeline([NullSink(), RecordSource()])
+    query = {ID_KEY: 1}
+    return lambda: pipeline.get(Record, query)
+
+
+@benchmark("get_fall_through")
+def _get_fall_through() -> Callable[[], Any]:
+    pipeline = DataPipeline([MissingSource(), MissingSource(), RecordSource()])
+    query = {ID_KEY: 1}
+    return lambda: pipeline.get(Record, query)
+
+
+@benchmark("get_validated")
+def _get_validated() -> Callable[[], Any]:
+    pipeline = DataPipeline([ValidatedSource()])
+    query = {ID_KEY: 1, "version": "1.0"}
+    return lambda: pipeline.get(Record, query)
+
+
+@benchmark("get_many", items=BATCH_SIZE)
+def _get_many() -> Callable[[], Any]:
+    pipeline = DataPipeline([NullSink(), RecordSource()])
+    query = {IDS_KEY: list(range(BATCH_SIZE))}
+    return lambda: pipeline.get_many(Record, query)
+
+
+@benchmark("get_many_streaming", items=BATCH_SIZE)
+def _get_many_streaming() -> Callable[[], Any]:
+    pipeline = DataPipeline([NullSink(), RecordSource(lazy=True)])
+    query = {IDS_KEY: list(range(BATCH_SIZE))}
+    return lambda: list(pipeline.get_many(Record, query, streaming=True))
+
+
+@benchmark("get_loop", items=BATCH_SIZE)
+def _get_loop() -> Callable[[], Any]:
+    pipeline = DataPipeline([NullSink(), RecordSource()])
+    queries = [{ID_KEY: id} for id in range(BATCH_SIZE)]
+    return lambda: [pipeline.get(Record, query) for query in queries]
+
+
+@benchmark("get_bulk", items=BATCH_SIZE)
+def _get_bulk() -> Callable[[], Any]:
+    pipeline = DataPipeline([NullSink(), RecordSource()])
+    queries = [{ID_KEY: id} for id in range(BATCH_SIZE)]
+    return lambda: pipeline.get_bulk(Record, queries)
+
+
+@benchmark("get_bulk_fall_through", items=BATCH_SIZE)
+def _get_bulk_fall_through() -> Callable[[], Any]:
+    pipeline = DataPipeline([MissingSource(), RecordSource()])
+    queries = [{ID_KEY: id} for id in range(BATCH_SIZE)]
+    return lambda: pipeline.get_bulk(Record, queries)
+
+
+@benchmark("put")
+def _put() -> Callable[[], Any]:
+    pipeline = DataPipeline([NullSink()])
+    record = Record(1)
+    return lambda: pipeline.put(Record, record)
+
+
+@benchmark("put_many", items=BATCH_SIZE)
+def _put_many() -> Callable[[], Any]:
+    pipeline = DataPipeline([NullSink()])
+    records = [Record(id) for id in range(BATCH_SIZE)]
+    return lambda: pipeline.put_many(Record, records)
+
+
+def _chain_benchmarks(length: int) -> None:
+    @benchmark("transform_chain_{length}".format(length=length))
+    def _chain() -> Callable[[], Any]:
+        pipeline = DataPipeline([RecordSource()], [ChainTransformer()])
+        query = {ID_KEY: 1}
+        return lambda: pipeline.get(STAGES[length], query)
+
+    @benchmark("transform_chain_{length}_many".format(length=length), items=BATCH_SIZE)
+    def _chain_many() -> Callable[[], Any]:
+        pipeline = DataPipeline([RecordSource()], [ChainTransformer()])
+        query = {IDS_KEY: list(range(BATCH_SIZE))}
+        return lambda: pipeline.get_many(STAGES[length], query)
+
+
+for _length in CHAIN_LENGTHS:
+    _chain_benchmarks(_length)
+
+
+@benchmark("composite_fall_through_1")
+def _composite_fall_through_1() -> Callable[[], Any]:
+    source = CompositeDataSource([MissingSource(), RecordSource()])
+    query = {ID_KEY: 1}
+    return lambda: source.get(Record, query)
+
+
+@benchmark("composite_fall_through_4")
+def _composite_fall_through_4() -> Callable[[], Any]:
+    source = CompositeDataSource([MissingSource() for _ in range(4)] + [RecordSource()])
+    query = {ID_KEY: 1}
+    return lambda: source.get(Record, query)
+
+
+@benchmark("query_validation")
+def _query_validation() -> Callable[[], Any]:
+    validator = ValidatedSource.VALIDATOR
+    query = {ID_KEY: 1, "version": "1.0"}
+    return lambda: validator(dict(query))
+
+
+def _validation_batch() -> List[Dict[str, Any]]:
+    # Three shapes, as a bulk endpoint would typically see
+    shapes = [{ID_KEY: 1}, {ID_KEY: 1, "version": "1.0"}, {ID_KEY: 1, "region": "EUW", "version": "1.0"}]
+    return [shapes[index % len(shapes)] for index in range(BATCH_SIZE)]
+
+
+@benchmark("query_validation_loop", items=BATCH_SIZE)
+def _query_validation_loop() -> Callable[[], Any]:
+    validator = ValidatedSource.VALIDATOR
+    batch = _validation_batch()
+
+    def validate_each() -> None:
+        for query in batch:
+            validator(dict(query))
+    return validate_each
+
+
+@benchmark("query_validation_many", items=BATCH_SIZE)
+def _query_validation_many() -> Callable[[], Any]:
+    validator = ValidatedSource.VALIDATOR
+    batch = _validation_batch()
+    return lambda: validator.validate_many([dict(query) for query in batch])
+
+
+@benchmark("pipeline_construction")
+def _pipeline_construction() -> Callable[[], Any]:
+    elements = [NullSink(), MissingSource(), RecordSource()]
+    transformers = [ChainTransformer()]
+    return lambda: DataPipeline(elements, transformers)
+
+
+@benchmark("get_cold")
+def _get_cold() -> Callable[[], Any]:
+    # Every call builds a new pipeline, so its plans are built by the get
+    elements = [NullSink(), MissingSource(), RecordSource()]
+    transformers = [ChainTransformer()]
+    query = {ID_KEY: 1}
+    return lambda: DataPipeline(elements, transformers, compile_plans=False).get(STAGES[2], query)
+
+
+@benchmark("get_warm")
+def _get_warm() -> Callable[[], Any]:
+    pipeline = DataPipeline([NullSink(), MissingSource(), RecordSource()], [ChainTransformer()], compile_plans=False)
+    query = {ID_KEY: 1}
+    pipeline.get(STAGES[2], query)
+    return lambda: pipeline.get(STAGES[2], query)
+
+
+class CountingPipeline(DataPipeline):
+    """A DataPipeline which counts the get plans it builds."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self.plans_built = 0
+        super().__init__(*args, **kwargs)
+
+    def _store_get_plan(self, type: Type[T]) -> Any:
+        if type not in self._get_types:
+            self.plans_built += 1
+        return super()._store_get_plan(type)
+
+
+@benchmark("get_cold_threaded", items=THREADS)
+def _get_cold_threaded() -> Callable[[], Any]:
+    # Every call builds a new pipeline, which THREADS threads then get from at once. Its plan has to be built exactly once.
+    elements = [NullSink(), MissingSource(), RecordSource()]
+    transformers = [ChainTransformer()]
+    query = {ID_KEY: 1}
+    executor = ThreadPoolExecutor(THREADS)
+
+    def get_cold_threaded() -> None:
+        pipeline = CountingPipeline(elements, transformers, compile_plans=False)
+        barrier = Barrier(THREADS)
+
+        def get() -> Any:
+            barrier.wait()
+            return pipeline.get(STAGES[2], query)
+
+        for future in [executor.submit(get) for _ in range(THREADS)]:
+            future.result()
+        if pipeline.plans_built != 1:
+            raise AssertionError("The plan was built {count} times!".format(count=pipeline.plans_built))
+    return get_cold_threaded
+
+
+##########
+# Runner #
+##########
+
+
+def _calibrate(operation: Callable[[], Any], min_time: float) -> int:
+    loops = 1
+    while True:
+        start = perf_counter()
+        for _ in range(loops):
+            operation()
+        if perf_counter() - start >= min_time:
+            return loops
+        loops *= 2
+
+
+def run(name: str, items: int, setup: Callable[[], Callable[[], Any]], repeat: int, min_time: float) -> Dict[str, Any]:
+    """Times a benchmark.
+
+    Args:
+        name: The benchmark's name.
+        items: The number of objects handled by one operation.
+        setup: Sets the benchmark up and returns the operation to be timed.
+        repeat: The number of timed rounds.
+        min_time: The minimum duration of a round, in seconds.
+
+    Returns:
+        The benchmark's results, with times in nanoseconds per operation.
+    """
+    operation = setup()
+    loops = _calibrate(operation, min_time)
+
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        for _ in range(loops):
+            operation()
+        times.append((perf_counter() - start) / loops * 1e9)
+
+    return {
+        "name": name,
+        "items": items,
+        "loops": loops,
+        "repeat": repeat,
+        "min_ns": min(times),
+        "median_ns": statistics.median(times),
+        "mean_ns": statistics.mean(times),
+        "stdev_ns": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "per_item_ns": min(times) / items
+    }
+
+
+def main(arguments: List[str] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the datapipelines hot paths.")
+    parser.add_argument("--output", help="Write the results as JSON to this file (default stdout).")
+    parser.add_argument("--compare", help="A JSON file of earlier results to compare against.")
+    parser.add_argument("--filter", nargs="*", default=[], help="Only run the benchmarks whose names contain any of these strings.")
+    parser.add_argument("--repeat", type=int, default=5, help="The number of timed rounds per benchmark (default 5).")
+    parser.add_argument("--min-time", type=float, default=0.1, help="The minimum duration of a round in seconds (default 0.1).")
+    arguments = parser.parse_args(arguments)
+
+    baseline = {}  # type: Dict[str, Dict[str, Any]]
+    if arguments.compare:
+        with open(arguments.compare, encoding="UTF-8") as file:
+            baseline = {result["name"]: result for result in json.load(file)["benchmarks"]}
+
+    results = []
+    for spec in _BENCHMARKS:
+        if arguments.filter and not any(pattern in spec["name"] for pattern in arguments.filter):
+            continue
+        result = run(spec["name"], spec["items"], spec["setup"], arguments.repeat, arguments.min_time)
+        results.append(result)
+
+        line = "{name:<32} {min:>12.0f} ns/op {per_item:>10.1f} ns/item".format(name=result["name"], min=result["min_ns"], per_item=result["per_item_ns"])
+        if result["name"] in baseline:
+            line += "  {ratio:>6.2f}x".format(ratio=result["min_ns"] / baseline[result["name"]]["min_ns"])
+        print(line, file=sys.stderr)
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "benchmarks": results
+    }
+
+    if arguments.output:
+        with open(arguments.output, "w", encoding="UTF-8") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return report
+
+
+if __name__ == "__main__":
+    main()
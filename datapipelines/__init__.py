@@ -1,8 +1,14 @@
-from .common import PipelineContext, UnsupportedError, NotFoundError, TYPE_WILDCARD
-from .pipelines import DataPipeline, NoConversionError
-from .queries import Query, QueryValidationError, QueryValidatorStructureError, validate_query
-from .sinks import DataSink, CompositeDataSink
+from .batching import BatchWindow
+from .caches import Cache, MemoryCache, SQLiteCache, TieredCache, TierPolicy
+from .common import PipelineContext, UnsupportedError, NotFoundError, PartialResult, NegativeCache, TYPE_WILDCARD
+from .graphs import TypeGraph, NetworkXTypeGraph
+from .metrics import PipelineMetrics, Histogram
+from .pipelines import DataPipeline, NoConversionError, QueryMode
+from .queries import Query, QueryValidationError, QueryValidatorStructureError, validate_query, fingerprint, FrozenQuery
+from .sinks import DataSink, CompositeDataSink, BufferedDataSink
 from .sources import DataSource, CompositeDataSource
+from .tracing import Event, EventType, Tracer, LoggingSubscriber
 from .transformers import DataTransformer, CompositeDataTransformer
+from .writers import WriteBehindQueue, OverflowPolicy
 
-__all__ = ["DataTransformer", "CompositeDataTransformer", "DataPipeline", "NoConversionError", "Query", "QueryValidationError", "QueryValidatorStructureError", "validate_query", "DataSource", "CompositeDataSource", "DataSink", "CompositeDataSink", "PipelineContext", "UnsupportedError", "NotFoundError", "TYPE_WILDCARD"]
+__all__ = ["DataTransformer", "CompositeDataTransformer", "DataPipeline", "NoConversionError", "QueryMode", "BatchWindow", "TypeGraph", "NetworkXTypeGraph", "Query", "QueryValidationError", "QueryValidatorStructureError", "validate_query", "fingerprint", "FrozenQuery", "DataSource", "CompositeDataSource", "DataSink", "CompositeDataSink", "BufferedDataSink", "WriteBehindQueue", "OverflowPolicy", "Event", "EventType", "Tracer", "LoggingSubscriber", "PipelineMetrics", "Histogram", "PipelineContext", "UnsupportedError", "NotFoundError", "PartialResult", "NegativeCache", "Cache", "MemoryCache", "SQLiteCache", "TieredCache", "TierPolicy", "TYPE_WILDCARD"]
@@ -0,0 +1,695 @@
+from abc import abstractmethod
+from asyncio import Event, Task, TimeoutError as AsyncTimeoutError, ensure_future, gather, get_event_loop, shield, wait_for
+from concurrent.futures import Executor
+from functools import partial
+from inspect import isawaitable
+from time import perf_counter
+from typing import Type, TypeVar, Sequence, Union, Any, Mapping, Iterable, Tuple, List, AsyncGenerator, Awaitable, Callable, Hashable, Optional
+
+from .batching import BatchWindow, _Batch, _Batcher
+from .common import PipelineContext, NotFoundError, PartialResult
+from .metrics import PipelineMetrics, _Series, _TRANSFORMERS_FAMILY
+from .pipelines import DataPipeline, NoConversionError, QueryMode, _SinkHandler, _SourceHandler, _identity, _stages
+from .queries import _copy_query
+from .sinks import DataSink
+from .sources import DataSource
+from .tracing import Tracer, EventType
+from .transformers import DataTransformer
+
+T = TypeVar("T")
+S = TypeVar("S")
+F = TypeVar("F")
+
+
+class AsyncDataSource(DataSource):
+    """A DataSource whose get and get_many are coroutines. Register types with `AsyncDataSource.dispatch` exactly as with a DataSource."""
+
+    @abstractmethod
+    async def get(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+        """Gets a query from the data source.
+
+        Args:
+            query: The query being requested.
+            context: The context for the extraction (mutable).
+
+        Returns:
+            The requested object.
+        """
+        pass
+
+    @abstractmethod
+    async def get_many(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[T]:
+        """Gets a query from the data source, which contains a request for multiple objects.
+
+        Args:
+            query: The query being requested (contains a request for multiple objects).
+            context: The context for the extraction (mutable).
+
+        Returns:
+            The requested objects.
+        """
+        pass
+
+
+class AsyncDataSink(DataSink):
+    """A DataSink whose put and put_many are coroutines. Register types with `AsyncDataSink.dispatch` exactly as with a DataSink."""
+
+    @abstractmethod
+    async def put(self, type: Type[T], item: T, context: PipelineContext = None) -> None:
+        """Puts an object into the data sink.
+
+        Args:
+            type: The type of the object being inserted.
+            item: The object to be inserted.
+            context: The context of the insertion (mutable).
+        """
+        pass
+
+    @abstractmethod
+    async def put_many(self, type: Type[T], items: Iterable[T], context: PipelineContext = None) -> None:
+        """Puts multiple objects of the same type into the data sink.
+
+        Args:
+            type: The type of the objects being inserted.
+            items: The objects to be inserted.
+            context: The context of the insertion (mutable).
+        """
+        pass
+
+
+class AsyncDataTransformer(DataTransformer):
+    """A DataTransformer whose transform is a coroutine. Register conversions with `AsyncDataTransformer.dispatch` exactly as with a DataTransformer."""
+
+    @abstractmethod
+    async def transform(self, target_type: Type[T], value: F, context: PipelineContext = None) -> T:
+        """Transforms an object to a new type.
+
+        Args:
+            target_type: The type to be converted to.
+            value: The object to be transformed.
+            context: The context of the transformation (mutable).
+        """
+        pass
+
+    async def transform_many(self, target_type: Type[T], values: List[F], context: PipelineContext = None) -> List[T]:
+        """Transforms a batch of objects of the same type to a new type. By default each object is transformed with `transform`.
+
+        Args:
+            target_type: The type to be converted to.
+            values: The objects to be transformed.
+            context: The context of the transformation (mutable).
+        """
+        return [await self.transform(target_type, value, context) for value in values]
+
+
+class ExecutorDataSource(AsyncDataSource):
+    def __init__(self, source: DataSource, executor: Executor = None) -> None:
+        """Adapts a synchronous DataSource for use in an AsyncDataPipeline by running its calls in an executor.
+
+        Args:
+            source: The synchronous data source.
+            executor: The executor to run the source's calls in (default the event loop's default executor).
+        """
+        self._source = source
+        self._executor = executor
+
+    @property
+    def provides(self):  # type: Union[Iterable[Type[T]], Type[Any]]
+        return self._source.provides
+
+    async def get(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+        return await get_event_loop().run_in_executor(self._executor, partial(self._source.get, type, query, context))
+
+    async def get_many(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> List[T]:
+        # Sources often return lazy generators that do their I/O while iterating, so the results are collected in the executor as well
+        def get_many() -> List[T]:
+            return list(self._source.get_many(type, query, context))
+
+        return await get_event_loop().run_in_executor(self._executor, get_many)
+
+    def combine(self, type: Type[T], queries: Sequence[Mapping[str, Any]]) -> Optional[Mapping[str, Any]]:
+        return self._source.combine(type, queries)
+
+
+class ExecutorDataSink(AsyncDataSink):
+    def __init__(self, sink: DataSink, executor: Executor = None) -> None:
+        """Adapts a synchronous DataSink for use in an AsyncDataPipeline by running its calls in an executor.
+
+        Args:
+            sink: The synchronous data sink.
+            executor: The executor to run the sink's calls in (default the event loop's default executor).
+        """
+        self._sink = sink
+        self._executor = executor
+
+    @property
+    def accepts(self):  # type: Union[Iterable[Type[T]], Type[Any]]
+        return self._sink.accepts
+
+    async def put(self, type: Type[T], item: T, context: PipelineContext = None) -> None:
+        await get_event_loop().run_in_executor(self._executor, partial(self._sink.put, type, item, context))
+
+    async def put_many(self, type: Type[T], items: Iterable[T], context: PipelineContext = None) -> None:
+        items = list(items)
+        await get_event_loop().run_in_executor(self._executor, partial(self._sink.put_many, type, items, context))
+
+
+class _AsyncSingleFlight(object):
+    def __init__(self) -> None:
+        """Runs at most one call at a time per key on an event loop. Callers that arrive while a call for their key is in flight await it and share
+        its result or exception. The call runs in its own task, so a caller being cancelled doesn't affect the others."""
+        self._flights = {}  # type: Dict[Hashable, Task]
+
+    async def do(self, key: Hashable, function: Callable[..., Awaitable[T]], *args: Any) -> T:
+        try:
+            flight = self._flights[key]
+        except KeyError:
+            flight = ensure_future(function(*args))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda _: self._land(key, flight))
+        return await shield(flight)
+
+    def _land(self, key: Hashable, flight: Task) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+
+class _AsyncBatch(_Batch):
+    _event_class = Event
+
+    def __init__(self) -> None:
+        super().__init__()
+        # The event loop only keeps weak references to tasks, so the batch holds on to the one fetching it
+        self.task = None  # type: Task
+
+
+class _AsyncBatcher(_Batcher):
+    _batch_class = _AsyncBatch
+
+    def __init__(self, get_bulk: Callable[[Type[T], List[Mapping[str, Any]]], Awaitable[List[T]]], type: Type[T], window: BatchWindow) -> None:
+        """Collects concurrent `get`s of a type on an event loop into batches. Each batch is fetched by its own task, so a caller being cancelled
+        doesn't affect the others.
+
+        Args:
+            get_bulk: Fetches a batch (an AsyncDataPipeline's `_get_bulk`).
+            type: The type being requested.
+            window: How batches are collected.
+        """
+        super().__init__(get_bulk, type, window)
+
+    async def _fetch(self, batch: _AsyncBatch) -> None:
+        try:
+            await wait_for(batch.full.wait(), self._window.delay)
+        except AsyncTimeoutError:
+            pass
+        self._close(batch)
+
+        try:
+            batch.results = await self._get_bulk(self._type, batch.queries)
+        except BaseException as error:
+            batch.error = error
+        finally:
+            batch.done.set()
+
+    async def get(self, query: Mapping[str, Any]) -> T:
+        batch, index, leader = self._join(query)
+
+        if leader:
+            batch.task = ensure_future(self._fetch(batch))
+        await batch.done.wait()
+
+        return batch.result(index)
+
+
+async def _resolve(value: Any) -> Any:
+    if isawaitable(value):
+        return await value
+    return value
+
+
+async def _iterate(items: Iterable[T]) -> AsyncGenerator[T, None]:
+    for item in items:
+        yield item
+
+
+async def _transform(transformer_chain: Sequence[Tuple[DataTransformer, Type]], data: S, context: PipelineContext = None) -> T:
+    """Transform data to a new type, awaiting any asynchronous transformers in the chain.
+
+    Args:
+        transformer_chain: A sequence of (transformer, type) pairs to convert the data.
+        data: The data to be transformed.
+        context: The context of the transformations (mutable).
+
+    Returns:
+        The transformed data.
+    """
+    for transformer, target_type in transformer_chain:
+        # noinspection PyTypeChecker
+        data = transformer.transform(target_type, data, context)
+        if isinstance(transformer, AsyncDataTransformer):
+            data = await data
+    return data
+
+
+async def _transform_many(transformer_chain: Sequence[Tuple[DataTransformer, Type]], data: List[S], context: PipelineContext = None) -> List[T]:
+    """Transform a batch of data to a new type, awaiting any asynchronous transformers in the chain.
+
+    Args:
+        transformer_chain: A sequence of (transformer, type) pairs to convert the data.
+        data: The data to be transformed.
+        context: The context of the transformations (mutable).
+
+    Returns:
+        The transformed data.
+    """
+    for transformer, target_type in transformer_chain:
+        # noinspection PyTypeChecker
+        data = transformer.transform_many(target_type, data, context)
+        if isinstance(transformer, AsyncDataTransformer):
+            data = await data
+    return data
+
+
+async def _apply(tracer: Tracer, transform: Callable[[S], Any], data: S, context: PipelineContext, many: bool) -> T:
+    """Applies a handler's transformer chain, awaiting it if necessary and emitting an event for every edge of the chain while traced."""
+    if transform is _identity:
+        return data
+    if not tracer.active:
+        return await _resolve(transform(data=data, context=context))
+
+    try:
+        stages = transform.stages
+    except AttributeError:
+        stages = ((None, None, None, lambda data, context: transform(data=data, context=context)),)
+
+    for transformer, from_type, to_type, stage in stages:
+        start = perf_counter()
+        result = await _resolve(stage(data, context))
+        tracer.emit(EventType.TRANSFORM, transformer=transformer, from_type=from_type, to_type=to_type, value=data, result=result, many=many, elapsed=perf_counter() - start)
+        data = result
+    return data
+
+
+def _meter_stage(series: _Series, stage: Callable[[Any, PipelineContext], Any], many: bool) -> Callable[[Any, PipelineContext], Awaitable[Any]]:
+    async def metered(data: Any, context: PipelineContext = None) -> Any:
+        start = perf_counter()
+        result = await _resolve(stage(data, context))
+        series.record("calls", perf_counter() - start, len(data) if many else 1)
+        return result
+    return metered
+
+
+def _meter(metrics: PipelineMetrics, transform: Callable[[S], Awaitable[T]], many: bool) -> Callable[[S], Awaitable[T]]:
+    """Wraps a transform so that every edge of its chain records into its series in `metrics`, awaiting any asynchronous edges."""
+    if transform is _identity:
+        return _identity
+
+    stages = [(transformer, from_type, to_type, _meter_stage(metrics._get(_TRANSFORMERS_FAMILY, (transformer, from_type, to_type)), stage, many))
+              for transformer, from_type, to_type, stage in _stages(transform)]
+
+    async def metered(data: S, context: PipelineContext = None) -> T:
+        for _, _, _, stage in stages:
+            data = await stage(data, context)
+        return data
+
+    metered.stages = stages
+    return metered
+
+
+class _AsyncSinkHandler(_SinkHandler):
+    _meter = staticmethod(_meter)
+
+    async def put(self, item: T, context: PipelineContext = None) -> None:
+        item = await _apply(self._tracer, self._transform, item, context, False)
+        start = perf_counter() if self._series is not None or self._tracer.active else None
+        await self._sink.put(self._store_type, item, context)
+        if start is not None:
+            self._put(item, False, start)
+
+    async def put_many(self, items: Iterable[T], context: PipelineContext = None) -> None:
+        items = await _apply(self._tracer, self._transform_many, list(items), context, True)
+        start = perf_counter() if self._series is not None or self._tracer.active else None
+        await self._sink.put_many(self._store_type, items, context)
+        if start is not None:
+            self._put(items, True, start)
+
+
+class _AsyncSourceHandler(_SourceHandler):
+    _meter = staticmethod(_meter)
+
+    async def get(self, query: Mapping[str, Any], context: PipelineContext = None) -> T:
+        result = await self.fetch(query, context)
+
+        await gather(*(sink.put(result, context) for sink in self._before_transform))
+        result = await _apply(self._tracer, self._transform, result, context, False)
+        await gather(*(sink.put(result, context) for sink in self._after_transform))
+
+        return result
+
+    async def fetch(self, query: Mapping[str, Any], context: PipelineContext = None) -> S:
+        start = perf_counter() if self._series is not None or self._tracer.active else None
+        try:
+            result = await self._source.get(self._source_type, _copy_query(query), context)
+        except NotFoundError as error:
+            if start is not None:
+                self._miss(query, error, False, start)
+            raise
+        if start is not None:
+            self._hit(query, result, False, start)
+        return result
+
+    async def _get_many_generator(self, result: Iterable[S], context: PipelineContext = None) -> AsyncGenerator[T, None]:
+        for item in result:
+            await gather(*(sink.put(item, context) for sink in self._before_transform))
+            item = await _apply(self._tracer, self._transform, item, context, False)
+            await gather(*(sink.put(item, context) for sink in self._after_transform))
+            yield item
+
+    async def get_many(self, query: Mapping[str, Any], context: PipelineContext = None, streaming: bool = False) -> Union[List[T], AsyncGenerator[T, None]]:
+        start = perf_counter() if self._series is not None or self._tracer.active else None
+        try:
+            result = await self._source.get_many(self._source_type, _copy_query(query), context)
+        except PartialResult as partial:
+            if start is not None:
+                self._miss(query, partial, True, start)
+            raise partial.replace_found(await self._deliver_many(partial.found, context))
+        except NotFoundError as error:
+            if start is not None:
+                self._miss(query, error, True, start)
+            raise
+        if start is not None:
+            self._hit(query, result, True, start)
+
+        if not streaming:
+            return await self._deliver_many(list(result), context)
+        else:
+            return self._get_many_generator(result, context)
+
+    async def get_bulk(self, queries: List[Mapping[str, Any]], context: PipelineContext = None) -> List[T]:
+        query = self._source.combine(self._source_type, [_copy_query(single) for single in queries])
+
+        if query is not None:
+            try:
+                items = await self.get_many(query, context)
+            except PartialResult as partial:
+                items = partial.items
+            except NotFoundError:
+                return [PartialResult.MISSING] * len(queries)
+
+            if len(items) != len(queries):
+                raise ValueError("The combined query returned {count} objects for {queries} queries!".format(count=len(items), queries=len(queries)))
+            return items
+
+        async def fetch(single: Mapping[str, Any]) -> Any:
+            try:
+                return await self.fetch(single, context)
+            except NotFoundError:
+                return PartialResult.MISSING
+
+        items = await gather(*(fetch(single) for single in queries))
+
+        found = [item for item in items if item is not PartialResult.MISSING]
+        if not found:
+            return items
+        found = iter(await self._deliver_many(found, context))
+        return [item if item is PartialResult.MISSING else next(found) for item in items]
+
+    async def _deliver_many(self, result: List[S], context: PipelineContext = None) -> List[T]:
+        await gather(*(sink.put_many(result, context) for sink in self._before_transform))
+        result = await _apply(self._tracer, self._transform_many, result, context, True)
+        await gather(*(sink.put_many(result, context) for sink in self._after_transform))
+        return result
+
+
+class AsyncDataPipeline(DataPipeline):
+    _source_handler_class = _AsyncSourceHandler
+    _sink_handler_class = _AsyncSinkHandler
+    _batcher_class = _AsyncBatcher
+    _single_flight_class = _AsyncSingleFlight
+
+    def __init__(self, elements: Sequence[Union[DataSource, DataSink]], transformers: Iterable[DataTransformer] = None, executor: Executor = None, **kwargs: Any) -> None:
+        """Initializes an asynchronous data pipeline.
+
+        Synchronous sources and sinks are wrapped so their calls run in `executor`. Synchronous transformers are called directly on the event loop.
+
+        Args:
+            elements: The data stores and data sinks for this pipeline.
+            transformers: The data transformers for this pipeline.
+            executor: The executor for synchronous sources and sinks (default the event loop's default executor).
+            kwargs: Any other arguments accepted by DataPipeline, except write_behind and a query_mode other than QueryMode.SEQUENTIAL. Sink writes
+                are awaited concurrently with each other, and a WriteBehindQueue's worker threads can't await them. Sources are always queried in
+                order.
+
+        Raises:
+            ValueError: If a write_behind queue or a concurrent query mode is given.
+        """
+        if kwargs.get("write_behind") is not None:
+            raise ValueError("AsyncDataPipeline doesn't support write_behind")
+        if kwargs.get("query_mode", QueryMode.SEQUENTIAL) is not QueryMode.SEQUENTIAL:
+            raise ValueError("AsyncDataPipeline only supports QueryMode.SEQUENTIAL")
+
+        adapted = []
+        for element in elements:
+            source = sink = None
+            if isinstance(element, DataSource):
+                source = element if isinstance(element, AsyncDataSource) else ExecutorDataSource(element, executor)
+            if isinstance(element, DataSink):
+                sink = element if isinstance(element, AsyncDataSink) else ExecutorDataSink(element, executor)
+
+            # A synchronous store is split into a source followed by a sink, which gives it the same position in the pipeline for both roles
+            if source is not None and source is sink:
+                adapted.append(source)
+            else:
+                adapted.extend(adapter for adapter in (source, sink) if adapter is not None)
+
+        super().__init__(adapted, transformers, **kwargs)
+
+    @staticmethod
+    def _data_store(element: Any) -> Any:
+        # A synchronous store is adapted into separate source and sink objects, so its misses are remembered against the store itself
+        if isinstance(element, ExecutorDataSource):
+            return element._source
+        if isinstance(element, ExecutorDataSink):
+            return element._sink
+        return element
+
+    def _compile_chain(self, chain: Sequence[Tuple[DataTransformer, Type, Type]]) -> Callable[[S], Awaitable[T]]:
+        # Asynchronous transformers have to be awaited between stages, so the chain is run by the awaiting executors instead of being fused
+        stages = [(transformer, from_type, to_type, partial(_transform, [(transformer, to_type)])) for transformer, from_type, to_type in chain]
+        batches = [(transformer, from_type, to_type, partial(_transform_many, [(transformer, to_type)])) for transformer, from_type, to_type in chain]
+        chain = [(transformer, to_type) for transformer, _, to_type in chain]
+
+        async def transform(data: S, context: PipelineContext = None) -> T:
+            return await _transform(chain, data, context)
+
+        async def transform_many(data: List[S], context: PipelineContext = None) -> List[T]:
+            return await _transform_many(chain, data, context)
+
+        transform.stages = stages
+        transform_many.stages = batches
+        transform.many = transform_many
+        return transform
+
+    async def _traced(self, type: Type[T], query: Mapping[str, Any], many: bool, get: Callable[[], Awaitable[Any]]) -> Any:
+        tracing = self._tracer.active
+        if tracing:
+            self._tracer.emit(EventType.GET_START, data_type=type, query=query, many=many)
+        start = perf_counter()
+        try:
+            result = await get()
+        except Exception as error:
+            self._got(type, query, many, start, tracing, error=error)
+            raise
+        self._got(type, query, many, start, tracing, result=result)
+        return result
+
+    async def get(self, type: Type[T], query: Mapping[str, Any]) -> T:
+        """Gets a query from the data pipeline.
+
+        1) Extracts the query the sequence of data sources.
+        2) Inserts the result into the data sinks (if appropriate).
+        3) Transforms the result into the requested type if it wasn't already.
+        4) Inserts the transformed result into any data sinks.
+
+        Args:
+            query: The query being requested.
+
+        Returns:
+            The requested object.
+        """
+        if self._tracer.active or self._metrics is not None:
+            return await self._traced(type, query, False, lambda: self._get_coalesced(type, query))
+        return await self._get_coalesced(type, query)
+
+    async def _get_coalesced(self, type: Type[T], query: Mapping[str, Any]) -> T:
+        key = None
+        if self._coalescing is not None or self._negative_cache is not None:
+            key = self._fingerprint(type, query)
+
+        if self._coalescing is not None and key is not None:
+            return await self._coalescing.do((type, key), self._get, type, query, key)
+
+        return await self._get(type, query, key)
+
+    async def _get(self, type: Type[T], query: Mapping[str, Any], key: Hashable = None) -> T:
+        if self._batchers:
+            batcher = self._batchers.get(type)
+            if batcher is not None:
+                return await batcher.get(query)
+
+        handlers = self._get_plan(type)
+
+        if handlers is None:
+            raise NoConversionError("No source can provide \"{type}\"".format(type=type.__name__))
+
+        if self._negative_cache is not None and key is not None:
+            handlers = [handler for handler in handlers if not self._negative_cache.contains(self._data_store(handler._source), handler._source_type, key)]
+
+        context = self._new_context()
+
+        for handler in handlers:
+            try:
+                result = await handler.get(query, context)
+            except NotFoundError:
+                self._missed(handler, key)
+                continue
+            self._found(handler, key)
+            return result
+
+        raise NotFoundError("No source returned a query result!")
+
+    async def get_many(self, type: Type[T], query: Mapping[str, Any], streaming: bool = False) -> Union[List[T], AsyncGenerator[T, None]]:
+        """Gets a query from the data pipeline, which contains a request for multiple objects.
+
+        1) Extracts the query the sequence of data sources.
+        2) Inserts the results into the data sinks (if appropriate).
+        3) Transforms the results into the requested type if it wasn't already.
+        4) Inserts the transformed result into any data sinks.
+
+        Args:
+            query: The query being requested (contains a request for multiple objects).
+            streaming: Specifies whether the results should be returned as an async generator (default False).
+
+        Returns:
+            The requested objects or an async generator of the objects if streaming is True.
+        """
+        if self._tracer.active or self._metrics is not None:
+            return await self._traced(type, query, True, lambda: self._get_many(type, query, streaming))
+        return await self._get_many(type, query, streaming)
+
+    async def _get_many(self, type: Type[T], query: Mapping[str, Any], streaming: bool = False) -> Union[List[T], AsyncGenerator[T, None]]:
+        handlers = self._get_plan(type)
+
+        if handlers is None:
+            raise NoConversionError("No source can provide \"{type}\"".format(type=type.__name__))
+
+        context = self._new_context()
+
+        partial = None  # type: PartialResult
+        for handler in handlers:
+            try:
+                result = await handler.get_many(query, context, streaming and partial is None)
+            except PartialResult as error:
+                partial = error if partial is None else PartialResult(partial.merge(error.items), error.residual)
+                query = partial.residual
+                continue
+            except NotFoundError:
+                continue
+
+            if partial is None:
+                return result
+
+            result = partial.merge(result)
+            return _iterate(result) if streaming else result
+
+        if partial is not None:
+            raise partial
+        raise NotFoundError("No source returned a query result!")
+
+    async def get_bulk(self, type: Type[T], queries: Iterable[Mapping[str, Any]]) -> List[T]:
+        """Gets the objects answering several queries for single objects, with one request per source rather than one per query.
+
+        Each source is sent only the queries the sources before it didn't find, combined into a single `get_many` if the source can combine them
+        (see `DataSource.combine`) and through concurrent `get`s otherwise.
+
+        Args:
+            type: The type of the objects being requested.
+            queries: The queries for the single objects.
+
+        Returns:
+            The requested objects, in the order of the queries.
+
+        Raises:
+            PartialResult: If only some of the objects were found. Its residual is the list of queries for the missing objects.
+            NotFoundError: If none of the objects were found.
+        """
+        queries = list(queries)
+        if self._tracer.active or self._metrics is not None:
+            return await self._traced(type, queries, True, lambda: self._get_bulk(type, queries))
+        return await self._get_bulk(type, queries)
+
+    async def _get_bulk(self, type: Type[T], queries: List[Mapping[str, Any]]) -> List[T]:
+        handlers = self._get_plan(type)
+
+        if handlers is None:
+            raise NoConversionError("No source can provide \"{type}\"".format(type=type.__name__))
+
+        if self._negative_cache is not None:
+            keys = [self._fingerprint(type, query) for query in queries]
+        else:
+            keys = [None] * len(queries)
+
+        context = self._new_context()
+        results = [PartialResult.MISSING] * len(queries)
+        pending = list(range(len(queries)))
+        for handler in handlers:
+            if not pending:
+                break
+
+            requested = pending
+            if self._negative_cache is not None:
+                requested = [index for index in pending if keys[index] is None or not self._negative_cache.contains(self._data_store(handler._source), handler._source_type, keys[index])]
+                if not requested:
+                    continue
+
+            items = await handler.get_bulk([queries[index] for index in requested], context)
+            for index, item in zip(requested, items):
+                if item is PartialResult.MISSING:
+                    self._missed(handler, keys[index])
+                else:
+                    results[index] = item
+                    self._found(handler, keys[index])
+            pending = [index for index in pending if results[index] is PartialResult.MISSING]
+
+        if not pending:
+            return results
+        if len(pending) == len(queries):
+            raise NotFoundError("No source returned a query result!")
+        raise PartialResult(results, [queries[index] for index in pending])
+
+    async def put(self, type: Type[T], item: T) -> None:
+        """Puts an objects into the data pipeline. The object may be transformed into a new type for insertion if necessary.
+
+        Args:
+            item: The object to be inserted into the data pipeline.
+        """
+        handlers = self._put_plan(type)
+        context = self._new_context()
+
+        if handlers is not None:
+            await gather(*(handler.put(item, context) for handler in handlers))
+            self._stored(handlers)
+
+    async def put_many(self, type: Type[T], items: Iterable[T]) -> None:
+        """Puts multiple objects of the same type into the data sink. The objects may be transformed into a new type for insertion if necessary.
+
+        Args:
+            items: An iterable (e.g. list) of objects to be inserted into the data pipeline.
+        """
+        handlers = self._put_plan(type)
+        context = self._new_context()
+
+        if handlers is not None:
+            items = list(items)
+            await gather(*(handler.put_many(items, context) for handler in handlers))
+            self._stored(handlers)
@@ -0,0 +1,105 @@
+from threading import Event, Lock
+from typing import Any, Callable, List, Mapping, Tuple, Type, TypeVar
+
+from .common import NotFoundError, PartialResult
+
+T = TypeVar("T")
+
+
+class BatchWindow(object):
+    def __init__(self, delay: float = 0.002, max_size: int = 100) -> None:
+        """How a DataPipeline collects concurrent `get`s of a type into batches, which it fetches together with `get_bulk`.
+
+        The first `get` of a batch waits up to `delay` seconds for others to join it, and a batch which reaches `max_size` queries is fetched
+        right away.
+
+        Args:
+            delay: The number of seconds a batch stays open (default 0.002).
+            max_size: The maximum number of queries in a batch (default 100).
+        """
+        if delay < 0:
+            raise ValueError("delay can't be negative")
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self.delay = delay
+        self.max_size = max_size
+
+
+class _Batch(object):
+    _event_class = Event
+
+    def __init__(self) -> None:
+        self.queries = []  # type: List[Mapping[str, Any]]
+        self.full = self._event_class()
+        self.done = self._event_class()
+        self.results = None  # type: List[Any]
+        self.error = None  # type: BaseException
+
+    def result(self, index: int) -> Any:
+        if self.error is None:
+            return self.results[index]
+
+        # Everyone whose object was found gets it, and the rest get their own error
+        if isinstance(self.error, PartialResult):
+            item = self.error.items[index]
+            if item is not PartialResult.MISSING:
+                return item
+            raise NotFoundError("No source returned a query result!")
+        raise self.error
+
+
+class _Batcher(object):
+    _batch_class = _Batch
+
+    def __init__(self, get_bulk: Callable[[Type[T], List[Mapping[str, Any]]], List[T]], type: Type[T], window: BatchWindow) -> None:
+        """Collects concurrent `get`s of a type into batches. The first caller of a batch waits out the window and fetches the batch for everyone.
+
+        Args:
+            get_bulk: Fetches a batch (a DataPipeline's `_get_bulk`).
+            type: The type being requested.
+            window: How batches are collected.
+        """
+        self._get_bulk = get_bulk
+        self._type = type
+        self._window = window
+        self._lock = Lock()
+        self._open = None  # type: _Batch
+
+    def _join(self, query: Mapping[str, Any]) -> Tuple[_Batch, int, bool]:
+        # Returns the batch the query joined, its index in the batch, and whether the caller opened the batch
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._batch_class()
+                self._open = batch
+
+            index = len(batch.queries)
+            batch.queries.append(query)
+            if len(batch.queries) >= self._window.max_size:
+                self._open = None
+                batch.full.set()
+        return batch, index, leader
+
+    def _close(self, batch: _Batch) -> None:
+        with self._lock:
+            if self._open is batch:
+                self._open = None
+
+    def get(self, query: Mapping[str, Any]) -> T:
+        batch, index, leader = self._join(query)
+
+        if leader:
+            batch.full.wait(self._window.delay)
+            self._close(batch)
+            try:
+                batch.results = self._get_bulk(self._type, batch.queries)
+            except BaseException as error:
+                batch.error = error
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        return batch.result(index)
@@ -0,0 +1,520 @@
+import pickle
+import sqlite3
+from abc import abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from enum import Enum
+from hashlib import sha256
+from threading import Lock
+from time import monotonic, time
+from typing import TypeVar, Type, Any, Mapping, Iterable, Callable, Hashable, List, Tuple, Dict, Optional, AbstractSet
+
+from .common import PipelineContext, NotFoundError, PartialResult
+from .queries import QueryValidator, QueryValidationError, fingerprint
+from .sinks import DataSink
+from .sources import DataSource
+
+T = TypeVar("T")
+
+NEVER = -1
+
+# SQLite limits the number of parameters in a statement (999 before version 3.32)
+_SQLITE_BATCH_SIZE = 900
+
+
+class Cache(DataSource, DataSink):
+    def __init__(self, queries: Mapping[Type, Callable[[Any], Mapping[str, Any]]], expirations: Mapping[Type, Any] = None,
+                 validators: Mapping[Type, QueryValidator] = None, expand: Mapping[Type, Callable[[Mapping[str, Any]], Iterable[Mapping[str, Any]]]] = None,
+                 residuals: Mapping[Type, Callable[[Mapping[str, Any], List[Mapping[str, Any]]], Mapping[str, Any]]] = None) -> None:
+        """Initializes a cache, which is both a data source and a data sink for the types it's configured with.
+
+        Items are stored under the fingerprint of the query they answer (see `datapipelines.fingerprint`), so an item put into the cache is found
+        by a `get` of an equal query.
+
+        Expirations are given in seconds, as a timedelta, or as a datetime at which the item expires. NEVER (-1) keeps items until they're evicted,
+        and 0 doesn't store them at all. An expiration put in the context under `PipelineContext.Keys.EXPIRATION` (e.g. by a source which knows how
+        long its data is valid) takes precedence over the type's default.
+
+        Args:
+            queries: A function per cached type, which gives the query an item answers.
+            expirations: The default expiration per type (default NEVER for every type).
+            validators: Query validators per type, which canonicalize queries before they're fingerprinted (default None).
+            expand: A function per type, which splits a query for multiple objects into queries for the single objects. Types without one aren't
+                served by `get_many` (default None).
+            residuals: A function per type, which builds a query for the objects that weren't found from the original query and the single queries
+                that missed. Types with one return the objects that were found from `get_many` as a PartialResult (default None).
+        """
+        self._queries = dict(queries)
+        self._expirations = dict(expirations) if expirations is not None else {}
+        self._validators = dict(validators) if validators is not None else {}
+        self._expand = dict(expand) if expand is not None else {}
+        self._residuals = dict(residuals) if residuals is not None else {}
+        self._counter_lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def provides(self) -> AbstractSet[Type]:
+        return self._queries.keys()
+
+    @property
+    def accepts(self) -> AbstractSet[Type]:
+        return self._queries.keys()
+
+    def _count(self, hits: int, misses: int) -> None:
+        with self._counter_lock:
+            self.hits += hits
+            self.misses += misses
+
+    def _key(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> Hashable:
+        return fingerprint(query, self._validators.get(type), context)
+
+    def _expiration(self, type: Type[T], context: PipelineContext = None) -> float:
+        expiration = None
+        if context is not None:
+            expiration = context.get(PipelineContext.Keys.EXPIRATION)
+        if expiration is None:
+            expiration = self._expirations.get(type, NEVER)
+
+        if isinstance(expiration, datetime):
+            expiration = expiration - datetime.now(expiration.tzinfo)
+        if isinstance(expiration, timedelta):
+            # An expiration that has already passed means the item isn't stored, rather than stored forever
+            expiration = max(expiration.total_seconds(), 0)
+        return expiration
+
+    @abstractmethod
+    def _load(self, type: Type[T], key: Hashable) -> Tuple[T, float]:
+        """Loads an item from storage.
+
+        Args:
+            type: The type of the item.
+            key: The fingerprint of the query the item answers.
+
+        Returns:
+            The item and the number of seconds until it expires (or NEVER).
+
+        Raises:
+            KeyError: If the item isn't stored or has expired.
+        """
+        pass
+
+    def _load_many(self, type: Type[T], keys: Iterable[Hashable]) -> Dict[Hashable, Tuple[T, float]]:
+        """Loads several items from storage. Caches that can fetch items in bulk should override this.
+
+        Args:
+            type: The type of the items.
+            keys: The fingerprints of the queries the items answer.
+
+        Returns:
+            The items that are stored and haven't expired with the number of seconds until they expire, keyed by fingerprint.
+        """
+        found = {}
+        for key in keys:
+            try:
+                found[key] = self._load(type, key)
+            except KeyError:
+                pass
+        return found
+
+    @abstractmethod
+    def _store(self, type: Type[T], entries: List[Tuple[Hashable, T, float]]) -> None:
+        """Stores items.
+
+        Args:
+            type: The type of the items.
+            entries: The fingerprints of the queries the items answer, the items, and the number of seconds until they expire (or NEVER).
+        """
+        pass
+
+    @abstractmethod
+    def _delete(self, type: Type[T], key: Hashable) -> None:
+        pass
+
+    def _delete_many(self, type: Type[T], keys: Iterable[Hashable]) -> None:
+        for key in keys:
+            self._delete(type, key)
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Removes every item from the cache."""
+        pass
+
+    def get(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+        if type not in self._queries:
+            raise self.unsupported(type)
+
+        try:
+            key = self._key(type, query, context)
+        except (TypeError, QueryValidationError) as error:
+            raise NotFoundError("Query can't be looked up in the cache!") from error
+
+        try:
+            item, _ = self._load(type, key)
+        except KeyError:
+            self._count(0, 1)
+            raise NotFoundError("Query wasn't in the cache!")
+        self._count(1, 0)
+        return item
+
+    def get_many(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> List[T]:
+        if type not in self._queries:
+            raise self.unsupported(type)
+
+        try:
+            expand = self._expand[type]
+        except KeyError:
+            raise NotFoundError("The cache can't split queries for multiple \"{type}\"!".format(type=type.__name__))
+
+        queries = list(expand(query))
+        try:
+            keys = [self._key(type, single, context) for single in queries]
+        except (TypeError, QueryValidationError) as error:
+            raise NotFoundError("Query can't be looked up in the cache!") from error
+
+        found = self._load_many(type, keys)
+        missing = [single for single, key in zip(queries, keys) if key not in found]
+        self._count(len(keys) - len(missing), len(missing))
+        if not missing:
+            return [found[key][0] for key in keys]
+
+        if len(missing) < len(keys) and type in self._residuals:
+            items = [found[key][0] if key in found else PartialResult.MISSING for key in keys]
+            raise PartialResult(items, self._residuals[type](query, missing))
+        raise NotFoundError("Not every object in the query was in the cache!")
+
+    def put(self, type: Type[T], item: T, context: PipelineContext = None) -> None:
+        self.put_many(type, [item], context)
+
+    def put_many(self, type: Type[T], items: Iterable[T], context: PipelineContext = None) -> None:
+        try:
+            query = self._queries[type]
+        except KeyError as error:
+            raise self.unsupported(type) from error
+
+        expiration = self._expiration(type, context)
+        if expiration == 0:
+            return
+
+        entries = [(self._key(type, query(item), context), item, expiration) for item in items]
+        if entries:
+            self._store(type, entries)
+
+    def delete(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> None:
+        """Removes the item answering a query from the cache, if there is one.
+
+        Args:
+            type: The type of the item.
+            query: The query the item answers.
+            context: The context of the removal (mutable).
+        """
+        if type not in self._queries:
+            raise self.unsupported(type)
+        self._delete(type, self._key(type, query, context))
+
+
+class MemoryCache(Cache):
+    def __init__(self, queries: Mapping[Type, Callable[[Any], Mapping[str, Any]]], max_size: int = 10000, expirations: Mapping[Type, Any] = None,
+                 validators: Mapping[Type, QueryValidator] = None, expand: Mapping[Type, Callable[[Mapping[str, Any]], Iterable[Mapping[str, Any]]]] = None,
+                 residuals: Mapping[Type, Callable[[Mapping[str, Any], List[Mapping[str, Any]]], Mapping[str, Any]]] = None) -> None:
+        """Initializes an in-memory cache with least-recently-used eviction. Gets and puts take constant time.
+
+        Expired items are removed when they're next looked up. Hits, misses, evictions and expired items are counted in `hits`, `misses`, `evictions` and `expired`.
+
+        Args:
+            queries: A function per cached type, which gives the query an item answers.
+            max_size: The maximum number of items in the cache, across all types (default 10000).
+            expirations: The default expiration per type (default NEVER for every type).
+            validators: Query validators per type, which canonicalize queries before they're fingerprinted (default None).
+            expand: A function per type, which splits a query for multiple objects into queries for the single objects (default None).
+            residuals: A function per type, which builds a query for the objects that weren't found from the original query and the single queries
+                that missed. Types with one return the objects that were found from `get_many` as a PartialResult (default None).
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        super().__init__(queries, expirations, validators, expand, residuals)
+        self._max_size = max_size
+        self._entries = OrderedDict()  # type: OrderedDict[Tuple[Type, Hashable], Tuple[Any, Optional[float]]]
+        self._lock = Lock()
+        self._on_evict = None  # type: Callable[[Type, List[Tuple[Hashable, Any, float]]], None]
+        self.evictions = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self, type: Type[T], key: Hashable) -> Tuple[T, float]:
+        entry = (type, key)
+        with self._lock:
+            item, expires = self._entries[entry]
+            if expires is None:
+                expiration = NEVER
+            else:
+                expiration = expires - monotonic()
+                if expiration <= 0:
+                    del self._entries[entry]
+                    self.expired += 1
+                    raise KeyError(entry)
+            self._entries.move_to_end(entry)
+            return item, expiration
+
+    def _store(self, type: Type[T], entries: List[Tuple[Hashable, T, float]]) -> None:
+        now = monotonic()
+        evicted = []
+        with self._lock:
+            for key, item, expiration in entries:
+                entry = (type, key)
+                self._entries[entry] = (item, None if expiration == NEVER else now + expiration)
+                self._entries.move_to_end(entry)
+
+            while len(self._entries) > self._max_size:
+                evicted.append(self._entries.popitem(last=False))
+                self.evictions += 1
+
+        # Evicted items are handed over outside the lock
+        if evicted and self._on_evict is not None:
+            for type, entries in self._by_type(evicted).items():
+                self._on_evict(type, entries)
+
+    @staticmethod
+    def _by_type(entries: Iterable[Tuple[Tuple[Type, Hashable], Tuple[Any, Optional[float]]]]) -> Dict[Type, List[Tuple[Hashable, Any, float]]]:
+        # Groups stored entries by type with their remaining time until expiring, leaving out any that have expired
+        now = monotonic()
+        by_type = {}  # type: Dict[Type, List[Tuple[Hashable, Any, float]]]
+        for (type, key), (item, expires) in entries:
+            if expires is None:
+                expiration = NEVER
+            else:
+                expiration = expires - now
+                if expiration <= 0:
+                    continue
+            by_type.setdefault(type, []).append((key, item, expiration))
+        return by_type
+
+    def _delete(self, type: Type[T], key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop((type, key), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def _encode(key: Hashable) -> str:
+    # Sets are encoded in a sorted order so that equal fingerprints encode identically in every process
+    if isinstance(key, frozenset):
+        return "{" + ",".join(sorted(_encode(item) for item in key)) + "}"
+    if isinstance(key, tuple):
+        return "(" + ",".join(_encode(item) for item in key) + ")"
+    return "{module}.{name}:{value!r}".format(module=key.__class__.__module__, name=key.__class__.__qualname__, value=key)
+
+
+def _digest(key: Hashable) -> str:
+    return sha256(_encode(key).encode("utf-8")).hexdigest()
+
+
+def _remaining(expires: Optional[float], now: float) -> float:
+    return NEVER if expires is None else expires - now
+
+
+def _type_name(type: Type) -> str:
+    return "{module}.{name}".format(module=type.__module__, name=type.__qualname__)
+
+
+class SQLiteCache(Cache):
+    def __init__(self, path: str, queries: Mapping[Type, Callable[[Any], Mapping[str, Any]]], expirations: Mapping[Type, Any] = None,
+                 validators: Mapping[Type, QueryValidator] = None, expand: Mapping[Type, Callable[[Mapping[str, Any]], Iterable[Mapping[str, Any]]]] = None,
+                 residuals: Mapping[Type, Callable[[Mapping[str, Any], List[Mapping[str, Any]]], Mapping[str, Any]]] = None,
+                 dumps: Callable[[Any], bytes] = pickle.dumps, loads: Callable[[bytes], Any] = pickle.loads, table: str = "datapipelines_cache") -> None:
+        """Initializes a cache stored in a SQLite database, which survives restarts.
+
+        Items are stored under a digest of their query's fingerprint, which is the same in every process. Each `put_many` is written in a single
+        transaction, and each `get_many` is read with a single query. Expired items are skipped when read, and removed by `purge`.
+
+        Args:
+            path: The path to the database file (":memory:" for a database that isn't persisted).
+            queries: A function per cached type, which gives the query an item answers.
+            expirations: The default expiration per type (default NEVER for every type).
+            validators: Query validators per type, which canonicalize queries before they're fingerprinted (default None).
+            expand: A function per type, which splits a query for multiple objects into queries for the single objects (default None).
+            residuals: A function per type, which builds a query for the objects that weren't found from the original query and the single queries
+                that missed. Types with one return the objects that were found from `get_many` as a PartialResult (default None).
+            dumps: Serializes an item to bytes (default pickle.dumps).
+            loads: Deserializes an item from bytes (default pickle.loads).
+            table: The name of the table items are stored in (default "datapipelines_cache").
+        """
+        super().__init__(queries, expirations, validators, expand, residuals)
+        self._dumps = dumps
+        self._loads = loads
+        self._table = table
+        self._lock = Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS \"{table}\" (type TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, expires REAL, "
+                                     "PRIMARY KEY (type, key))".format(table=table))
+
+    def __len__(self) -> int:
+        with self._lock:
+            cursor = self._connection.execute("SELECT COUNT(*) FROM \"{table}\" WHERE expires IS NULL OR expires > ?".format(table=self._table), (time(),))
+            return cursor.fetchone()[0]
+
+    def _load(self, type: Type[T], key: Hashable) -> Tuple[T, float]:
+        now = time()
+        with self._lock:
+            cursor = self._connection.execute("SELECT value, expires FROM \"{table}\" WHERE type = ? AND key = ? AND (expires IS NULL OR expires > ?)".format(table=self._table),
+                                              (_type_name(type), _digest(key), now))
+            row = cursor.fetchone()
+        if row is None:
+            raise KeyError(key)
+        value, expires = row
+        return self._loads(value), _remaining(expires, now)
+
+    def _load_many(self, type: Type[T], keys: Iterable[Hashable]) -> Dict[Hashable, Tuple[T, float]]:
+        digests = {_digest(key): key for key in keys}
+        type_name = _type_name(type)
+        now = time()
+
+        rows = []
+        batch = list(digests)
+        with self._lock:
+            for start in range(0, len(batch), _SQLITE_BATCH_SIZE):
+                chunk = batch[start:start + _SQLITE_BATCH_SIZE]
+                cursor = self._connection.execute("SELECT key, value, expires FROM \"{table}\" WHERE type = ? AND key IN ({keys}) AND (expires IS NULL OR expires > ?)"
+                                                  .format(table=self._table, keys=",".join("?" * len(chunk))), [type_name] + chunk + [now])
+                rows.extend(cursor.fetchall())
+        return {digests[digest]: (self._loads(value), _remaining(expires, now)) for digest, value, expires in rows}
+
+    def _store(self, type: Type[T], entries: List[Tuple[Hashable, T, float]]) -> None:
+        now = time()
+        type_name = _type_name(type)
+        rows = [(type_name, _digest(key), self._dumps(item), None if expiration == NEVER else now + expiration) for key, item, expiration in entries]
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO \"{table}\" (type, key, value, expires) VALUES (?, ?, ?, ?)".format(table=self._table), rows)
+
+    def _delete(self, type: Type[T], key: Hashable) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM \"{table}\" WHERE type = ? AND key = ?".format(table=self._table), (_type_name(type), _digest(key)))
+
+    def _delete_many(self, type: Type[T], keys: Iterable[Hashable]) -> None:
+        type_name = _type_name(type)
+        with self._lock, self._connection:
+            self._connection.executemany("DELETE FROM \"{table}\" WHERE type = ? AND key = ?".format(table=self._table), [(type_name, _digest(key)) for key in keys])
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM \"{table}\"".format(table=self._table))
+
+    def purge(self) -> int:
+        """Removes expired items from the database.
+
+        Returns:
+            The number of items removed.
+        """
+        with self._lock, self._connection:
+            cursor = self._connection.execute("DELETE FROM \"{table}\" WHERE expires IS NOT NULL AND expires <= ?".format(table=self._table), (time(),))
+            return cursor.rowcount
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+class TierPolicy(Enum):
+    """How a TieredCache divides items between its tiers.
+
+    INCLUSIVE: Items are written to both tiers. Items found on disk are copied into memory.
+    EXCLUSIVE: Items are written to memory only. Items evicted from memory are moved to disk, and items found on disk are moved into memory.
+    """
+    INCLUSIVE = "inclusive"
+    EXCLUSIVE = "exclusive"
+
+
+class TieredCache(Cache):
+    def __init__(self, memory: MemoryCache, disk: Cache, policy: TierPolicy = TierPolicy.INCLUSIVE) -> None:
+        """Initializes a cache made of a memory tier in front of a (slower, larger) disk tier, which a DataPipeline sees as a single source and sink.
+
+        Items found on disk are promoted into memory, so a pipeline's write-back after a read doesn't write to both tiers. Keys are built with the
+        memory tier's configuration, so both tiers should be configured with the same query functions. The cache provides the types both tiers
+        accept. Promotions and demotions are counted in `promotions` and `demotions`.
+
+        Args:
+            memory: The memory tier.
+            disk: The disk tier (e.g. a SQLiteCache).
+            policy: How items are divided between the tiers (default TierPolicy.INCLUSIVE).
+        """
+        if memory._on_evict is not None:
+            raise ValueError("The memory tier already belongs to another TieredCache")
+
+        types = [type for type in memory.accepts if type in disk.accepts]
+        super().__init__({type: memory._queries[type] for type in types}, memory._expirations, memory._validators, memory._expand, memory._residuals)
+        self._memory = memory
+        self._disk = disk
+        self._policy = policy
+        self.promotions = 0
+        self.demotions = 0
+
+        if policy is TierPolicy.EXCLUSIVE:
+            memory._on_evict = self._demote
+
+    def __len__(self) -> int:
+        if self._policy is TierPolicy.INCLUSIVE:
+            return len(self._disk)
+        return len(self._memory) + len(self._disk)
+
+    def _promote(self, type: Type[T], entries: List[Tuple[Hashable, T, float]]) -> None:
+        with self._counter_lock:
+            self.promotions += len(entries)
+        self._memory._store(type, entries)
+        if self._policy is TierPolicy.EXCLUSIVE:
+            self._disk._delete_many(type, [key for key, _, _ in entries])
+
+    def _demote(self, type: Type[T], entries: List[Tuple[Hashable, T, float]]) -> None:
+        with self._counter_lock:
+            self.demotions += len(entries)
+        self._disk._store(type, entries)
+
+    def _load(self, type: Type[T], key: Hashable) -> Tuple[T, float]:
+        try:
+            return self._memory._load(type, key)
+        except KeyError:
+            pass
+
+        item, expiration = self._disk._load(type, key)
+        self._promote(type, [(key, item, expiration)])
+        return item, expiration
+
+    def _load_many(self, type: Type[T], keys: Iterable[Hashable]) -> Dict[Hashable, Tuple[T, float]]:
+        keys = list(keys)
+        found = self._memory._load_many(type, keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            promoted = self._disk._load_many(type, missing)
+            if promoted:
+                self._promote(type, [(key, item, expiration) for key, (item, expiration) in promoted.items()])
+                found.update(promoted)
+        return found
+
+    def _store(self, type: Type[T], entries: List[Tuple[Hashable, T, float]]) -> None:
+        self._memory._store(type, entries)
+        if self._policy is TierPolicy.INCLUSIVE:
+            self._disk._store(type, entries)
+
+    def _delete(self, type: Type[T], key: Hashable) -> None:
+        self._memory._delete(type, key)
+        self._disk._delete(type, key)
+
+    def clear(self) -> None:
+        self._memory.clear()
+        self._disk.clear()
+
+    def flush(self) -> None:
+        """Copies every item in memory to disk, e.g. before shutting down. Only needed with TierPolicy.EXCLUSIVE."""
+        if self._policy is not TierPolicy.EXCLUSIVE:
+            return
+
+        with self._memory._lock:
+            entries = list(self._memory._entries.items())
+        for type, stored in self._memory._by_type(entries).items():
+            self._disk._store(type, stored)
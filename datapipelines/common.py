@@ -1,4 +1,7 @@
-from typing import Generic, TypeVar, Any
+from collections import OrderedDict
+from threading import Event, Lock
+from time import monotonic
+from typing import Generic, TypeVar, Type, Any, Callable, Tuple, Iterable, Hashable, Sequence, Mapping, List, Union
 
 TYPE_WILDCARD = Any
 
@@ -11,15 +14,229 @@ class NotFoundError(ValueError):
     pass
 
 
+class _Missing(object):
+    def __repr__(self) -> str:
+        return "MISSING"
+
+
+class PartialResult(NotFoundError):
+    MISSING = _Missing()
+
+    def __init__(self, items: Sequence[Any], residual: Union[Mapping[str, Any], List[Mapping[str, Any]]]) -> None:
+        """Raised by a source's `get_many` when it found only some of the requested objects.
+
+        A DataPipeline sends the residual query on to the following sources and merges what they find into the objects already found. Anything that
+        doesn't know about partial results treats this as a NotFoundError.
+
+        Args:
+            items: The requested objects in the requested order, with PartialResult.MISSING in place of every object that wasn't found.
+            residual: A query for only the missing objects, which returns them in the same order. From DataPipeline.get_bulk, the list of queries
+                for the missing objects instead.
+        """
+        super().__init__("Only some of the requested objects were found!")
+        self.items = list(items)
+        self.residual = residual
+
+    @property
+    def found(self) -> List[Any]:
+        """The objects that were found, in order."""
+        return [item for item in self.items if item is not PartialResult.MISSING]
+
+    def replace_found(self, items: Iterable[Any]) -> "PartialResult":
+        """Replaces the objects that were found (e.g. with their transformed versions), in order.
+
+        Args:
+            items: The replacements, one for each found object.
+
+        Returns:
+            A new partial result for the same residual query.
+        """
+        items = iter(items)
+        return PartialResult([item if item is PartialResult.MISSING else next(items) for item in self.items], self.residual)
+
+    def merge(self, items: Iterable[Any]) -> List[Any]:
+        """Fills in the missing objects, in order.
+
+        Args:
+            items: The results of the residual query, one for each missing object.
+
+        Returns:
+            The requested objects in the requested order.
+        """
+        items = list(items)
+        missing = len(self.items) - len(self.found)
+        if len(items) != missing:
+            raise ValueError("The residual query returned {count} objects for {missing} missing ones!".format(count=len(items), missing=missing))
+
+        items = iter(items)
+        return [next(items) if item is PartialResult.MISSING else item for item in self.items]
+
+
 class PipelineContext(dict):
     class Keys(object):
         PIPELINE = "pipeline"
         EXPIRATION = "expires"
 
 
+def _batch_key(context: PipelineContext) -> Hashable:
+    # Writes can only be batched into one put_many if their contexts agree on what the sink reads from them, which is the expiration
+    expiration = context.get(PipelineContext.Keys.EXPIRATION) if context is not None else None
+    try:
+        hash(expiration)
+    except TypeError:
+        return id(context)
+    return expiration
+
+
 T = TypeVar("T")
 Q = TypeVar("Q")
 
 
 class TypePair(Generic[T, Q]):
     pass
+
+
+class _Flight(object):
+    def __init__(self) -> None:
+        self.done = Event()
+        self.result = None
+        self.error = None  # type: BaseException
+
+
+class _SingleFlight(object):
+    def __init__(self) -> None:
+        """Runs at most one call at a time per key. Callers that arrive while a call for their key is in flight wait for it and share its result or exception."""
+        self._lock = Lock()
+        self._flights = {}  # type: Dict[Hashable, _Flight]
+
+    def do(self, key: Hashable, function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        with self._lock:
+            try:
+                flight = self._flights[key]
+                leader = False
+            except KeyError:
+                flight = _Flight()
+                self._flights[key] = flight
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = function(*args, **kwargs)
+            return flight.result
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+class NegativeCache(object):
+    def __init__(self, ttl: float = 60.0, max_size: int = 10000) -> None:
+        """Initializes a cache of queries that sources have recently failed to find, so repeated lookups can skip those sources.
+
+        Entries are keyed by the source, the type requested from it, and a fingerprint of the query (see `datapipelines.fingerprint`).
+
+        Args:
+            ttl: The number of seconds a miss is remembered (default 60).
+            max_size: The maximum number of misses remembered. The oldest are forgotten first (default 10000).
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self._ttl = ttl
+        self._max_size = max_size
+        self._entries = OrderedDict()  # type: OrderedDict[Tuple[Any, Type, Hashable], float]
+        self._by_source = {}  # type: Dict[Any, Set[Tuple[Any, Type, Hashable]]]
+        self._by_key = {}  # type: Dict[Hashable, Set[Tuple[Any, Type, Hashable]]]
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, entry: Tuple[Any, Type, Hashable]) -> None:
+        del self._entries[entry]
+        source, type, key = entry
+        for index, value in ((self._by_source, source), (self._by_key, key)):
+            entries = index[value]
+            entries.discard(entry)
+            if not entries:
+                del index[value]
+
+    def contains(self, source: Any, type: Type, key: Hashable) -> bool:
+        """Checks whether a source recently failed to find a query.
+
+        Args:
+            source: The source.
+            type: The type requested from the source.
+            key: The fingerprint of the query.
+        """
+        entry = (source, type, key)
+        with self._lock:
+            try:
+                expires = self._entries[entry]
+            except KeyError:
+                return False
+
+            if expires <= monotonic():
+                self._remove(entry)
+                return False
+            return True
+
+    def add(self, source: Any, type: Type, key: Hashable) -> None:
+        """Remembers that a source failed to find a query.
+
+        Args:
+            source: The source.
+            type: The type requested from the source.
+            key: The fingerprint of the query.
+        """
+        entry = (source, type, key)
+        now = monotonic()
+        with self._lock:
+            if entry in self._entries:
+                self._remove(entry)
+
+            self._entries[entry] = now + self._ttl
+            self._by_source.setdefault(source, set()).add(entry)
+            self._by_key.setdefault(key, set()).add(entry)
+
+            # Every entry lives for the same time, so the oldest entries are always the first to expire
+            while self._entries:
+                oldest, expires = next(iter(self._entries.items()))
+                if expires > now and len(self._entries) <= self._max_size:
+                    break
+                self._remove(oldest)
+
+    def invalidate(self, sources: Iterable[Any] = None, key: Hashable = None) -> None:
+        """Forgets misses, e.g. because the sources may now have the data.
+
+        Args:
+            sources: Only forget misses of these sources (default None, which forgets misses of any source).
+            key: Only forget misses of the query with this fingerprint (default None, which forgets misses of any query).
+        """
+        with self._lock:
+            if sources is None and key is None:
+                entries = list(self._entries)
+            elif key is None:
+                entries = {entry for source in sources for entry in self._by_source.get(source, ())}
+            else:
+                entries = self._by_key.get(key, ())
+                if sources is not None:
+                    sources = set(sources)
+                    entries = [entry for entry in entries if entry[0] in sources]
+                else:
+                    entries = list(entries)
+
+            for entry in entries:
+                self._remove(entry)
+
+    def clear(self) -> None:
+        """Forgets every miss."""
+        self.invalidate()
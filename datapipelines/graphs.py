@@ -0,0 +1,165 @@
+from heapq import heappush, heappop
+from itertools import count
+from typing import Type, Any, Dict, List, Mapping, Iterator, Tuple
+
+_COST = "cost"
+
+
+class TypeGraph(object):
+    def __init__(self) -> None:
+        """Initializes an empty type graph.
+
+        The graph is a directed graph of types with attributes on the nodes (e.g. the sources and sinks for a type) and edges (e.g. the cost of converting
+        from one type to another). It's stored as plain adjacency dicts, which is all the pipeline needs for its small graphs.
+        """
+        self._nodes = {}  # type: Dict[Type, Dict[str, Any]]
+        self._succ = {}  # type: Dict[Type, Dict[Type, Dict[str, Any]]]
+        self._pred = {}  # type: Dict[Type, Dict[Type, Dict[str, Any]]]
+
+    def __contains__(self, type: Type) -> bool:
+        return type in self._nodes
+
+    def __iter__(self) -> Iterator[Type]:
+        return iter(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    @property
+    def nodes(self) -> Mapping[Type, Dict[str, Any]]:
+        """The types in the graph, mapped to their attributes."""
+        return self._nodes
+
+    @property
+    def adj(self) -> Mapping[Type, Mapping[Type, Dict[str, Any]]]:
+        """The edges out of each type in the graph, mapped to their attributes."""
+        return self._succ
+
+    def edges(self) -> Iterator[Tuple[Type, Type]]:
+        for from_type, neighbors in self._succ.items():
+            for to_type in neighbors:
+                yield from_type, to_type
+
+    def add_node(self, type: Type, **attributes: Any) -> None:
+        """Adds a type to the graph if it isn't already present, and updates its attributes.
+
+        Args:
+            type: The type to add.
+            attributes: The attributes to set on the type.
+        """
+        try:
+            self._nodes[type].update(attributes)
+        except KeyError:
+            self._nodes[type] = dict(attributes)
+            self._succ[type] = {}
+            self._pred[type] = {}
+
+    def add_edge(self, from_type: Type, to_type: Type, **attributes: Any) -> None:
+        """Adds an edge between two types (adding the types if necessary), and updates its attributes.
+
+        Args:
+            from_type: The type the edge starts at.
+            to_type: The type the edge ends at.
+            attributes: The attributes to set on the edge. A "cost" attribute is used as the weight of the edge in searches.
+        """
+        self.add_node(from_type)
+        self.add_node(to_type)
+        try:
+            self._succ[from_type][to_type].update(attributes)
+        except KeyError:
+            edge = dict(attributes)
+            self._succ[from_type][to_type] = edge
+            self._pred[to_type][from_type] = edge
+
+    def shortest_paths(self, origin: Type, reverse: bool = False) -> Tuple[Dict[Type, int], Dict[Type, List[Type]]]:
+        """Finds the cheapest paths between a type and every type connected to it with a single Dijkstra search.
+
+        Args:
+            origin: The type to start the search from.
+            reverse: If True, the search follows edges backwards, finding paths from every type that can reach `origin` to `origin`.
+
+        Returns:
+            The cost of each path and the path itself (as a list of types in edge order), keyed by the other end of the path.
+        """
+        if origin not in self._nodes:
+            return {origin: 0}, {origin: [origin]}
+
+        neighbors = self._pred if reverse else self._succ
+        distances = {}  # type: Dict[Type, int]
+        predecessors = {origin: None}  # type: Dict[Type, Type]
+        tentative = {origin: 0}  # type: Dict[Type, int]
+
+        # Types aren't orderable, so a counter breaks ties in the heap
+        counter = count()
+        heap = [(0, next(counter), origin)]
+        while heap:
+            distance, _, type = heappop(heap)
+            if type in distances:
+                continue
+            distances[type] = distance
+
+            for neighbor, edge in neighbors[type].items():
+                if neighbor in distances:
+                    continue
+                cost = distance + edge[_COST]
+                if neighbor not in tentative or cost < tentative[neighbor]:
+                    tentative[neighbor] = cost
+                    predecessors[neighbor] = type
+                    heappush(heap, (cost, next(counter), neighbor))
+
+        paths = {}
+        for type in distances:
+            path = []
+            step = type
+            while step is not None:
+                path.append(step)
+                step = predecessors[step]
+            # The walk back through the predecessors yields the path backwards, which is already edge order for a reverse search
+            paths[type] = path if reverse else path[::-1]
+
+        return distances, paths
+
+    def to_networkx(self):  # type: () -> networkx.DiGraph
+        """Copies the graph into a networkx DiGraph. Requires networkx to be installed."""
+        try:
+            from networkx import DiGraph
+        except ImportError as error:
+            raise ImportError("networkx is required to export a TypeGraph. Install it with \"pip install datapipelines[networkx]\".") from error
+
+        graph = DiGraph()
+        for type, attributes in self._nodes.items():
+            graph.add_node(type, **attributes)
+        for from_type, to_type in self.edges():
+            graph.add_edge(from_type, to_type, **self._succ[from_type][to_type])
+        return graph
+
+
+class NetworkXTypeGraph(TypeGraph):
+    """A type graph which runs its searches with networkx. Requires networkx to be installed."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._networkx = None
+
+    def add_node(self, type: Type, **attributes: Any) -> None:
+        super().add_node(type, **attributes)
+        self._networkx = None
+
+    def add_edge(self, from_type: Type, to_type: Type, **attributes: Any) -> None:
+        super().add_edge(from_type, to_type, **attributes)
+        self._networkx = None
+
+    def shortest_paths(self, origin: Type, reverse: bool = False) -> Tuple[Dict[Type, int], Dict[Type, List[Type]]]:
+        if origin not in self._nodes:
+            return {origin: 0}, {origin: [origin]}
+
+        from networkx import single_source_dijkstra
+
+        if self._networkx is None:
+            self._networkx = self.to_networkx()
+
+        graph = self._networkx.reverse(copy=False) if reverse else self._networkx
+        distances, paths = single_source_dijkstra(graph, origin, weight=_COST)
+        if reverse:
+            paths = {type: path[::-1] for type, path in paths.items()}
+        return distances, paths
@@ -0,0 +1,230 @@
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple, Type
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram(object):
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        """A latency histogram with fixed buckets. Its counts are allocated up front, so observing a value never allocates.
+
+        Args:
+            bounds: The sorted upper bounds of the buckets, in seconds (default DEFAULT_BUCKETS). Larger values go into an overflow bucket.
+        """
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def reset(self) -> None:
+        for index in range(len(self.counts)):
+            self.counts[index] = 0
+        self.sum = 0.0
+
+    def merge(self, other: "Histogram") -> None:
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.sum += other.sum
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns the histogram as a dict of its cumulative bucket counts by upper bound (the last being infinity), its sum and its count."""
+        buckets = {}
+        total = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            buckets[bound] = total
+        return {"buckets": buckets, "sum": self.sum, "count": total}
+
+
+class _Series(object):
+    __slots__ = ("counters", "latency")
+
+    def __init__(self, counters: Iterable[str], bounds: Sequence[float]) -> None:
+        self.counters = dict.fromkeys(counters, 0)
+        self.latency = Histogram(bounds)
+
+    def record(self, counter: str, elapsed: float, items: int = None) -> None:
+        self.counters[counter] += 1
+        if items is not None:
+            self.counters["items"] += items
+        self.latency.observe(elapsed)
+
+    def merge(self, other: "_Series") -> None:
+        for name, count in other.counters.items():
+            self.counters[name] += count
+        self.latency.merge(other.latency)
+
+    def reset(self) -> None:
+        for name in self.counters:
+            self.counters[name] = 0
+        self.latency.reset()
+
+
+# The families of series, with the labels and counters of each
+_GETS_FAMILY = "gets"
+_SOURCES_FAMILY = "sources"
+_TRANSFORMERS_FAMILY = "transformers"
+_SINKS_FAMILY = "sinks"
+
+_LABELS = {
+    _GETS_FAMILY: ("type", "many"),
+    _SOURCES_FAMILY: ("source", "type"),
+    _TRANSFORMERS_FAMILY: ("transformer", "from_type", "to_type"),
+    _SINKS_FAMILY: ("sink", "type")
+}  # type: Dict[str, Tuple[str, ...]]
+
+_COUNTERS = {
+    _GETS_FAMILY: ("requests", "errors"),
+    _SOURCES_FAMILY: ("hits", "misses"),
+    _TRANSFORMERS_FAMILY: ("calls", "items"),
+    _SINKS_FAMILY: ("puts", "items")
+}  # type: Dict[str, Tuple[str, ...]]
+
+_HELP = {
+    _GETS_FAMILY: "pipeline get and get_many requests",
+    _SOURCES_FAMILY: "data source queries",
+    _TRANSFORMERS_FAMILY: "transformer conversions",
+    _SINKS_FAMILY: "data sink puts"
+}  # type: Dict[str, str]
+
+
+def _type_label(type: Type) -> str:
+    return type.__name__ if type is not None else ""
+
+
+def _element_label(element: Any) -> str:
+    return element.__class__.__name__ if element is not None else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+class PipelineMetrics(object):
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, label: Callable[[Any], str] = None) -> None:
+        """Counters and latency histograms for a DataPipeline. Pass it to a pipeline to start collecting:
+
+            metrics = PipelineMetrics()
+            pipeline = DataPipeline(elements, transformers, metrics=metrics)
+
+        Series are kept per requested type (gets), per source and type (hits and misses), per transformer chain edge (calls and items) and per sink
+        and type (puts and items). The pipeline's handlers record straight into their series, which are created along with them, so collecting
+        metrics doesn't build tracing events. Recording takes no locks, so under heavy concurrency an increment can occasionally be lost.
+
+        Args:
+            buckets: The upper bounds of the latency histogram buckets, in seconds (default DEFAULT_BUCKETS).
+            label: Names sources, sinks and transformers in the exported labels (default their class names). Elements with the same name share series.
+        """
+        if list(buckets) != sorted(buckets):
+            raise ValueError("buckets must be sorted")
+
+        self._bounds = tuple(buckets)
+        self._label = label if label is not None else _element_label
+        self._series = {family: {} for family in _LABELS}  # type: Dict[str, Dict[Tuple, _Series]]
+
+    def _get(self, family: str, key: Tuple) -> _Series:
+        series = self._series[family]
+        try:
+            return series[key]
+        except KeyError:
+            # setdefault is atomic, so a series created by two threads at once is still only created once
+            return series.setdefault(key, _Series(_COUNTERS[family], self._bounds))
+
+    def _labels(self, family: str, key: Tuple) -> Tuple[str, ...]:
+        if family == _GETS_FAMILY:
+            data_type, many = key
+            return _type_label(data_type), str(many).lower()
+        if family == _TRANSFORMERS_FAMILY:
+            transformer, from_type, to_type = key
+            return self._label(transformer) if transformer is not None else "", _type_label(from_type), _type_label(to_type)
+        element, data_type = key
+        return self._label(element), _type_label(data_type)
+
+    def _collect(self, family: str) -> Dict[Tuple[str, ...], _Series]:
+        collected = {}  # type: Dict[Tuple[str, ...], _Series]
+        for key, series in list(self._series[family].items()):
+            # Handlers create their series up front, so series which never recorded anything are left out
+            if not any(series.counters.values()):
+                continue
+            labels = self._labels(family, key)
+            try:
+                merged = collected[labels]
+            except KeyError:
+                merged = collected[labels] = _Series(_COUNTERS[family], self._bounds)
+            merged.merge(series)
+        return collected
+
+    def reset(self) -> None:
+        """Discards everything collected so far."""
+        # Series are zeroed rather than removed, since the pipeline's handlers keep recording into them
+        for family in self._series.values():
+            for series in list(family.values()):
+                series.reset()
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Returns the metrics collected so far.
+
+        Returns:
+            A dict with "gets", "sources", "transformers" and "sinks" lists. Each entry holds the series' labels, its counters and its "latency"
+            histogram (see Histogram.snapshot).
+        """
+        snapshot = {}
+        for family, names in _LABELS.items():
+            entries = []
+            for labels, series in sorted(self._collect(family).items()):
+                entry = dict(zip(names, labels))  # type: Dict[str, Any]
+                entry.update(series.counters)
+                entry["latency"] = series.latency.snapshot()
+                entries.append(entry)
+            snapshot[family] = entries
+        return snapshot
+
+    def to_prometheus(self, prefix: str = "datapipelines") -> str:
+        """Formats the metrics collected so far in the Prometheus text exposition format.
+
+        Args:
+            prefix: The prefix of every metric name (default "datapipelines").
+
+        Returns:
+            The metrics, ready to be served from a /metrics endpoint.
+        """
+        lines = []  # type: List[str]
+        for family, names in _LABELS.items():
+            collected = sorted(self._collect(family).items())
+
+            for counter in _COUNTERS[family]:
+                name = "{prefix}_{family}_{counter}_total".format(prefix=prefix, family=family, counter=counter)
+                lines.append("# HELP {name} The number of {counter} of {help}.".format(name=name, counter=counter, help=_HELP[family]))
+                lines.append("# TYPE {name} counter".format(name=name))
+                for labels, series in collected:
+                    lines.append("{name}{{{labels}}} {value}".format(name=name, labels=self._format_labels(names, labels), value=series.counters[counter]))
+
+            name = "{prefix}_{family}_latency_seconds".format(prefix=prefix, family=family)
+            lines.append("# HELP {name} The latency of {help}.".format(name=name, help=_HELP[family]))
+            lines.append("# TYPE {name} histogram".format(name=name))
+            for labels, series in collected:
+                histogram = series.latency.snapshot()
+                for bound, count in histogram["buckets"].items():
+                    bucket_labels = self._format_labels(names + ("le",), labels + (_format_bound(bound),))
+                    lines.append("{name}_bucket{{{labels}}} {count}".format(name=name, labels=bucket_labels, count=count))
+                formatted = self._format_labels(names, labels)
+                lines.append("{name}_sum{{{labels}}} {sum}".format(name=name, labels=formatted, sum=repr(histogram["sum"])))
+                lines.append("{name}_count{{{labels}}} {count}".format(name=name, labels=formatted, count=histogram["count"]))
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+        return ",".join("{name}=\"{value}\"".format(name=name, value=_escape(value)) for name, value in zip(names, values))
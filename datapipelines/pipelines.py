@@ -1,14 +1,21 @@
-from typing import Type, TypeVar, Sequence, Union, Callable, Any, List, Set, Generic, Mapping, Iterable, Tuple, Generator
+from concurrent.futures import Executor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from enum import Enum
 from functools import partial
+from typing import Type, TypeVar, Sequence, Union, Callable, Any, List, Set, FrozenSet, Optional, Generic, Mapping, Iterable, Tuple, Generator, Hashable
 from itertools import tee
-from logging import getLogger
-from copy import deepcopy
-
-from networkx import DiGraph, dijkstra_path, NetworkXNoPath
-
+from logging import getLogger, INFO
+from threading import Lock
+from time import perf_counter
+
+from .batching import BatchWindow, _Batcher
+from .graphs import TypeGraph
+from .metrics import PipelineMetrics, _Series, _GETS_FAMILY, _SOURCES_FAMILY, _TRANSFORMERS_FAMILY, _SINKS_FAMILY
+from .queries import QueryValidator, QueryValidationError, fingerprint, _copy_query
+from .tracing import Tracer, Event, EventType
 from .transformers import DataTransformer
-from .common import PipelineContext, NotFoundError, TYPE_WILDCARD
-from .sources import DataSource
+from .writers import WriteBehindQueue
+from .common import PipelineContext, NotFoundError, PartialResult, NegativeCache, TYPE_WILDCARD, _SingleFlight
+from .sources import DataSource, CompositeDataSource
 from .sinks import DataSink
 
 LOGGER = getLogger(__name__)
@@ -20,8 +27,8 @@ _TRANSFORMER = "transformer"
 _MAX_TRANSFORM_COST = 10000000  # (つ͡°͜ʖ͡°)つ
 
 
-def _build_type_graph(sources: Iterable[DataSource], sinks: Iterable[DataSink], transformers: Iterable[DataTransformer]) -> DiGraph:
-    graph = DiGraph()
+def _build_type_graph(sources: Iterable[DataSource], sinks: Iterable[DataSink], transformers: Iterable[DataTransformer], graph_class: Type[TypeGraph] = TypeGraph) -> TypeGraph:
+    graph = graph_class()
 
     for source in sources:
         # We ignore wildcard sources in the graph since they won't require a search to determine whether they can provide a type
@@ -31,13 +38,8 @@ def _build_type_graph(sources: Iterable[DataSource], sinks: Iterable[DataSink],
 
         provides = source.provides  # type: Iterable[Type]
         for provided_type in provides:
-            try:
-                provided_type_sources = graph[provided_type][_SOURCES]
-            except KeyError:
-                provided_type_sources = set()
-
-            provided_type_sources.add(source)
-            graph.add_node(provided_type, sources=provided_type_sources)
+            graph.add_node(provided_type)
+            graph.nodes[provided_type].setdefault(_SOURCES, set()).add(source)
         LOGGER.info("Added source \"{source}\" to type graph".format(source=source))
 
     for sink in sinks:
@@ -49,13 +51,8 @@ def _build_type_graph(sources: Iterable[DataSource], sinks: Iterable[DataSink],
             accepts = sink.accepts  # type: Iterable[Type]
 
         for accepted_type in accepts:
-            try:
-                accepted_type_sinks = graph[accepted_type][_SINKS]
-            except KeyError:
-                accepted_type_sinks = set()
-
-            accepted_type_sinks.add(sink)
-            graph.add_node(accepted_type, sinks=accepted_type_sinks)
+            graph.add_node(accepted_type)
+            graph.nodes[accepted_type].setdefault(_SINKS, set()).add(sink)
         LOGGER.info("Added sink \"{sink}\" to type graph".format(sink=sink))
 
     for transformer in transformers:
@@ -73,7 +70,7 @@ def _build_type_graph(sources: Iterable[DataSource], sinks: Iterable[DataSink],
                 except KeyError:
                     cheapest_transformer = transformer
 
-                graph.add_edge(from_type, to_type, cost=transformer.cost, transformer=cheapest_transformer)
+                graph.add_edge(from_type, to_type, cost=cheapest_transformer.cost, transformer=cheapest_transformer)
         LOGGER.info("Added transformer \"{transformer}\" to type graph".format(transformer=transformer))
 
     return graph
@@ -83,6 +80,21 @@ class NoConversionError(ValueError):
     pass
 
 
+class QueryMode(Enum):
+    """How a DataPipeline queries its sources for a `get`.
+
+    SEQUENTIAL: Query each source in order, moving on to the next only after a source doesn't find the query.
+    HEDGED: Like SEQUENTIAL, but if a source hasn't answered within the pipeline's hedge delay, query the next one as well without abandoning the first.
+    SCATTER: Query every source at once.
+
+    In the concurrent modes, the first source to return a result wins (ties go to the earlier source). Calls that haven't started are cancelled, and the
+    results of the rest are ignored. Only the winning source's result is inserted into the data sinks.
+    """
+    SEQUENTIAL = "sequential"
+    HEDGED = "hedged"
+    SCATTER = "scatter"
+
+
 T = TypeVar("T")
 S = TypeVar("S")
 
@@ -114,18 +126,141 @@ def _transform(transformer_chain: Sequence[Tuple[DataTransformer, Type]], data:
     return data
 
 
+def _transform_many(transformer_chain: Sequence[Tuple[DataTransformer, Type]], data: List[S], context: PipelineContext = None) -> List[T]:
+    """Transform a batch of data to a new type, passing the whole batch through each transformer in turn.
+
+    Args:
+        transformer_chain: A sequence of (transformer, type) pairs to convert the data.
+        data: The data to be transformed.
+        context: The context of the transformations (mutable).
+
+    Returns:
+        The transformed data.
+    """
+    for transformer, target_type in transformer_chain:
+        # noinspection PyTypeChecker
+        data = transformer.transform_many(target_type, data, context)
+    return data
+
+
+def _fuse(stages: Sequence[Callable[[Any, PipelineContext], Any]]) -> Callable[[Any, PipelineContext], Any]:
+    """Fuse resolved transformer stages into a single function.
+
+    Args:
+        stages: The conversion functions (see `DataTransformer.resolve`), in order.
+
+    Returns:
+        A function taking data and a context, which runs the data through every stage.
+    """
+    # Short chains (by far the most common) are unrolled, so each stage is a direct call of the registered implementation
+    if len(stages) == 1:
+        stage, = stages
+
+        def fused(data: Any, context: PipelineContext = None) -> Any:
+            return stage(data, context)
+    elif len(stages) == 2:
+        first, second = stages
+
+        def fused(data: Any, context: PipelineContext = None) -> Any:
+            return second(first(data, context), context)
+    else:
+        def fused(data: Any, context: PipelineContext = None) -> Any:
+            for stage in stages:
+                data = stage(data, context)
+            return data
+    return fused
+
+
+def _batch(transform: Callable[[S], T]) -> Callable[[List[S]], List[T]]:
+    # Transformer chains carry their batch version. Anything else is applied to each item.
+    if transform is _identity:
+        return _identity
+    try:
+        return transform.many
+    except AttributeError:
+        def transform_each(data: List[S], context: PipelineContext = None) -> List[T]:
+            return [transform(data=item, context=context) for item in data]
+        return transform_each
+
+
+def _stages(transform: Callable[[S], T]) -> Sequence[Tuple[DataTransformer, Type, Type, Callable[[Any, PipelineContext], Any]]]:
+    # The edges of a compiled chain. Anything else is a single edge without a transformer or types.
+    try:
+        return transform.stages
+    except AttributeError:
+        return ((None, None, None, lambda data, context: transform(data=data, context=context)),)
+
+
+def _meter_stage(series: _Series, stage: Callable[[Any, PipelineContext], Any], many: bool) -> Callable[[Any, PipelineContext], Any]:
+    def metered(data: Any, context: PipelineContext = None) -> Any:
+        start = perf_counter()
+        result = stage(data, context)
+        series.record("calls", perf_counter() - start, len(data) if many else 1)
+        return result
+    return metered
+
+
+def _meter(metrics: PipelineMetrics, transform: Callable[[S], T], many: bool) -> Callable[[S], T]:
+    """Wraps a transform so that every edge of its chain records into its series in `metrics`. The series are looked up once, here.
+
+    Args:
+        metrics: The metrics to record into.
+        transform: A compiled transformer chain (or its batch version), or any other transform.
+        many: Whether the transform converts batches of objects.
+
+    Returns:
+        The metered transform, which keeps the metered edges as its stages so tracing still times each of them.
+    """
+    if transform is _identity:
+        return _identity
+
+    stages = [(transformer, from_type, to_type, _meter_stage(metrics._get(_TRANSFORMERS_FAMILY, (transformer, from_type, to_type)), stage, many))
+              for transformer, from_type, to_type, stage in _stages(transform)]
+    metered = _fuse([stage for _, _, _, stage in stages])
+    metered.stages = stages
+    return metered
+
+
+def _traced_transform(tracer: Tracer, transform: Callable[[S], T], data: S, context: PipelineContext, many: bool) -> T:
+    # Compiled chains are run stage by stage while traced, so every edge of the chain gets its own event
+    for transformer, from_type, to_type, stage in _stages(transform):
+        start = perf_counter()
+        result = stage(data, context)
+        tracer.emit(EventType.TRANSFORM, transformer=transformer, from_type=from_type, to_type=to_type, value=data, result=result, many=many, elapsed=perf_counter() - start)
+        data = result
+    return data
+
+
 class _SinkHandler(Generic[S, T]):
-    def __init__(self, sink: DataSink, store_type: Type[S], transform: Callable[[T], S]) -> None:
+    _meter = staticmethod(_meter)
+
+    def __init__(self, sink: DataSink, store_type: Type[S], transform: Callable[[T], S], tracer: Tracer = None, metrics: PipelineMetrics = None) -> None:
         """Initializes a handler for a data sink.
 
         Args:
             sink: The data sink.
             store_type: ???
             transform: ???
+            tracer: The tracer events are emitted to (default None, which emits nothing).
+            metrics: The metrics the handler records into (default None, which records nothing).
         """
         self._sink = sink
         self._store_type = store_type
         self._transform = transform
+        self._transform_many = _batch(transform)
+        self._tracer = tracer if tracer is not None else Tracer()
+        self._series = None  # type: _Series
+        if metrics is not None:
+            self._series = metrics._get(_SINKS_FAMILY, (sink, store_type))
+            self._transform = self._meter(metrics, self._transform, False)
+            self._transform_many = self._meter(metrics, self._transform_many, True)
+
+    def _put(self, value: Any, many: bool, start: float) -> None:
+        elapsed = perf_counter() - start
+        if self._series is not None:
+            self._series.record("puts", elapsed, len(value) if many else 1)
+        if self._tracer.active:
+            self._tracer.emit(EventType.SINK_PUT, sink=self._sink, data_type=self._store_type, value=value, many=many, elapsed=elapsed)
 
     def put(self, item: T, context: PipelineContext = None) -> None:
         """Puts an objects into the data sink. The objects may be transformed into a new type for insertion if necessary.
@@ -134,10 +269,15 @@ class _SinkHandler(Generic[S, T]):
             item: The objects to be inserted into the data sink.
             context: The context of the insertion (mutable).
         """
-        LOGGER.info("Converting item \"{item}\" for sink \"{sink}\"".format(item=item, sink=self._sink))
-        item = self._transform(data=item, context=context)
-        LOGGER.info("Puting item \"{item}\" into sink \"{sink}\"".format(item=item, sink=self._sink))
+        if self._transform is not _identity:
+            if self._tracer.active:
+                item = _traced_transform(self._tracer, self._transform, item, context, False)
+            else:
+                item = self._transform(data=item, context=context)
+        start = perf_counter() if self._series is not None or self._tracer.active else None
         self._sink.put(self._store_type, item, context)
+        if start is not None:
+            self._put(item, False, start)
 
     def put_many(self, items: Iterable[T], context: PipelineContext = None) -> None:
         """Puts multiple objects of the same type into the data sink. The objects may be transformed into a new type for insertion if necessary.
@@ -146,26 +286,82 @@ class _SinkHandler(Generic[S, T]):
             items: An iterable (e.g. list) of objects to be inserted into the data sink.
             context: The context of the insertions (mutable).
         """
-        LOGGER.info("Creating transform generator for items \"{items}\" for sink \"{sink}\"".format(items=items, sink=self._sink))
-        transform_generator = (self._transform(data=item, context=context) for item in items)
-        LOGGER.info("Putting transform generator for items \"{items}\" into sink \"{sink}\"".format(items=items, sink=self._sink))
-        self._sink.put_many(self._store_type, transform_generator, context)
+        if not isinstance(items, list):
+            items = list(items)
+        if self._transform is not _identity:
+            if self._tracer.active:
+                items = _traced_transform(self._tracer, self._transform_many, items, context, True)
+            else:
+                items = self._transform_many(data=items, context=context)
+        start = perf_counter() if self._series is not None or self._tracer.active else None
+        self._sink.put_many(self._store_type, items, context)
+        if start is not None:
+            self._put(items, True, start)
 
 
 class _SourceHandler(Generic[S, T]):
-    def __init__(self, source: DataSource, source_type: Type[S], transform: Callable[[S], T], sinks: Mapping[_SinkHandler, bool]) -> None:
+    _meter = staticmethod(_meter)
+
+    def __init__(self, source: DataSource, source_type: Type[S], transform: Callable[[S], T], sinks: Mapping[_SinkHandler, bool], write_behind: WriteBehindQueue = None,
+                 tracer: Tracer = None, metrics: PipelineMetrics = None, stored: Callable[[Iterable[_SinkHandler]], None] = None) -> None:
         """Initializes a handler for a data source.
 
         source: The data source.
         source_type: ???
         transform: ???
         sinks: ???
+        write_behind: The queue that inserts results into the sinks in the background (default None, which inserts them before returning).
+        tracer: The tracer events are emitted to (default None, which emits nothing).
+        metrics: The metrics the handler records into (default None, which records nothing).
+        stored: Called with the sinks a write-behind write has landed in, once it has (default None).
         """
         self._source = source
         self._source_type = source_type
         self._transform = transform
+        self._transform_many = _batch(transform)
         self._before_transform = {sink for sink, do_transform in sinks.items() if not do_transform}
         self._after_transform = {sink for sink, do_transform in sinks.items() if do_transform}
+        self._write_behind = write_behind
+        self._stored = stored
+        self._tracer = tracer if tracer is not None else Tracer()
+        self._series = None  # type: _Series
+        if metrics is not None:
+            self._series = metrics._get(_SOURCES_FAMILY, (source, source_type))
+            self._transform = self._meter(metrics, self._transform, False)
+            self._transform_many = self._meter(metrics, self._transform_many, True)
+
+    def _store(self, sinks: Iterable[_SinkHandler], item: Any, context: PipelineContext = None) -> None:
+        if self._write_behind is None:
+            for sink in sinks:
+                sink.put(item, context)
+        else:
+            for sink in sinks:
+                self._write_behind.put(sink, item, context, self._landed(sink))
+
+    def _store_many(self, sinks: Iterable[_SinkHandler], items: List[Any], context: PipelineContext = None) -> None:
+        if self._write_behind is None:
+            for sink in sinks:
+                sink.put_many(items, context)
+        else:
+            for sink in sinks:
+                self._write_behind.put_many(sink, items, context, self._landed(sink))
+
+    def _landed(self, sink: _SinkHandler) -> Optional[Callable[[], None]]:
+        return partial(self._stored, (sink,)) if self._stored is not None else None
+
+    def _hit(self, query: Mapping[str, Any], result: Any, many: bool, start: float) -> None:
+        elapsed = perf_counter() - start
+        if self._series is not None:
+            self._series.record("hits", elapsed)
+        if self._tracer.active:
+            self._tracer.emit(EventType.SOURCE_HIT, source=self._source, data_type=self._source_type, query=query, many=many, result=result, elapsed=elapsed)
+
+    def _miss(self, query: Mapping[str, Any], error: NotFoundError, many: bool, start: float) -> None:
+        elapsed = perf_counter() - start
+        if self._series is not None:
+            self._series.record("misses", elapsed)
+        if self._tracer.active:
+            self._tracer.emit(EventType.SOURCE_MISS, source=self._source, data_type=self._source_type, query=query, many=many, error=error, elapsed=elapsed)
 
     def get(self, query: Mapping[str, Any], context: PipelineContext = None) -> T:
         """Gets a query from the data source.
@@ -182,34 +378,62 @@ class _SourceHandler(Generic[S, T]):
         Returns:
             The requested object.
         """
-        result = self._source.get(self._source_type, deepcopy(query), context)
-        LOGGER.info("Got result \"{result}\" from query \"{query}\" of source \"{source}\"".format(result=result, query=query, source=self._source))
+        return self.deliver(self.fetch(query, context), context)
+
+    def fetch(self, query: Mapping[str, Any], context: PipelineContext = None) -> S:
+        """Extracts a query from the data source, without inserting it into any sinks or transforming it (step 1 of `get`).
+
+        Args:
+            query: The query being requested.
+            context: The context for the extraction (mutable).
+
+        Returns:
+            The object provided by the data source.
+        """
+        start = perf_counter() if self._series is not None or self._tracer.active else None
+        try:
+            result = self._source.get(self._source_type, _copy_query(query), context)
+        except NotFoundError as error:
+            if start is not None:
+                self._miss(query, error, False, start)
+            raise
+        if start is not None:
+            self._hit(query, result, False, start)
+        return result
+
+    def deliver(self, result: S, context: PipelineContext = None) -> T:
+        """Inserts a result from `fetch` into the data sinks and transforms it into the requested type (steps 2-4 of `get`).
+
+        Args:
+            result: The object provided by the data source.
+            context: The context for the extraction (mutable).
 
-        LOGGER.info("Sending result \"{result}\" to sinks before converting".format(result=result))
-        for sink in self._before_transform:
-            sink.put(result, context)
+        Returns:
+            The requested object.
+        """
+        self._store(self._before_transform, result, context)
 
-        LOGGER.info("Converting result \"{result}\" to request type".format(result=result))
-        result = self._transform(data=result, context=context)
+        if self._transform is not _identity:
+            if self._tracer.active:
+                result = _traced_transform(self._tracer, self._transform, result, context, False)
+            else:
+                result = self._transform(data=result, context=context)
 
-        LOGGER.info("Sending result \"{result}\" to sinks after converting".format(result=result))
-        for sink in self._after_transform:
-            sink.put(result, context)
+        self._store(self._after_transform, result, context)
 
         return result
 
     def _get_many_generator(self, result: Iterable[S], context: PipelineContext = None) -> Generator[T, None, None]:
         for item in result:
-            LOGGER.info("Sending item \"{item}\" to sinks before converting".format(item=item))
-            for sink in self._before_transform:
-                sink.put(item, context)
+            self._store(self._before_transform, item, context)
 
-            LOGGER.info("Converting item \"{item}\" to request type".format(item=item))
-            item = self._transform(data=item, context=context)
+            if self._transform is not _identity:
+                if self._tracer.active:
+                    item = _traced_transform(self._tracer, self._transform, item, context, False)
+                else:
+                    item = self._transform(data=item, context=context)
 
-            LOGGER.info("Sending item \"{item}\" to sinks after converting".format(item=item))
-            for sink in self._after_transform:
-                sink.put(item, context)
+            self._store(self._after_transform, item, context)
 
             yield item
 
@@ -229,37 +453,112 @@ class _SourceHandler(Generic[S, T]):
         Returns:
             The requested objects or a generator of the objects if streaming is True.
         """
-        result = self._source.get_many(self._source_type, deepcopy(query), context)
-        LOGGER.info("Got results \"{result}\" from query \"{query}\" of source \"{source}\"".format(result=result, query=query, source=self._source))
+        start = perf_counter() if self._series is not None or self._tracer.active else None
+        try:
+            result = self._source.get_many(self._source_type, _copy_query(query), context)
+        except PartialResult as partial:
+            if start is not None:
+                self._miss(query, partial, True, start)
+            # Only the objects this source found are delivered. The rest are delivered by the source that finds them.
+            raise partial.replace_found(self._deliver_many(partial.found, context))
+        except NotFoundError as error:
+            if start is not None:
+                self._miss(query, error, True, start)
+            raise
+        if start is not None:
+            self._hit(query, result, True, start)
 
         if not streaming:
-            LOGGER.info("Non-streaming get_many request. Ensuring results \"{result}\" are a Iterable".format(result=result))
-            result = list(result)
+            return self._deliver_many(list(result), context)
+        else:
+            return self._get_many_generator(result, context)
 
-            LOGGER.info("Sending results \"{result}\" to sinks before converting".format(result=result))
-            for sink in self._before_transform:
-                sink.put_many(result, context)
+    def get_bulk(self, queries: List[Mapping[str, Any]], context: PipelineContext = None) -> List[T]:
+        """Gets the objects answering several queries for single objects. If the source can combine the queries (see `DataSource.combine`), they're
+        extracted with a single `get_many`, and otherwise with one `get` each. Either way, the results are inserted into the data sinks together.
 
-            LOGGER.info("Converting results \"{result}\" to request type".format(result=result))
-            result = [self._transform(data=item, context=context) for item in result]
+        Args:
+            queries: The queries being requested.
+            context: The context for the extraction (mutable).
 
-            LOGGER.info("Sending results \"{result}\" to sinks after converting".format(result=result))
-            for sink in self._after_transform:
-                sink.put_many(result, context)
+        Returns:
+            The requested objects in the requested order, with PartialResult.MISSING in place of every object the source didn't find.
+        """
+        query = self._source.combine(self._source_type, [_copy_query(single) for single in queries])
 
-            return result
-        else:
-            LOGGER.info("Streaming get_many request. Returning result generator for results \"{result}\"".format(result=result))
-            return self._get_many_generator(result)
+        if query is not None:
+            try:
+                items = self.get_many(query, context)
+            except PartialResult as partial:
+                items = partial.items
+            except NotFoundError:
+                return [PartialResult.MISSING] * len(queries)
+
+            if len(items) != len(queries):
+                raise ValueError("The combined query returned {count} objects for {queries} queries!".format(count=len(items), queries=len(queries)))
+            return items
+
+        items = []
+        for single in queries:
+            try:
+                items.append(self.fetch(single, context))
+            except NotFoundError:
+                items.append(PartialResult.MISSING)
+
+        found = [item for item in items if item is not PartialResult.MISSING]
+        if not found:
+            return items
+        found = iter(self._deliver_many(found, context))
+        return [item if item is PartialResult.MISSING else next(found) for item in items]
+
+    def _deliver_many(self, result: List[S], context: PipelineContext = None) -> List[T]:
+        self._store_many(self._before_transform, result, context)
+
+        if self._transform is not _identity:
+            if self._tracer.active:
+                result = _traced_transform(self._tracer, self._transform_many, result, context, True)
+            else:
+                result = self._transform_many(data=result, context=context)
+
+        self._store_many(self._after_transform, result, context)
+
+        return result
 
 
 class DataPipeline(object):
-    def __init__(self, elements: Sequence[Union[DataSource, DataSink]], transformers: Iterable[DataTransformer] = None) -> None:
+    _source_handler_class = _SourceHandler
+    _sink_handler_class = _SinkHandler
+    _batcher_class = _Batcher
+    _single_flight_class = _SingleFlight
+
+    def __init__(self, elements: Sequence[Union[DataSource, DataSink]], transformers: Iterable[DataTransformer] = None, compile_plans: bool = True, graph_class: Type[TypeGraph] = TypeGraph,
+                 query_mode: QueryMode = QueryMode.SEQUENTIAL, hedge_delay: float = 0.05, executor: Executor = None, write_behind: WriteBehindQueue = None,
+                 coalesce: bool = False, negative_cache: NegativeCache = None, validators: Mapping[Type, QueryValidator] = None,
+                 subscribers: Iterable[Callable[[Event], None]] = None, batching: Mapping[Type, BatchWindow] = None, metrics: PipelineMetrics = None) -> None:
         """Initializes a data pipeline.
 
         Args:
             elements: The data stores and data sinks for this pipeline.
             transformers: The data transformers for this pipeline.
+            compile_plans: Whether to build the get and put plans for every type in the type graph up front (default True).
+            graph_class: The type graph implementation used to search for conversions (default TypeGraph). Use NetworkXTypeGraph to search with networkx.
+            query_mode: How sources are queried for a `get` (default QueryMode.SEQUENTIAL).
+            hedge_delay: The number of seconds to wait on a source before also querying the next one in QueryMode.HEDGED (default 0.05).
+            executor: The executor that runs source queries in the concurrent query modes (default a thread pool created on first use).
+            write_behind: A queue that inserts results into the data sinks in the background while reading (default None, which inserts them before
+                returning). Explicit `put`s are always written immediately. The queue belongs to the caller, so closing the pipeline flushes it but
+                leaves it open.
+            coalesce: Whether concurrent `get`s of the same type and query share a single request to the sources (default False). Every caller
+                receives the same result object, or the same exception.
+            negative_cache: A cache of queries that sources recently failed to find, which are skipped on repeated `get`s (default None). A source's
+                misses are forgotten when data is put into it through the pipeline.
+            validators: Query validators by requested type, which decide the keys used for coalescing and the negative cache (default None). A
+                validated query's key only covers the keys its validator declares, after defaults are filled in (see `datapipelines.fingerprint`).
+            subscribers: Callables which receive the pipeline's tracing events (default None). See `subscribe`.
+            batching: Batching windows by requested type (default None). Concurrent `get`s of a type with a window are collected into batches and
+                fetched together with `get_bulk`, so a source which can combine queries (see `DataSource.combine`) is sent one `get_many` per batch
+                instead of one `get` per caller. Batched `get`s query sources in order whatever the query mode.
+            metrics: Counters and latency histograms the pipeline records into (default None). See PipelineMetrics.
         """
         if not elements:
             raise ValueError("Elements must be a non-empty sequence of DataSources and DataSinks")
@@ -280,67 +579,146 @@ class DataPipeline(object):
 
         LOGGER.info("Beginning construction of type graph")
         # noinspection PyTypeChecker
-        self._type_graph = _build_type_graph(sources, sinks, transformers)
+        self._type_graph = _build_type_graph(sources, sinks, transformers, graph_class)
         LOGGER.info("Completed construction of type graph")
         self._sources = targets
         self._sinks = sinks
-        self._get_types = {}
-        self._put_types = {}
+        self._paths_from = {}  # type: Dict[Type, Tuple[Mapping[Type, int], Mapping[Type, List[Type]]]]
+        self._paths_to = {}  # type: Dict[Type, Tuple[Mapping[Type, int], Mapping[Type, List[Type]]]]
+        self._get_types = {}  # type: Dict[Type, Optional[Tuple[_SourceHandler, ...]]]
+        self._put_types = {}  # type: Dict[Type, Optional[FrozenSet[_SinkHandler]]]
+        self._planning = _SingleFlight()
+        self._query_mode = query_mode
+        self._hedge_delay = hedge_delay
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._executor_lock = Lock()
+        self._write_behind = write_behind
+        self._coalescing = self._single_flight_class() if coalesce else None
+        self._negative_cache = negative_cache
+        self._validators = dict(validators) if validators is not None else {}
+        self._tracer = Tracer(subscribers)
+        self._metrics = metrics
+
+        # Composite sources whose members are also sinks of the pipeline, which have to forget those members' misses when data is put into them
+        stores = {self._data_store(sink) for sink in sinks}
+        self._composites = []  # type: List[Tuple[CompositeDataSource, Set[DataSource]]]
+        for source in sources:
+            composite = self._data_store(source)
+            if isinstance(composite, CompositeDataSource) and composite._members & stores:
+                self._composites.append((composite, composite._members & stores))
+        self._batchers = {type: self._batcher_class(self._get_bulk, type, window) for type, window in batching.items()} if batching is not None else {}
+
+        if compile_plans:
+            self.compile()
+
+    @property
+    def types(self) -> Set[Type]:
+        """The types known to the pipeline's type graph."""
+        return set(self._type_graph.nodes)
+
+    def compile(self, types: Iterable[Type] = None) -> None:
+        """Builds the get and put plans for a set of types ahead of time, so requests for them are only a lookup.
+
+        Types that aren't compiled (e.g. types only provided by wildcard sources) are planned on their first request instead.
 
-    def _transform(self, source_type: Type[S], target_type: Type[T]) -> Tuple[Callable[[S], T], int]:
+        Args:
+            types: The types to build plans for (default every type in the type graph).
+        """
+        if types is None:
+            types = list(self._type_graph.nodes)
+
+        for type in types:
+            LOGGER.info("Compiling plans for \"{type}\"".format(type=type.__name__))
+            self._get_plan(type)
+            self._put_plan(type)
+
+    def _shortest_paths(self, type: Type, reverse: bool = False) -> Tuple[Mapping[Type, int], Mapping[Type, List[Type]]]:
+        """Finds the cheapest conversion paths between a type and every type reachable from it with a single search.
+
+        Args:
+            type: The origin type of the search.
+            reverse: If True, the paths lead from every type that can reach `type` to `type` rather than from `type` to every type it can reach.
+
+        Returns:
+            The cost of each path and the path itself (as a list of types starting with the source type), keyed by the other end of the path.
+        """
+        cache = self._paths_to if reverse else self._paths_from
         try:
-            LOGGER.info("Searching type graph for shortest path from \"{source_type}\" to \"{target_type}\"".format(source_type=source_type.__name__, target_type=target_type.__name__))
-            path = dijkstra_path(self._type_graph, source=source_type, target=target_type, weight="cost")
-            LOGGER.info("Found a path from \"{source_type}\" to \"{target_type}\"".format(source_type=source_type.__name__, target_type=target_type.__name__))
-        except (KeyError, NetworkXNoPath):
-            raise NoConversionError("Pipeline can't convert \"{source_type}\" to \"{target_type}\"".format(source_type=source_type, target_type=target_type))
+            return cache[type]
+        except KeyError:
+            pass
 
-        LOGGER.info("Building transformer chain from \"{source_type}\" to \"{target_type}\"".format(source_type=source_type.__name__, target_type=target_type.__name__))
+        LOGGER.info("Searching type graph for shortest paths {direction} \"{type}\"".format(direction="to" if reverse else "from", type=type.__name__))
+        distances, paths = self._type_graph.shortest_paths(type, reverse)
+
+        cache[type] = distances, paths
+        return distances, paths
+
+    def _chain(self, path: Sequence[Type]) -> Tuple[Callable[[S], T], int]:
         chain = []
         cost = 0
         for source, target in _pairwise(path):
             transformer = self._type_graph.adj[source][target][_TRANSFORMER]
-            chain.append((transformer, target))
+            chain.append((transformer, source, target))
             cost += transformer.cost
-        LOGGER.info("Built transformer chain from \"{source_type}\" to \"{target_type}\"".format(source_type=source_type.__name__, target_type=target_type.__name__))
 
         if not chain:
             return _identity, 0
 
-        return partial(_transform, transformer_chain=chain), cost
+        return self._compile_chain(chain), cost
+
+    def _compile_chain(self, chain: Sequence[Tuple[DataTransformer, Type, Type]]) -> Callable[[S], T]:
+        # Each conversion's implementation is looked up once here, rather than dispatched on every call
+        stages = [(transformer, from_type, to_type, transformer.resolve(from_type, to_type)) for transformer, from_type, to_type in chain]
+        batches = [(transformer, from_type, to_type, transformer.resolve_many(from_type, to_type)) for transformer, from_type, to_type in chain]
+        transform = _fuse([stage for _, _, _, stage in stages])
+        transform.many = _fuse([stage for _, _, _, stage in batches])
+        # The stages are kept so that tracing can time each edge of the chain
+        transform.stages = stages
+        transform.many.stages = batches
+        return transform
+
+    def _transform(self, source_type: Type[S], target_type: Type[T]) -> Tuple[Callable[[S], T], int]:
+        distances, paths = self._shortest_paths(source_type)
+        try:
+            path = paths[target_type]
+        except KeyError:
+            raise NoConversionError("Pipeline can't convert \"{source_type}\" to \"{target_type}\"".format(source_type=source_type, target_type=target_type))
+
+        LOGGER.info("Building transformer chain from \"{source_type}\" to \"{target_type}\"".format(source_type=source_type.__name__, target_type=target_type.__name__))
+        return self._chain(path)
 
     def _best_transform_from(self, source_type: Type[S], target_types: Iterable[Type]) -> Tuple[Callable[[S], Any], Type, int]:
-        best = None
+        distances, paths = self._shortest_paths(source_type)
+
         best_cost = _MAX_TRANSFORM_COST
         to_type = None
         for target_type in target_types:
-            try:
-                transform, cost = self._transform(source_type, target_type)
-                if cost < best_cost:
-                    best = transform
-                    best_cost = cost
-                    to_type = target_type
-            except NoConversionError:
-                pass
-        if best is None:
+            cost = distances.get(target_type, _MAX_TRANSFORM_COST)
+            if cost < best_cost:
+                best_cost = cost
+                to_type = target_type
+        if to_type is None:
             raise NoConversionError("Pipeline can't convert \"{source_type}\" to any of \"{target_types}\"".format(source_type=source_type, target_types=target_types))
+
+        best, best_cost = self._chain(paths[to_type])
         return best, to_type, best_cost
 
     def _best_transform_to(self, target_type: Type[T], source_types: Iterable[Type]) -> Tuple[Callable[[T], Any], Type, int]:
-        best = None
+        distances, paths = self._shortest_paths(target_type, reverse=True)
+
         best_cost = _MAX_TRANSFORM_COST
         from_type = None
         for source_type in source_types:
-            try:
-                transform, cost = self._transform(source_type, target_type)
-                if cost < best_cost:
-                    best = transform
-                    best_cost = cost
-                    from_type = source_type
-            except NoConversionError:
-                pass
-        if best is None:
+            cost = distances.get(source_type, _MAX_TRANSFORM_COST)
+            if cost < best_cost:
+                best_cost = cost
+                from_type = source_type
+        if from_type is None:
             raise NoConversionError("Pipeline can't convert from any of \"{source_types}\" to \"{target_type}\"".format(source_types=source_types, target_type=target_type))
+
+        best, best_cost = self._chain(paths[from_type])
         return best, from_type, best_cost
 
     def _create_sink_handlers_simultaneously(self, before: Type[T], transform: DataTransformer, after: Type[T], targets: Iterable[DataSink]):
@@ -358,24 +736,24 @@ class DataPipeline(object):
 
             if before_transformer is not None and after_transformer is not None:
                 if before_cost < after_cost:
-                    before_transform_handlers.add(_SinkHandler(sink, before_to_type, before_transformer))
+                    before_transform_handlers.add(self._sink_handler_class(sink, before_to_type, before_transformer, self._tracer, self._metrics))
                 else:
-                    after_transform_handlers.add(_SinkHandler(sink, after_to_type, after_transformer))
+                    after_transform_handlers.add(self._sink_handler_class(sink, after_to_type, after_transformer, self._tracer, self._metrics))
             elif before_transformer is not None:
-                before_transform_handlers.add(_SinkHandler(sink, before_to_type, before_transformer))
+                before_transform_handlers.add(self._sink_handler_class(sink, before_to_type, before_transformer, self._tracer, self._metrics))
             elif after_transformer is not None:
-                after_transform_handlers.add(_SinkHandler(sink, after_to_type, after_transformer))
+                after_transform_handlers.add(self._sink_handler_class(sink, after_to_type, after_transformer, self._tracer, self._metrics))
         return before_transform_handlers, after_transform_handlers
 
     def _create_sink_handlers(self, type: Type[T], targets: Iterable[DataSink]) -> Set[DataSink]:
         sink_handlers = set()
         for sink in targets:
             if TYPE_WILDCARD in sink.accepts or type in sink.accepts:
-                sink_handlers.add(_SinkHandler(sink, type, _identity))
+                sink_handlers.add(self._sink_handler_class(sink, type, _identity, self._tracer, self._metrics))
             else:
                 try:
                     transform, store_type, cost = self._best_transform_from(type, sink.accepts)
-                    sink_handlers.add(_SinkHandler(sink, store_type, transform))
+                    sink_handlers.add(self._sink_handler_class(sink, store_type, transform, self._tracer, self._metrics))
                 except NoConversionError:
                     pass
 
@@ -386,7 +764,7 @@ class DataPipeline(object):
         for source, targets in self._sources:
             if TYPE_WILDCARD in source.provides or type in source.provides:
                 sink_handlers = self._create_sink_handlers(type, targets)
-                source_handlers.append(_SourceHandler(source, type, _identity, {sink_handler: False for sink_handler in sink_handlers}))
+                source_handlers.append(self._source_handler_class(source, type, _identity, {sink_handler: False for sink_handler in sink_handlers}, self._write_behind, self._tracer, self._metrics, self._stored_behind))
             else:
                 try:
                     transform, source_type, cost = self._best_transform_to(type, source.provides)
@@ -394,7 +772,7 @@ class DataPipeline(object):
                     pre_handlers, post_handlers = self._create_sink_handlers_simultaneously(source_type, transform, type, targets)
                     sink_handlers = {sink_handler: False for sink_handler in pre_handlers}
                     sink_handlers.update({sink_handler: True for sink_handler in post_handlers})
-                    source_handlers.append(_SourceHandler(source, source_type, transform, sink_handlers))
+                    source_handlers.append(self._source_handler_class(source, source_type, transform, sink_handlers, self._write_behind, self._tracer, self._metrics, self._stored_behind))
                 except NoConversionError:
                     pass
 
@@ -416,6 +794,117 @@ class DataPipeline(object):
 
         return handlers
 
+    def _build_get_plan(self, type: Type[T]) -> Optional[Tuple[_SourceHandler, ...]]:
+        try:
+            return tuple(self._get_handlers(type))
+        except NoConversionError:
+            return None
+
+    def _build_put_plan(self, type: Type[T]) -> Optional[FrozenSet[_SinkHandler]]:
+        try:
+            return frozenset(self._put_handlers(type))
+        except NoConversionError:
+            return None
+
+    def _store_get_plan(self, type: Type[T]) -> Optional[Tuple[_SourceHandler, ...]]:
+        # Another thread may have finished building the plan between our lookup and joining the flight
+        try:
+            return self._get_types[type]
+        except KeyError:
+            pass
+
+        LOGGER.info("Building new SourceHandlers for \"{type}\"".format(type=type.__name__))
+        plan = self._build_get_plan(type)
+        self._get_types[type] = plan
+        return plan
+
+    def _store_put_plan(self, type: Type[T]) -> Optional[FrozenSet[_SinkHandler]]:
+        try:
+            return self._put_types[type]
+        except KeyError:
+            pass
+
+        LOGGER.info("Building new SinkHandlers for \"{type}\"".format(type=type.__name__))
+        plan = self._build_put_plan(type)
+        self._put_types[type] = plan
+        return plan
+
+    def _get_plan(self, type: Type[T]) -> Optional[Tuple[_SourceHandler, ...]]:
+        # Built plans are never replaced, so they're looked up without a lock. Only one thread builds a missing plan; the rest wait for it.
+        try:
+            return self._get_types[type]
+        except KeyError:
+            return self._planning.do((_SOURCES, type), self._store_get_plan, type)
+
+    def _put_plan(self, type: Type[T]) -> Optional[FrozenSet[_SinkHandler]]:
+        try:
+            return self._put_types[type]
+        except KeyError:
+            return self._planning.do((_SINKS, type), self._store_put_plan, type)
+
+    def flush(self) -> None:
+        """Blocks until every write queued on the pipeline's write-behind queue has been carried out."""
+        if self._write_behind is not None:
+            self._write_behind.flush()
+
+    def close(self) -> None:
+        """Carries out any queued writes and releases the pipeline's background threads. A write-behind queue is flushed rather than closed, since
+        it was given to the pipeline and may be shared with others."""
+        if self._write_behind is not None:
+            self._write_behind.flush()
+        with self._executor_lock:
+            executor = self._executor if self._owns_executor else None
+            if executor is not None:
+                self._executor = None
+        if executor is not None:
+            executor.shutdown()
+
+    def subscribe(self, subscriber: Callable[[Event], None]) -> None:
+        """Adds a subscriber to the pipeline's tracing events (see EventType).
+
+        Events are only built while the pipeline has subscribers, and are only formatted if a subscriber converts them to strings. Use a
+        LoggingSubscriber to log them.
+
+        Args:
+            subscriber: A callable taking an Event. It's called on the thread doing the work, so it should be quick. Exceptions it raises are
+                logged and otherwise ignored.
+        """
+        self._tracer.subscribe(subscriber)
+
+    def unsubscribe(self, subscriber: Callable[[Event], None]) -> None:
+        """Removes a subscriber from the pipeline's tracing events.
+
+        Args:
+            subscriber: A subscriber previously passed to `subscribe`.
+
+        Raises:
+            ValueError: If the subscriber isn't subscribed.
+        """
+        self._tracer.unsubscribe(subscriber)
+
+    def _traced(self, type: Type[T], query: Mapping[str, Any], many: bool, get: Callable[[], Any]) -> Any:
+        tracing = self._tracer.active
+        if tracing:
+            self._tracer.emit(EventType.GET_START, data_type=type, query=query, many=many)
+        start = perf_counter()
+        try:
+            result = get()
+        except Exception as error:
+            self._got(type, query, many, start, tracing, error=error)
+            raise
+        self._got(type, query, many, start, tracing, result=result)
+        return result
+
+    def _got(self, type: Type[T], query: Mapping[str, Any], many: bool, start: float, tracing: bool, **outcome: Any) -> None:
+        elapsed = perf_counter() - start
+        if self._metrics is not None:
+            series = self._metrics._get(_GETS_FAMILY, (type, many))
+            series.record("requests", elapsed)
+            if "error" in outcome:
+                series.counters["errors"] += 1
+        if tracing:
+            self._tracer.emit(EventType.GET_END, data_type=type, query=query, many=many, elapsed=elapsed, **outcome)
+
     def _new_context(self) -> PipelineContext:
         context = PipelineContext()
         context[PipelineContext.Keys.PIPELINE] = self
@@ -436,29 +925,125 @@ class DataPipeline(object):
         Returns:
             The requested object.
         """
-        LOGGER.info("Getting SourceHandlers for \"{type}\"".format(type=type.__name__))
+        if self._tracer.active or self._metrics is not None:
+            return self._traced(type, query, False, lambda: self._get_coalesced(type, query))
+        return self._get_coalesced(type, query)
+
+    def _get_coalesced(self, type: Type[T], query: Mapping[str, Any]) -> T:
+        key = None
+        if self._coalescing is not None or self._negative_cache is not None:
+            key = self._fingerprint(type, query)
+
+        if self._coalescing is not None and key is not None:
+            return self._coalescing.do((type, key), self._get, type, query, key)
+
+        return self._get(type, query, key)
+
+    def _fingerprint(self, type: Type[T], query: Mapping[str, Any]) -> Optional[Hashable]:
         try:
-            handlers = self._get_types[type]
-        except KeyError:
-            try:
-                LOGGER.info("Building new SourceHandlers for \"{type}\"".format(type=type.__name__))
-                handlers = self._get_handlers(type)
-            except NoConversionError:
-                handlers = None
-            self._get_types[type] = handlers
+            return fingerprint(query, self._validators.get(type))
+        except (TypeError, QueryValidationError):
+            # Formatting the query can be expensive, and this happens on every get of such a query
+            if LOGGER.isEnabledFor(INFO):
+                LOGGER.info("Query \"%s\" can't be fingerprinted, so it won't be coalesced or cached", query)
+            return None
+
+    def _get(self, type: Type[T], query: Mapping[str, Any], key: Hashable = None) -> T:
+        if self._batchers:
+            batcher = self._batchers.get(type)
+            if batcher is not None:
+                return batcher.get(query)
+
+        handlers = self._get_plan(type)
 
         if handlers is None:
             raise NoConversionError("No source can provide \"{type}\"".format(type=type.__name__))
 
-        LOGGER.info("Creating new PipelineContext")
-        context = self._new_context()
+        if self._negative_cache is not None and key is not None:
+            handlers = [handler for handler in handlers if not self._negative_cache.contains(self._data_store(handler._source), handler._source_type, key)]
 
-        LOGGER.info("Querying SourceHandlers for \"{type}\"".format(type=type.__name__))
+        if self._query_mode is not QueryMode.SEQUENTIAL and len(handlers) > 1:
+            return self._get_concurrently(handlers, query, key)
+
+        context = self._new_context()
         for handler in handlers:
             try:
-                return handler.get(query, context)
+                result = handler.get(query, context)
             except NotFoundError:
-                pass
+                self._missed(handler, key)
+                continue
+            self._found(handler, key)
+            return result
+
+        raise NotFoundError("No source returned a query result!")
+
+    def _missed(self, handler: _SourceHandler, key: Hashable) -> None:
+        if self._negative_cache is not None and key is not None:
+            self._negative_cache.add(self._data_store(handler._source), handler._source_type, key)
+
+    def _found(self, handler: _SourceHandler, key: Hashable) -> None:
+        # The result was just put into the handler's sinks, so any of them that missed the query before may have it now
+        if self._negative_cache is not None and key is not None or self._composites:
+            sinks = {self._data_store(sink._sink) for sink in handler._before_transform}
+            sinks.update(self._data_store(sink._sink) for sink in handler._after_transform)
+            if sinks:
+                sinks.update(self._forget_composite_misses(sinks))
+                if self._negative_cache is not None and key is not None:
+                    self._negative_cache.invalidate(sinks, key)
+
+    def _get_concurrently(self, handlers: Sequence[_SourceHandler], query: Mapping[str, Any], key: Hashable = None) -> T:
+        executor = self._executor
+        if executor is None:
+            # Only one thread creates the pool, so concurrent first requests don't each start (and leak) their own
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(thread_name_prefix="datapipelines")
+                executor = self._executor
+
+        # Each call gets its own context, since they run at the same time. The winner's context is the one used to finish the request.
+        calls = {}  # type: Dict[Future, Tuple[int, _SourceHandler, PipelineContext]]
+        pending = set()
+
+        def query_next() -> None:
+            priority = len(calls)
+            handler = handlers[priority]
+            context = self._new_context()
+            future = executor.submit(handler.fetch, query, context)
+            calls[future] = (priority, handler, context)
+            pending.add(future)
+
+        query_next()
+        if self._query_mode is QueryMode.SCATTER:
+            while len(calls) < len(handlers):
+                query_next()
+
+        try:
+            while pending:
+                hedge = self._query_mode is QueryMode.HEDGED and len(calls) < len(handlers)
+                done, pending = wait(pending, timeout=self._hedge_delay if hedge else None, return_when=FIRST_COMPLETED)
+
+                if not done:
+                    LOGGER.info("Hedging after {delay}s without a result".format(delay=self._hedge_delay))
+                    query_next()
+                    continue
+
+                for future in sorted(done, key=lambda future: calls[future][0]):
+                    priority, handler, context = calls[future]
+                    try:
+                        result = future.result()
+                    except NotFoundError:
+                        self._missed(handler, key)
+                        continue
+                    result = handler.deliver(result, context)
+                    self._found(handler, key)
+                    return result
+
+                # Everything that finished came up empty, so move on to the next source right away rather than waiting out the delay
+                if len(calls) < len(handlers):
+                    query_next()
+        finally:
+            for future in pending:
+                future.cancel()
 
         raise NotFoundError("No source returned a query result!")
 
@@ -478,56 +1063,114 @@ class DataPipeline(object):
         Returns:
             The requested objects or a generator of the objects if streaming is True.
         """
-        LOGGER.info("Getting SourceHandlers for \"{type}\"".format(type=type.__name__))
-        try:
-            handlers = self._get_types[type]
-        except KeyError:
-            try:
-                LOGGER.info("Building new SourceHandlers for \"{type}\"".format(type=type.__name__))
-                handlers = self._get_handlers(type)
-            except NoConversionError:
-                handlers = None
-            self._get_types[type] = handlers
+        if self._tracer.active or self._metrics is not None:
+            return self._traced(type, query, True, lambda: self._get_many(type, query, streaming))
+        return self._get_many(type, query, streaming)
+
+    def _get_many(self, type: Type[T], query: Mapping[str, Any], streaming: bool = False) -> Iterable[T]:
+        handlers = self._get_plan(type)
 
         if handlers is None:
             raise NoConversionError("No source can provide \"{type}\"".format(type=type.__name__))
 
-        LOGGER.info("Creating new PipelineContext")
         context = self._new_context()
-
-        LOGGER.info("Querying SourceHandlers for \"{type}\"".format(type=type.__name__))
+        partial = None  # type: PartialResult
         for handler in handlers:
             try:
-                return handler.get_many(query, context, streaming)
+                # Once some objects are found, the rest are collected in full so they can be merged in
+                result = handler.get_many(query, context, streaming and partial is None)
+            except PartialResult as error:
+                partial = error if partial is None else PartialResult(partial.merge(error.items), error.residual)
+                query = partial.residual
+                continue
             except NotFoundError:
-                pass
+                continue
+
+            if partial is None:
+                return result
+
+            result = partial.merge(result)
+            return (item for item in result) if streaming else result
 
+        if partial is not None:
+            raise partial
         raise NotFoundError("No source returned a query result!")
 
+    def get_bulk(self, type: Type[T], queries: Iterable[Mapping[str, Any]]) -> List[T]:
+        """Gets the objects answering several queries for single objects, with one request per source rather than one per query.
+
+        Each source is sent only the queries the sources before it didn't find, combined into a single `get_many` if the source can combine them
+        (see `DataSource.combine`) and through `get` otherwise. What each source finds is inserted into the data sinks with one `put_many`. Sources
+        are queried in order whatever the query mode, and bulk requests aren't coalesced.
+
+        Args:
+            type: The type of the objects being requested.
+            queries: The queries for the single objects.
+
+        Returns:
+            The requested objects, in the order of the queries.
+
+        Raises:
+            PartialResult: If only some of the objects were found. Its residual is the list of queries for the missing objects.
+            NotFoundError: If none of the objects were found.
+        """
+        queries = list(queries)
+        if self._tracer.active or self._metrics is not None:
+            return self._traced(type, queries, True, lambda: self._get_bulk(type, queries))
+        return self._get_bulk(type, queries)
+
+    def _get_bulk(self, type: Type[T], queries: List[Mapping[str, Any]]) -> List[T]:
+        handlers = self._get_plan(type)
+
+        if handlers is None:
+            raise NoConversionError("No source can provide \"{type}\"".format(type=type.__name__))
+
+        if self._negative_cache is not None:
+            keys = [self._fingerprint(type, query) for query in queries]
+        else:
+            keys = [None] * len(queries)
+
+        context = self._new_context()
+        results = [PartialResult.MISSING] * len(queries)
+        pending = list(range(len(queries)))
+        for handler in handlers:
+            if not pending:
+                break
+
+            requested = pending
+            if self._negative_cache is not None:
+                requested = [index for index in pending if keys[index] is None or not self._negative_cache.contains(self._data_store(handler._source), handler._source_type, keys[index])]
+                if not requested:
+                    continue
+
+            items = handler.get_bulk([queries[index] for index in requested], context)
+            for index, item in zip(requested, items):
+                if item is PartialResult.MISSING:
+                    self._missed(handler, keys[index])
+                else:
+                    results[index] = item
+                    self._found(handler, keys[index])
+            pending = [index for index in pending if results[index] is PartialResult.MISSING]
+
+        if not pending:
+            return results
+        if len(pending) == len(queries):
+            raise NotFoundError("No source returned a query result!")
+        raise PartialResult(results, [queries[index] for index in pending])
+
     def put(self, type: Type[T], item: T) -> None:
         """Puts an objects into the data pipeline. The object may be transformed into a new type for insertion if necessary.
 
         Args:
             item: The object to be inserted into the data pipeline.
         """
-        LOGGER.info("Getting SinkHandlers for \"{type}\"".format(type=type.__name__))
-        try:
-            handlers = self._put_types[type]
-        except KeyError:
-            try:
-                LOGGER.info("Building new SinkHandlers for \"{type}\"".format(type=type.__name__))
-                handlers = self._put_handlers(type)
-            except NoConversionError:
-                handlers = None
-            self._get_types[type] = handlers
-
-        LOGGER.info("Creating new PipelineContext")
+        handlers = self._put_plan(type)
         context = self._new_context()
 
-        LOGGER.info("Sending item \"{item}\" to SourceHandlers".format(item=item))
         if handlers is not None:
             for handler in handlers:
                 handler.put(item, context)
+            self._stored(handlers)
 
     def put_many(self, type: Type[T], items: Iterable[T]) -> None:
         """Puts multiple objects of the same type into the data sink. The objects may be transformed into a new type for insertion if necessary.
@@ -535,22 +1178,42 @@ class DataPipeline(object):
         Args:
             items: An iterable (e.g. list) of objects to be inserted into the data pipeline.
         """
-        LOGGER.info("Getting SinkHandlers for \"{type}\"".format(type=type.__name__))
-        try:
-            handlers = self._put_types[type]
-        except KeyError:
-            try:
-                LOGGER.info("Building new SinkHandlers for \"{type}\"".format(type=type.__name__))
-                handlers = self._put_handlers(type)
-            except NoConversionError:
-                handlers = None
-            self._get_types[type] = handlers
-
-        LOGGER.info("Creating new PipelineContext")
+        handlers = self._put_plan(type)
         context = self._new_context()
 
-        LOGGER.info("Sending items \"{items}\" to SourceHandlers".format(items=items))
         if handlers is not None:
             items = list(items)
             for handler in handlers:
                 handler.put_many(items, context)
+            self._stored(handlers)
+
+    @property
+    def _stored_behind(self) -> Optional[Callable[[Iterable[_SinkHandler]], None]]:
+        # Write-behind writes land after the get that queued them has returned. Misses recorded in between are only forgotten once they have.
+        if self._write_behind is not None and (self._negative_cache is not None or self._composites):
+            return self._stored
+        return None
+
+    def _stored(self, handlers: Iterable[_SinkHandler]) -> None:
+        # There's no telling which queries the new items answer, so every miss of the sinks that received them is forgotten
+        if self._negative_cache is not None or self._composites:
+            sinks = {self._data_store(handler._sink) for handler in handlers}
+            sinks.update(self._forget_composite_misses(sinks))
+            if self._negative_cache is not None:
+                self._negative_cache.invalidate(sinks)
+
+    def _forget_composite_misses(self, sinks: Set[Any]) -> Set[CompositeDataSource]:
+        # Composite sources forget every miss of their members that received data, since their keys don't account for the pipeline's validators.
+        # Each of them may now find the data itself, so its own misses are forgotten along with the sinks'.
+        composites = set()
+        for composite, members in self._composites:
+            members = members & sinks
+            if members:
+                composite.invalidate(members)
+                composites.add(composite)
+        return composites
+
+    @staticmethod
+    def _data_store(element: Any) -> Any:
+        # The data store behind a source or sink, which is what the negative cache remembers misses of
+        return element
@@ -1,11 +1,13 @@
+import builtins
 import sys
 from abc import ABC, abstractmethod
 from enum import Enum
+from collections import abc
 from copy import deepcopy
-from typing import Type, MutableMapping, Any, Iterable, Union, Callable
+from typing import Type, Mapping, MutableMapping, Any, Iterable, Iterator, Union, Callable, Hashable, FrozenSet, Dict, AbstractSet, Sequence
 from functools import wraps
 
-from .pipelines import PipelineContext
+from .common import PipelineContext
 
 
 class QueryValidationError(ValueError):
@@ -170,7 +172,7 @@ class _TypeNode(_ValidationNode):
                 if isinstance(value, type):
                     query[self.key] = value
                     return True
-            raise WrongValueTypeError("{key} must be of type {type} in query! Got {badtype}.".format(key=self.key, type=self, badtype=type(value)))
+            raise WrongValueTypeError("{key} must be of type {type} in query! Got {badtype}.".format(key=self.key, type=self, badtype=builtins.type(value)))
         except KeyError:
             if self.child:
                 self.child.evaluate(query, context)
@@ -199,20 +201,278 @@ class _KeyNode(_ValidationNode):
         return has_key
 
 
+def _resolve_type(type: Type) -> Type:
+    # The typing module contains a reference to the actual type via __origin__. Get that actual type for use in `issubclass`. This only works for python 3.7+, not 3.6 or below.
+    if sys.version_info.minor >= 7 and hasattr(type, "__origin__"):
+        return type.__origin__
+    return type
+
+
+class _Compiler(object):
+    """Lowers a validation tree into the source of a single function, which does exactly what evaluating the tree does.
+
+    Given a shape (the set of the validator's keys that are in the query), the function is specialized to queries of that shape, so that key
+    lookups are decided while compiling rather than on every call.
+    """
+
+    def __init__(self, shape: AbstractSet[str] = None) -> None:
+        self.present = set(shape) if shape is not None else None  # type: Set[str]
+        self.lines = []  # type: List[str]
+        self.namespace = {
+            "MissingKeyError": MissingKeyError,
+            "WrongValueTypeError": WrongValueTypeError,
+            "BoundKeyExistenceError": BoundKeyExistenceError,
+            "deepcopy": deepcopy,
+            "type_": type
+        }  # type: Dict[str, Any]
+        self._names = 0
+
+    def name(self, prefix: str) -> str:
+        self._names += 1
+        return "{prefix}{index}".format(prefix=prefix, index=self._names)
+
+    def constant(self, value: Any, prefix: str = "c") -> str:
+        name = self.name(prefix)
+        self.namespace[name] = value
+        return name
+
+    def emit(self, indent: int, line: str) -> None:
+        self.lines.append("    " * indent + line)
+
+    def node(self, node: _ValidationNode, indent: int) -> str:
+        """Emits a node, and returns the name of the variable holding its result."""
+        if isinstance(node, _KeyNode):
+            return self.key_node(node, indent)
+        if isinstance(node, _AndNode):
+            return self.and_node(node, indent)
+        if isinstance(node, _OrNode):
+            return self.or_node(node, indent)
+        raise TypeError("Can't compile {node}".format(node=node.__class__.__name__))
+
+    def key_node(self, node: _KeyNode, indent: int) -> str:
+        result = self.name("has")
+        key = self.constant(node.key, "key")
+        if self.present is not None:
+            has_key = node.key in self.present
+            self.emit(indent, "{result} = {has_key}".format(result=result, has_key=has_key))
+            if node.required and not has_key:
+                message = self.constant("{key} must be in query!".format(key=node.key), "message")
+                self.emit(indent, "raise MissingKeyError({message})".format(message=message))
+                return result
+        else:
+            self.emit(indent, "{result} = {key} in query".format(result=result, key=key))
+            if node.required:
+                message = self.constant("{key} must be in query!".format(key=node.key), "message")
+                self.emit(indent, "if not {result}:".format(result=result))
+                self.emit(indent + 1, "raise MissingKeyError({message})".format(message=message))
+        if node.child:
+            self.type_node(node.child, key, indent)
+        return result
+
+    def type_node(self, node: _TypeNode, key: str, indent: int) -> None:
+        types = [(self.constant(_resolve_type(type), "type"), issubclass(_resolve_type(type), Enum)) for type in node.types]
+
+        if self.present is None:
+            self.emit(indent, "try:")
+            self.emit(indent + 1, "value = query[{key}]".format(key=key))
+            self.emit(indent, "except KeyError:")
+            if node.child:
+                self.default_node(node.child, key, indent + 1)
+            else:
+                self.emit(indent + 1, "pass")
+            self.emit(indent, "else:")
+            indent += 1
+        elif node.key in self.present:
+            self.emit(indent, "value = query[{key}]".format(key=key))
+        else:
+            if node.child:
+                self.default_node(node.child, key, indent)
+                # The default is in the query from here on
+                self.present.add(node.key)
+            return
+
+        if not any(is_enum for _, is_enum in types):
+            # Without Enums the value never changes, so the types can be checked all at once
+            self.emit(indent, "if isinstance(value, {types}):".format(types=self.constant(tuple(self.namespace[name] for name, _ in types), "types")))
+            self.emit(indent + 1, "query[{key}] = value".format(key=key))
+            self.emit(indent, "else:")
+            indent += 1
+        else:
+            for name, is_enum in types:
+                if is_enum:
+                    self.emit(indent, "if isinstance(value, str):")
+                    self.emit(indent + 1, "value = {type}(value)".format(type=name))
+                self.emit(indent, "if isinstance(value, {type}):".format(type=name))
+                self.emit(indent + 1, "query[{key}] = value".format(key=key))
+                self.emit(indent, "else:")
+                indent += 1
+
+        message = self.constant("{key} must be of type {type} in query! Got ".format(key=node.key, type=node), "message")
+        self.emit(indent, "raise WrongValueTypeError({message} + str(type_(value)) + \".\")".format(message=message))
+
+    def default_node(self, node: _DefaultValueNode, key: str, indent: int) -> None:
+        value = self.constant(node.value, "default")
+        if node.supplies_type:
+            self.emit(indent, "query[{key}] = {value}(query, context)".format(key=key, value=value))
+        elif node.value.__class__ in _IMMUTABLE_TYPES or isinstance(node.value, Enum):
+            # Copying these would return the same object anyway
+            self.emit(indent, "query[{key}] = {value}".format(key=key, value=value))
+        else:
+            self.emit(indent, "query[{key}] = deepcopy({value})".format(key=key, value=value))
+
+    def and_node(self, node: _AndNode, indent: int) -> str:
+        results = [(self.node(child, indent), child.falsifiable) for child in node.children]
+        all_true = " and ".join(result for result, _ in results)
+        all_possible_false = " and ".join("not {result}".format(result=result) for result, falsifiable in results if falsifiable) or "True"
+        message = self.constant("Query must have all or none of the elements joined with \"and\" in a \"can_have\" statement!", "message")
+        self.emit(indent, "if not (({all_possible_false}) or ({all_true})):".format(all_possible_false=all_possible_false, all_true=all_true))
+        self.emit(indent + 1, "raise BoundKeyExistenceError({message})".format(message=message))
+        result = self.name("all")
+        self.emit(indent, "{result} = True".format(result=result))
+        return result
+
+    def or_node(self, node: _OrNode, indent: int) -> str:
+        result = self.name("any")
+        failures = self.name("failures")
+        error = self.name("error")
+        self.emit(indent, "{result} = False".format(result=result))
+        self.emit(indent, "{failures} = 0".format(failures=failures))
+        self.emit(indent, "{error} = None".format(error=error))
+        for child in node.children:
+            self.emit(indent, "try:")
+            child_result = self.node(child, indent + 1)
+            self.emit(indent, "except (MissingKeyError, BoundKeyExistenceError) as caught:")
+            self.emit(indent + 1, "if {error} is None:".format(error=error))
+            self.emit(indent + 2, "{error} = caught".format(error=error))
+            self.emit(indent + 1, "{failures} += 1".format(failures=failures))
+            self.emit(indent, "else:")
+            self.emit(indent + 1, "if not {child}:".format(child=child_result))
+            self.emit(indent + 2, "{failures} += 1".format(failures=failures))
+            self.emit(indent + 1, "{result} = {child} or {result}".format(result=result, child=child_result))
+        self.emit(indent, "if {failures} == {count} and {error} is not None:".format(failures=failures, count=len(node.children), error=error))
+        self.emit(indent + 1, "raise {error}".format(error=error))
+        return result
+
+    def compile(self, root: _RootNode) -> Callable[[MutableMapping[str, Any], PipelineContext], bool]:
+        self.emit(0, "def validate(query, context=None):")
+        for child in root.children:
+            self.node(child, 1)
+        self.emit(1, "return True")
+
+        source = "\n".join(self.lines)
+        exec(compile(source, "<compiled QueryValidator>", "exec"), self.namespace)
+        validate = self.namespace["validate"]
+        validate.source = source
+        return validate
+
+
+# The most query shapes a validator specializes functions for in validate_many
+_MAX_SHAPES = 256
+
+
 class QueryValidator(object):
     def __init__(self) -> None:
         self._root = _RootNode()
         self._current = None  # type: _KeyNode
         self._parent = None  # type: Union[_AndNode, _OrNode]
+        self._keys = None  # type: FrozenSet[str]
+        self._compiled = None  # type: Callable[[MutableMapping[str, Any], PipelineContext], True]
+        self._shapes = {}  # type: Dict[FrozenSet[str], Callable[[MutableMapping[str, Any], PipelineContext], True]]
 
     def __call__(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> True:
-        return self._root.evaluate(query, context)
+        if self._compiled is None:
+            self.compile()
+        return self._compiled(query, context)
+
+    def compile(self) -> "QueryValidator":
+        """Lowers the validation tree into a single function, which is used for every validation until the validator is changed again.
+
+        The function does exactly what walking the tree does, with the types resolved ahead of time. Validators compile themselves when first
+        called, so this only needs to be called to move the cost of compiling out of the first validation (`validate_query` does so).
+
+        Returns:
+            The validator.
+        """
+        try:
+            self._compiled = _Compiler().compile(self._root)
+        except TypeError:
+            # Types that can't be resolved ahead of time (e.g. typing.Union) fail the same way when the tree is walked, so the tree is kept
+            self._compiled = self._root.evaluate
+        return self
+
+    def validate_many(self, queries: Sequence[MutableMapping[str, Any]], context: PipelineContext = None, pre_transforms: Iterable[Callable[[MutableMapping], None]] = ()) -> Dict[int, ValueError]:
+        """Validates a batch of queries in one pass, filling in defaults as validating each of them one at a time would.
+
+        Queries are grouped by shape (which of the validator's keys they have), and each shape is validated by a function specialized to it, so
+        a batch of similar queries skips the key lookups validating them one at a time makes.
+
+        Args:
+            queries: The queries to validate. They're changed in place by the pre-transforms and defaults.
+            context: The context to validate in (default None).
+            pre_transforms: Applied to each query, in order, before it's validated (as with `validate_query`).
+
+        Returns:
+            The error each query which failed validation raised, by its index in queries. Empty if every query is valid.
+        """
+        pre_transforms = tuple(pre_transforms)
+        keys = self.keys
+        shapes = self._shapes
+        errors = {}  # type: Dict[int, ValueError]
+        for index, query in enumerate(queries):
+            try:
+                for transform in pre_transforms:
+                    transform(query)
+
+                shape = keys.intersection(query)
+                try:
+                    validate = shapes[shape]
+                except KeyError:
+                    validate = self._compile_shape(shape)
+                validate(query, context)
+            except ValueError as error:
+                errors[index] = error
+        return errors
+
+    def _compile_shape(self, shape: FrozenSet[str]) -> Callable[[MutableMapping[str, Any], PipelineContext], True]:
+        if len(self._shapes) >= _MAX_SHAPES:
+            # Too many distinct shapes to be worth specializing for, so the rest share the general function
+            if self._compiled is None:
+                self.compile()
+            return self._compiled
+
+        try:
+            validate = _Compiler(shape).compile(self._root)
+        except TypeError:
+            validate = self._root.evaluate
+        self._shapes[shape] = validate
+        return validate
+
+    def _changed(self) -> None:
+        self._keys = None
+        self._compiled = None
+        self._shapes = {}
+
+    @property
+    def keys(self) -> FrozenSet[str]:
+        """The keys this validator declares, whether required or optional."""
+        if self._keys is None:
+            keys = set()
+            nodes = [self._root]
+            while nodes:
+                node = nodes.pop()
+                if isinstance(node, _KeyNode):
+                    keys.add(node.key)
+                else:
+                    nodes.extend(node.children)
+            self._keys = frozenset(keys)
+        return self._keys
 
     def has(self, key: str) -> "QueryValidator":
         if self._current is not None:
             raise QueryValidatorStructureError("A key is already selected! Try using \"also\" before \"has\".")
 
         has_node = _KeyNode(key, True)
+        self._changed()
         self._root.children.append(has_node)
         self._current = has_node
         self._parent = self._root
@@ -223,6 +483,7 @@ class QueryValidator(object):
             raise QueryValidatorStructureError("A key is already selected! Try using \"also\" before \"can_have\".")
 
         has_node = _KeyNode(key, False)
+        self._changed()
         self._root.children.append(has_node)
         self._current = has_node
         self._parent = self._root
@@ -234,6 +495,7 @@ class QueryValidator(object):
 
         type_node = _TypeNode(self._current.key, {type})
         self._current.child = type_node
+        self._changed()
         return self
 
     def as_any_of(self, types: Iterable[Type]) -> "QueryValidator":
@@ -242,6 +504,7 @@ class QueryValidator(object):
 
         type_node = _TypeNode(self._current.key, types)
         self._current.child = type_node
+        self._changed()
         return self
 
     def or_(self, key: str) -> "QueryValidator":
@@ -257,6 +520,7 @@ class QueryValidator(object):
             self._parent = or_node
 
         has_node = _KeyNode(key, self._current.required)
+        self._changed()
         or_node.children.append(has_node)
         self._current = has_node
         return self
@@ -274,6 +538,7 @@ class QueryValidator(object):
             self._parent = and_node
 
         has_node = _KeyNode(key, self._current.required)
+        self._changed()
         and_node.children.append(has_node)
         self._current = has_node
         return self
@@ -302,9 +567,145 @@ class QueryValidator(object):
         default_node = _DefaultValueNode(self._current.key, value, supplies_type)
         result = self.as_(expected_type)
         result._current.child.child = default_node
+        result._changed()
         return result
 
 
+# Frozen containers are tagged with what they were, so e.g. a mapping and a set of pairs don't have equal fingerprints
+_MAPPING = "mapping"
+_SEQUENCE = "sequence"
+_SET = "set"
+
+
+def _freeze(value: Any) -> Hashable:
+    # Mappings become frozensets of items so key order doesn't matter, while sequences keep their order
+    if isinstance(value, Mapping):
+        return _MAPPING, frozenset((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return _SEQUENCE, tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return _SET, frozenset(_freeze(item) for item in value)
+    hash(value)  # Raises a TypeError for anything else that can't be part of a key
+
+    # Values of different types can be equal (True == 1 == 1.0), so anything but the most common types is tagged with its class
+    cls = value.__class__
+    if cls is str or cls is int or value is None:
+        return value
+    return cls, value
+
+
+def fingerprint(query: Mapping[str, Any], validator: QueryValidator = None, context: PipelineContext = None) -> Hashable:
+    """Builds a hashable key for a query. Queries with equal contents have equal fingerprints, regardless of key order. Values of different types
+    have different fingerprints even if they're equal (e.g. True, 1 and 1.0, or a mapping and a set of pairs), but lists and tuples are the same.
+
+    If a validator is given, a copy of the query is validated first so that defaults are filled in and strings are coerced to Enums, and only the
+    keys the validator declares take part in the fingerprint. Queries which differ only in keys the validator ignores have equal fingerprints.
+
+    Args:
+        query: The query.
+        validator: The validator for the query (default None, which fingerprints every key as is).
+        context: The context passed to the validator, e.g. for default suppliers (default None).
+
+    Returns:
+        The fingerprint of the query.
+
+    Raises:
+        TypeError: If the query contains a value that can't be hashed.
+        QueryValidationError: If the query isn't valid according to the validator.
+    """
+    if validator is None:
+        if isinstance(query, FrozenQuery):
+            return query.fingerprint
+        return _freeze(query)
+
+    query = dict(query)
+    validator(query, context)
+    keys = validator.keys
+    return _MAPPING, frozenset((key, _freeze(value)) for key, value in query.items() if key in keys)
+
+
+# Values of these types can't be changed in place, so views share them rather than copying them
+_IMMUTABLE_TYPES = frozenset((str, bytes, int, float, complex, bool, type(None)))
+
+
+def _copy_value(value: Any) -> Any:
+    cls = value.__class__
+    if cls in _IMMUTABLE_TYPES:
+        return value
+    # Flat containers (e.g. lists of ids) are by far the most common query values. Their items are immutable, so a shallow copy isolates them.
+    if cls is tuple or cls is frozenset:
+        if _IMMUTABLE_TYPES.issuperset(map(type, value)):
+            return value
+    elif cls is list or cls is set:
+        if _IMMUTABLE_TYPES.issuperset(map(type, value)):
+            return value.copy()
+    elif cls is dict:
+        if _IMMUTABLE_TYPES.issuperset(map(type, value.values())):
+            return value.copy()
+    elif isinstance(value, Enum):
+        return value
+    return deepcopy(value)
+
+
+def _copy_query(query: Mapping[str, Any]) -> Dict[str, Any]:
+    # The copy handed to a source. It's a real dict, so sources can check for one or JSON encode it, and copying only the mutable values is
+    # enough to keep the source's changes from reaching the caller or the other sources.
+    if isinstance(query, FrozenQuery):
+        query = query._query
+    return {key: _copy_value(value) for key, value in query.items()}
+
+
+class FrozenQuery(abc.Mapping):
+    __slots__ = ("_query", "_fingerprint")
+
+    def __init__(self, query: Mapping[str, Any]) -> None:
+        """An immutable, hashable query. Reading a mutable value returns a copy of it, so the query itself never changes.
+
+        FrozenQueries compare equal to any mapping with the same contents, and hash by their fingerprint (see `fingerprint`), which is computed once.
+
+        Args:
+            query: The query's contents.
+        """
+        self._query = dict(query._query if isinstance(query, FrozenQuery) else query)  # type: Dict[str, Any]
+        self._fingerprint = None  # type: Hashable
+
+    @property
+    def fingerprint(self) -> Hashable:
+        """The query's fingerprint without a validator (see `fingerprint`).
+
+        Raises:
+            TypeError: If the query contains a value that can't be hashed.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = _freeze(self._query)
+        return self._fingerprint
+
+    def __getitem__(self, key: str) -> Any:
+        return _copy_value(self._query[key])
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._query
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._query)
+
+    def __len__(self) -> int:
+        return len(self._query)
+
+    def __hash__(self) -> int:
+        return hash(self.fingerprint)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, FrozenQuery):
+            return self._query == other._query
+        if isinstance(other, abc.Mapping):
+            return self._query == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return "FrozenQuery({query!r})".format(query=self._query)
+
+
 class Query(dict):
     @staticmethod
     def has(key: str) -> QueryValidator:
@@ -316,6 +717,8 @@ class Query(dict):
 
 
 def validate_query(validator: QueryValidator, *pre_transforms: Callable[[MutableMapping], None]) -> Callable[[Callable[[Any, MutableMapping[str, Any], PipelineContext], Union[Any, Iterable[Any]]]], Callable[[Any, MutableMapping[str, Any], PipelineContext], Union[Any, Iterable[Any]]]]:
+    validator.compile()
+
     def wrapper(method: Callable[[Any, MutableMapping[str, Any], PipelineContext], Union[Any, Iterable[Any]]]) -> Callable[[Any, MutableMapping[str, Any], PipelineContext], Union[Any, Iterable[Any]]]:
         @wraps(method)
         def wrapped(self: Any, query: MutableMapping[str, Any], context: PipelineContext = None):
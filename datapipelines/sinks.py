@@ -1,8 +1,13 @@
 from abc import ABC, abstractmethod
 from functools import singledispatch, update_wrapper
-from typing import TypeVar, Type, Any, Iterable, Callable, Union, AbstractSet
+from logging import getLogger
+from threading import Lock, Timer
+from time import monotonic
+from typing import TypeVar, Type, Any, Iterable, Callable, AbstractSet, Tuple, Hashable
 
-from .common import PipelineContext, UnsupportedError, TYPE_WILDCARD
+from .common import PipelineContext, UnsupportedError, TYPE_WILDCARD, _batch_key
+
+LOGGER = getLogger(__name__)
 
 T = TypeVar("T")
 
@@ -107,3 +112,132 @@ class CompositeDataSink(DataSink):
 
         for sink in sinks:
             sink.put(type, item, context)
+
+
+class _Buffer(object):
+    def __init__(self) -> None:
+        self.items = []  # type: List[Any]
+        self.context = None  # type: PipelineContext
+        self.started = monotonic()
+        self.timer = None  # type: Timer
+
+
+class BufferedDataSink(DataSink):
+    def __init__(self, sink: DataSink, max_size: int = 100, max_age: float = None) -> None:
+        """Wraps a data sink so individual puts are collected per type and written with `put_many`.
+
+        A type's buffer is written when it holds `max_size` items, when its oldest item is `max_age` seconds old, or when `flush` is called. Buffered
+        items aren't visible to anything reading from the wrapped sink until they've been written. Items put with different expirations in their
+        contexts (`PipelineContext.Keys.EXPIRATION`) are buffered separately, so each is written with its own expiration.
+
+        Types the wrapped sink only registers for `put` are written one item at a time. If a write fails, its items are kept and written with the
+        next write of their buffer. A failed write is raised to the caller that triggered it, or logged if the `max_age` timer triggered it.
+
+        Args:
+            sink: The data sink to write to.
+            max_size: The number of items of a type to collect before writing them (default 100).
+            max_age: The number of seconds an item can wait in a buffer before it's written (default None, which waits for `max_size` or `flush`).
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self._sink = sink
+        self._max_size = max_size
+        self._max_age = max_age
+        self._buffers = {}  # type: Dict[Tuple[Type, Hashable], _Buffer]
+        self._lock = Lock()
+
+    @property
+    def accepts(self):  # type: Union[Iterable[Type[T]], Type[Any]]
+        return self._sink.accepts
+
+    def put(self, type: Type[T], item: T, context: PipelineContext = None) -> None:
+        self.put_many(type, (item,), context)
+
+    def put_many(self, type: Type[T], items: Iterable[T], context: PipelineContext = None) -> None:
+        accepts = self._sink.accepts
+        if accepts is not TYPE_WILDCARD and type not in accepts:
+            raise DataSink.unsupported(type)
+
+        key = (type, _batch_key(context))
+        with self._lock:
+            try:
+                buffer = self._buffers[key]
+            except KeyError:
+                buffer = _Buffer()
+                buffer.context = context
+                self._buffers[key] = buffer
+                if self._max_age is not None:
+                    buffer.timer = Timer(self._max_age, self._flush_expired, (key, buffer))
+                    buffer.timer.daemon = True
+                    buffer.timer.start()
+
+            buffer.items.extend(items)
+            full = len(buffer.items) >= self._max_size or (self._max_age is not None and monotonic() - buffer.started >= self._max_age)
+
+        if full:
+            self._flush_buffer(key, buffer)
+
+    def _flush_buffer(self, key: Tuple[Type, Hashable], buffer: _Buffer) -> None:
+        with self._lock:
+            # The buffer may have been written by another thread (or its timer) already
+            if self._buffers.get(key) is not buffer:
+                return
+            del self._buffers[key]
+
+        if buffer.timer is not None:
+            buffer.timer.cancel()
+        if buffer.items:
+            try:
+                self._write(key[0], buffer.items, buffer.context)
+            except BaseException:
+                self._restore(key, buffer)
+                raise
+
+    def _flush_expired(self, key: Tuple[Type, Hashable], buffer: _Buffer) -> None:
+        # Nothing would see an exception raised on the timer's thread
+        try:
+            self._flush_buffer(key, buffer)
+        except Exception:
+            LOGGER.exception("Writing buffered \"{type}\" items to \"{sink}\" failed. They'll be written with the next write of their buffer.".format(type=key[0].__name__, sink=self._sink))
+
+    def _write(self, type: Type[T], items: Iterable[T], context: PipelineContext) -> None:
+        try:
+            accepts_many = type in getattr(self._sink.__class__, "put_many")._accepts
+        except AttributeError:
+            # put_many isn't dispatched by type, so it takes whatever the sink accepts
+            accepts_many = True
+
+        if accepts_many:
+            self._sink.put_many(type, items, context)
+        else:
+            for item in items:
+                self._sink.put(type, item, context)
+
+    def _restore(self, key: Tuple[Type, Hashable], buffer: _Buffer) -> None:
+        # The items go back in front of anything buffered since, and are retried by the next put that fills the buffer (or finds it too old) or
+        # by the next flush
+        with self._lock:
+            current = self._buffers.get(key)
+            if current is None:
+                buffer.timer = None
+                self._buffers[key] = buffer
+            else:
+                current.items[:0] = buffer.items
+                current.started = min(current.started, buffer.started)
+
+    def flush(self, type: Type[T] = None) -> None:
+        """Writes buffered items to the wrapped sink.
+
+        Args:
+            type: The type of items to write (default None, which writes every type).
+        """
+        with self._lock:
+            buffers = [(key, buffer) for key, buffer in self._buffers.items() if type is None or key[0] is type]
+
+        for key, buffer in buffers:
+            self._flush_buffer(key, buffer)
+
+    def close(self) -> None:
+        """Writes every buffered item to the wrapped sink."""
+        self.flush()
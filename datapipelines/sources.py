@@ -1,11 +1,11 @@
 from abc import ABC, abstractmethod
-from copy import deepcopy
 from functools import singledispatch, update_wrapper
-from typing import TypeVar, Type, Mapping, Any, Iterable, Callable, Union, AbstractSet
+from typing import TypeVar, Type, Mapping, Any, Iterable, Callable, Union, AbstractSet, Sequence, Optional
 
 from merakicommons.cache import lazy_property
 
-from .common import PipelineContext, UnsupportedError, NotFoundError, TYPE_WILDCARD
+from .common import PipelineContext, UnsupportedError, NotFoundError, NegativeCache, TYPE_WILDCARD
+from .queries import fingerprint, _copy_query
 
 T = TypeVar("T")
 
@@ -58,6 +58,22 @@ class DataSource(ABC):
         """
         pass
 
+    def combine(self, type: Type[T], queries: Sequence[Mapping[str, Any]]) -> Optional[Mapping[str, Any]]:
+        """Combines queries for single objects into one query for all of them, which `get_many` answers with the objects in the same order.
+
+        DataPipeline.get_bulk uses this to fetch many objects with a single call. Sources which can't combine queries for a type return None (the
+        default), and are sent the queries through `get` one at a time instead. A source which only finds some of the objects of a combined query
+        raises a PartialResult from `get_many`.
+
+        Args:
+            type: The type of the objects being requested.
+            queries: The queries for the single objects.
+
+        Returns:
+            The combined query, or None if the queries can't be combined.
+        """
+        return None
+
     @staticmethod
     def dispatch(method: Callable[[Any, Type[T], Mapping[str, Any], PipelineContext], Any]) -> Callable[[Any, Type[T], Mapping[str, Any], PipelineContext], Any]:
         dispatcher = singledispatch(method)
@@ -81,9 +97,19 @@ class DataSource(ABC):
 
 
 class CompositeDataSource(DataSource):
-    def __init__(self, sources: Iterable[DataSource]) -> None:
+    def __init__(self, sources: Iterable[DataSource], negative_cache: NegativeCache = None) -> None:
+        """Initializes a data source which queries several sources in order.
+
+        Args:
+            sources: The data sources, in the order they're queried.
+            negative_cache: A cache of queries that the sources recently failed to find, which are skipped on repeated `get`s (default None). A
+                member's misses are forgotten when data is put into it through a DataPipeline containing this source, or with `invalidate`.
+        """
+        self._negative_cache = negative_cache
         self._sources = {}
+        self._members = set()
         for source in sources:
+            self._members.add(source)
             for provided_type in source.provides:
                 try:
                     providing_sources = self._sources[provided_type]
@@ -96,6 +122,15 @@ class CompositeDataSource(DataSource):
     def provides(self) -> AbstractSet[Type]:
         return self._sources.keys()
 
+    def invalidate(self, sources: Iterable[DataSource] = None) -> None:
+        """Forgets the misses remembered for member sources, e.g. because data was put into them.
+
+        Args:
+            sources: The member sources whose misses are forgotten (default every member).
+        """
+        if self._negative_cache is not None:
+            self._negative_cache.invalidate(self._members if sources is None else self._members.intersection(sources))
+
     def get_many(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[T]:
         try:
             sources = self._sources[type]
@@ -104,7 +139,7 @@ class CompositeDataSource(DataSource):
 
         for source in sources:
             try:
-                return source.get_many(type, deepcopy(query), context)
+                return source.get_many(type, _copy_query(query), context)
             except NotFoundError:
                 continue
         raise NotFoundError()
@@ -115,9 +150,20 @@ class CompositeDataSource(DataSource):
         except KeyError as error:
             raise DataSource.unsupported(type) from error
 
+        key = None
+        if self._negative_cache is not None:
+            try:
+                key = fingerprint(query)
+            except TypeError:
+                pass
+
         for source in sources:
+            if key is not None and self._negative_cache.contains(source, type, key):
+                continue
             try:
-                return source.get(type, deepcopy(query), context)
+                return source.get(type, _copy_query(query), context)
             except NotFoundError:
+                if key is not None:
+                    self._negative_cache.add(source, type, key)
                 continue
         raise NotFoundError()
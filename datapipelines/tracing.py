@@ -0,0 +1,143 @@
+from enum import Enum
+from logging import getLogger, Logger, INFO
+from threading import Lock
+from time import perf_counter
+from typing import Any, Callable, Iterable, Mapping, Tuple
+
+LOGGER = getLogger(__name__)
+
+
+class EventType(Enum):
+    """The kinds of events a DataPipeline emits to its subscribers.
+
+    GET_START: A `get` or `get_many` started. Fields: data_type, query, many.
+    GET_END: A `get` or `get_many` finished. Fields: data_type, query, many, elapsed, and either result or error.
+    SOURCE_HIT: A source returned a result. Fields: source, data_type, query, many, result, elapsed.
+    SOURCE_MISS: A source didn't find a query. Fields: source, data_type, query, many, error (a PartialResult if it found some of the objects), elapsed.
+    TRANSFORM: One edge of a transformer chain converted an object (or a batch of objects if many). Fields: transformer, from_type, to_type, value,
+        result, many, elapsed. The transformer and types are None for a transform which isn't a compiled transformer chain.
+    SINK_PUT: An object (or a batch of objects if many) was put into a sink. Fields: sink, data_type, value, many, elapsed.
+
+    Every elapsed is in seconds.
+    """
+    GET_START = "get_start"
+    GET_END = "get_end"
+    SOURCE_HIT = "source_hit"
+    SOURCE_MISS = "source_miss"
+    TRANSFORM = "transform"
+    SINK_PUT = "sink_put"
+
+
+_MESSAGES = {
+    EventType.GET_START: "Getting \"{data_type.__name__}\" for query \"{query}\"",
+    EventType.GET_END: "Finished getting \"{data_type.__name__}\" for query \"{query}\" in {elapsed:.6f}s",
+    EventType.SOURCE_HIT: "Got result \"{result}\" from query \"{query}\" of source \"{source}\"",
+    EventType.SOURCE_MISS: "Source \"{source}\" didn't find query \"{query}\"",
+    EventType.TRANSFORM: "Converted \"{value}\" to \"{result}\"",
+    EventType.SINK_PUT: "Put \"{value}\" into sink \"{sink}\""
+}  # type: Dict[EventType, str]
+
+
+class Event(object):
+    __slots__ = ("type", "time", "fields")
+
+    def __init__(self, type: EventType, fields: Mapping[str, Any]) -> None:
+        """A structured pipeline event. Its fields are available as attributes, and it is only formatted into a message when converted to a string.
+
+        Args:
+            type: The kind of event.
+            fields: The event's fields (see EventType).
+        """
+        self.type = type
+        self.time = perf_counter()
+        self.fields = fields
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self.fields[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __str__(self) -> str:
+        return _MESSAGES[self.type].format(**self.fields)
+
+    def __repr__(self) -> str:
+        return "Event({type}, {fields})".format(type=self.type, fields=", ".join(sorted(self.fields)))
+
+
+class Tracer(object):
+    def __init__(self, subscribers: Iterable[Callable[[Event], None]] = None) -> None:
+        """Delivers events to subscribers.
+
+        Emitters check `active` before building an event, so a tracer with no subscribers costs a single attribute lookup per emission point.
+
+        Args:
+            subscribers: The initial subscribers (default None).
+        """
+        self._subscribers = ()  # type: Tuple[Callable[[Event], None], ...]
+        self._lock = Lock()
+        self.active = False
+
+        if subscribers is not None:
+            for subscriber in subscribers:
+                self.subscribe(subscriber)
+
+    @property
+    def subscribers(self) -> Tuple[Callable[[Event], None], ...]:
+        return self._subscribers
+
+    def subscribe(self, subscriber: Callable[[Event], None]) -> None:
+        """Adds a subscriber, which is called with every event emitted from then on.
+
+        Args:
+            subscriber: A callable taking an Event. Exceptions it raises are logged and otherwise ignored.
+        """
+        # The tuple is replaced rather than changed, so emitting never needs the lock
+        with self._lock:
+            self._subscribers = self._subscribers + (subscriber,)
+            self.active = True
+
+    def unsubscribe(self, subscriber: Callable[[Event], None]) -> None:
+        """Removes a subscriber.
+
+        Args:
+            subscriber: A subscriber previously passed to `subscribe`.
+
+        Raises:
+            ValueError: If the subscriber isn't subscribed.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+            subscribers.remove(subscriber)
+            self._subscribers = tuple(subscribers)
+            self.active = bool(subscribers)
+
+    def emit(self, type: EventType, **fields: Any) -> None:
+        """Sends an event to every subscriber.
+
+        Args:
+            type: The kind of event.
+            fields: The event's fields (see EventType).
+        """
+        event = Event(type, fields)
+        for subscriber in self._subscribers:
+            try:
+                subscriber(event)
+            except Exception:
+                LOGGER.exception("Tracing subscriber \"{subscriber}\" failed".format(subscriber=subscriber))
+
+
+class LoggingSubscriber(object):
+    def __init__(self, logger: Logger = None, level: int = INFO) -> None:
+        """A subscriber which logs events. An event is only formatted if the logger is enabled for the level.
+
+        Args:
+            logger: The logger to write to (default the "datapipelines.tracing" logger).
+            level: The level to log events at (default logging.INFO).
+        """
+        self._logger = logger if logger is not None else LOGGER
+        self._level = level
+
+    def __call__(self, event: Event) -> None:
+        if self._logger.isEnabledFor(self._level):
+            self._logger.log(self._level, "%s", event)
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
-from functools import singledispatch, update_wrapper
-from typing import TypeVar, Type, Callable, Any, Mapping, Iterable, Dict, Set
+from functools import partial, update_wrapper
+from typing import TypeVar, Type, Callable, Any, Mapping, Iterable, Dict, Set, List
 
 from merakicommons.cache import lazy_property
 
@@ -34,28 +34,84 @@ class DataTransformer(ABC):
         """
         pass
 
+    def transform_many(self, target_type: Type[T], values: List[F], context: PipelineContext = None) -> List[T]:
+        """Transforms a batch of objects of the same type to a new type.
+
+        By default each object is transformed with `transform`. Transformers which can convert a whole batch at once (e.g. vectorized conversions)
+        implement this with `DataTransformer.dispatch_many`.
+
+        Args:
+            target_type: The type to be converted to.
+            values: The objects to be transformed.
+            context: The context of the transformation (mutable).
+        """
+        return [self.transform(target_type, value, context) for value in values]
+
     @property
     def cost(self) -> int:
         """The cost of the tranformation (default 1)."""
         return 1
 
+    def resolve(self, from_type: Type[F], to_type: Type[T]) -> Callable[[F, PipelineContext], T]:
+        """Looks up the conversion between two types ahead of time.
+
+        Args:
+            from_type: The type to be converted from.
+            to_type: The type to be converted to.
+
+        Returns:
+            A function taking a value and a context, which calls the registered implementation directly (or `transform` if there isn't one).
+        """
+        try:
+            function = getattr(self.__class__, "transform")._implementations[from_type, to_type]
+        except (AttributeError, KeyError):
+            def transform(value: F, context: PipelineContext = None) -> T:
+                return self.transform(to_type, value, context)
+            return transform
+        return partial(function, self)
+
+    def resolve_many(self, from_type: Type[F], to_type: Type[T]) -> Callable[[List[F], PipelineContext], List[T]]:
+        """Looks up the batch conversion between two types ahead of time.
+
+        Args:
+            from_type: The type to be converted from.
+            to_type: The type to be converted to.
+
+        Returns:
+            A function taking a list of values and a context, which calls the registered batch implementation directly. Without one, each value is
+            converted with the function from `resolve`.
+        """
+        method = getattr(self.__class__, "transform_many")
+        batches = getattr(method, "_batches", None)
+        if batches is not None:
+            try:
+                return partial(batches[from_type, to_type], self)
+            except KeyError:
+                pass
+        elif method is not DataTransformer.transform_many:
+            def transform_batch(values: List[F], context: PipelineContext = None) -> List[T]:
+                return self.transform_many(to_type, values, context)
+            return transform_batch
+
+        transform = self.resolve(from_type, to_type)
+
+        def transform_each(values: List[F], context: PipelineContext = None) -> List[T]:
+            return [transform(value, context) for value in values]
+        return transform_each
+
     @staticmethod
     def dispatch(method: Callable[[Any, Type[T], F, PipelineContext], T]) -> Callable[[Any, Type[T], F, PipelineContext], T]:
-        dispatcher = singledispatch(method)
         transforms = {}
-
-        dispatch_types = {}
+        implementations = {}  # type: Dict[Tuple[Type, Type], Callable[[Any, F, PipelineContext], T]]
 
         def wrapper(self: Any, target_type: Type[T], value: F, context: PipelineContext = None) -> T:
-            dispatch_type_name = f"{value.__class__.__name__} -> {target_type.__name__}"
-            dispatch_type = dispatch_types[dispatch_type_name]
-            call = dispatcher.dispatch(dispatch_type)
             try:
-                return call(self, value, context=context)
-            except TypeError as error:
+                call = implementations[value.__class__, target_type]
+            except KeyError as error:
                 raise DataTransformer.unsupported(target_type, value) from error
+            return call(self, value, context=context)
 
-        def register(from_type: Type[F], to_type: Type[T]) -> Callable[[Any, Type[T], F, PipelineContext], T]:
+        def register(from_type: Type[F], to_type: Type[T]) -> Callable[[Callable[[Any, F, PipelineContext], T]], Callable[[Any, F, PipelineContext], T]]:
             try:
                 target_types = transforms[from_type]
             except KeyError:
@@ -63,13 +119,41 @@ class DataTransformer(ABC):
                 transforms[from_type] = target_types
             target_types.add(to_type)
 
-            dispatch_type_name = f'{from_type.__name__} -> {to_type.__name__}'
-            new_type = type(dispatch_type_name, (object,), {})
-            dispatch_types[dispatch_type_name] = new_type
-            return dispatcher.register(new_type)
+            def decorator(function: Callable[[Any, F, PipelineContext], T]) -> Callable[[Any, F, PipelineContext], T]:
+                implementations[from_type, to_type] = function
+                return function
+            return decorator
 
         wrapper.register = register
         wrapper._transforms = transforms
+        wrapper._implementations = implementations
+        update_wrapper(wrapper, method)
+        return wrapper
+
+    @staticmethod
+    def dispatch_many(method: Callable[[Any, Type[T], List[F], PipelineContext], List[T]]) -> Callable[[Any, Type[T], List[F], PipelineContext], List[T]]:
+        """Dispatches `transform_many` by conversion, like `dispatch` does for `transform`. Register batch conversions with
+        `transform_many.register(from_type, to_type)`. Conversions without a batch implementation transform each object with `transform`.
+        """
+        batches = {}  # type: Dict[Tuple[Type, Type], Callable[[Any, List[F], PipelineContext], List[T]]]
+
+        def wrapper(self: Any, target_type: Type[T], values: List[F], context: PipelineContext = None) -> List[T]:
+            if not values:
+                return []
+            try:
+                call = batches[values[0].__class__, target_type]
+            except KeyError:
+                return [self.transform(target_type, value, context) for value in values]
+            return call(self, values, context=context)
+
+        def register(from_type: Type[F], to_type: Type[T]) -> Callable[[Callable[[Any, List[F], PipelineContext], List[T]]], Callable[[Any, List[F], PipelineContext], List[T]]]:
+            def decorator(function: Callable[[Any, List[F], PipelineContext], List[T]]) -> Callable[[Any, List[F], PipelineContext], List[T]]:
+                batches[from_type, to_type] = function
+                return function
+            return decorator
+
+        wrapper.register = register
+        wrapper._batches = batches
         update_wrapper(wrapper, method)
         return wrapper
 
@@ -110,3 +194,26 @@ class CompositeDataTransformer(DataTransformer):
             raise DataTransformer.unsupported(target_type, value) from error
 
         return transformer.transform(target_type, value, context)
+
+    def transform_many(self, target_type: Type[T], values: List[F], context: PipelineContext = None) -> List[T]:
+        if not values:
+            return []
+
+        try:
+            transformer = self._transformers[type(values[0]), target_type]
+        except KeyError as error:
+            raise DataTransformer.unsupported(target_type, values[0]) from error
+
+        return transformer.transform_many(target_type, values, context)
+
+    def resolve(self, from_type: Type[F], to_type: Type[T]) -> Callable[[F, PipelineContext], T]:
+        try:
+            return self._transformers[from_type, to_type].resolve(from_type, to_type)
+        except KeyError:
+            return super().resolve(from_type, to_type)
+
+    def resolve_many(self, from_type: Type[F], to_type: Type[T]) -> Callable[[List[F], PipelineContext], List[T]]:
+        try:
+            return self._transformers[from_type, to_type].resolve_many(from_type, to_type)
+        except KeyError:
+            return super().resolve_many(from_type, to_type)
@@ -0,0 +1,193 @@
+from enum import Enum
+from logging import getLogger
+from queue import Queue, Full, Empty
+from threading import Thread, Lock
+from typing import TypeVar, Any, Iterable, List, Callable
+
+from .common import PipelineContext, _batch_key
+
+LOGGER = getLogger(__name__)
+
+T = TypeVar("T")
+
+_STOP = object()
+_IDLE_DRAIN_INTERVAL = 0.1
+
+
+class OverflowPolicy(Enum):
+    """What a WriteBehindQueue does with a write when its queue is full.
+
+    DROP: Discard the write.
+    BLOCK: Wait for room in the queue.
+    COALESCE: Set the items aside per sink (and per expiration in their context) and write them with a single `put_many` once a worker is free.
+    """
+    DROP = "drop"
+    BLOCK = "block"
+    COALESCE = "coalesce"
+
+
+class WriteBehindQueue(object):
+    def __init__(self, max_size: int = 1024, workers: int = 1, overflow: OverflowPolicy = OverflowPolicy.BLOCK) -> None:
+        """Initializes a queue of sink writes which are carried out by background workers.
+
+        A DataPipeline given a WriteBehindQueue returns from a read as soon as the source and transformers are done, leaving the insertion of the
+        results into its data sinks to the queue. Writes which fail in the background are logged and counted in `errors`.
+
+        Args:
+            max_size: The maximum number of writes waiting in the queue (default 1024).
+            workers: The number of background threads carrying out writes (default 1).
+            overflow: What to do with a write when the queue is full (default OverflowPolicy.BLOCK).
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+
+        self._queue = Queue(max_size)  # type: Queue
+        self._overflow_policy = overflow
+        self._overflow = {}  # type: Dict[Tuple[Any, Hashable], Tuple[List[Any], PipelineContext, List[Callable[[], None]]]]
+        self._overflow_lock = Lock()
+        self._drain_lock = Lock()
+        # Workers and writers update the counters at the same time, and an unguarded += can lose counts
+        self._lock = Lock()
+        self._closed = False
+        self.dropped = 0
+        self.errors = 0
+
+        self._workers = [Thread(target=self._work, name="datapipelines-write-behind-{index}".format(index=index), daemon=True) for index in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def put(self, sink: Any, item: T, context: PipelineContext = None, callback: Callable[[], None] = None) -> None:
+        """Queues a `put` of an item into a sink.
+
+        Args:
+            sink: The sink (anything with `put` and `put_many` methods taking items and a context, e.g. a DataPipeline's sink handler).
+            item: The object to be inserted.
+            context: The context of the insertion (mutable).
+            callback: Called once the item has been written (default None). It isn't called if the write fails or is dropped.
+        """
+        self._submit(sink, sink.put, item, [item], context, callback)
+
+    def put_many(self, sink: Any, items: Iterable[T], context: PipelineContext = None, callback: Callable[[], None] = None) -> None:
+        """Queues a `put_many` of items into a sink.
+
+        Args:
+            sink: The sink (anything with `put` and `put_many` methods taking items and a context, e.g. a DataPipeline's sink handler).
+            items: The objects to be inserted.
+            context: The context of the insertion (mutable).
+            callback: Called once the items have been written (default None). It isn't called if the write fails or is dropped.
+        """
+        items = list(items)
+        self._submit(sink, sink.put_many, items, items, context, callback)
+
+    def _submit(self, sink: Any, method: Callable[[Any, PipelineContext], None], argument: Any, items: List[Any], context: PipelineContext,
+                callback: Callable[[], None]) -> None:
+        callbacks = (callback,) if callback is not None else ()
+        if self._closed:
+            # Nothing is left to carry the write out in the background, so it's done right away
+            method(argument, context)
+            self._done(callbacks)
+            return
+
+        task = (method, argument, context, callbacks)
+        if self._overflow_policy is OverflowPolicy.BLOCK:
+            self._queue.put(task)
+            return
+
+        try:
+            self._queue.put_nowait(task)
+        except Full:
+            if self._overflow_policy is OverflowPolicy.DROP:
+                with self._lock:
+                    self.dropped += len(items)
+                LOGGER.warning("Write-behind queue is full. Dropped {count} item(s) for \"{sink}\"".format(count=len(items), sink=sink))
+            else:
+                # Items are set aside per expiration as well, so each keeps the expiration it was written with
+                key = (sink, _batch_key(context))
+                with self._overflow_lock:
+                    try:
+                        pending, _, pending_callbacks = self._overflow[key]
+                    except KeyError:
+                        pending = []
+                        pending_callbacks = []
+                        self._overflow[key] = (pending, context, pending_callbacks)
+                    pending.extend(items)
+                    pending_callbacks.extend(callbacks)
+
+    def _drain_overflow(self) -> None:
+        # Draining is serialized so that a flush can't return while a worker is still writing out coalesced items it already took
+        with self._drain_lock:
+            with self._overflow_lock:
+                overflow = self._overflow
+                self._overflow = {}
+
+            for (sink, _), (items, context, callbacks) in overflow.items():
+                self._write(sink.put_many, items, context, callbacks)
+
+    def _write(self, method: Callable[[Any, PipelineContext], None], argument: Any, context: PipelineContext, callbacks: Iterable[Callable[[], None]]) -> None:
+        try:
+            method(argument, context)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            LOGGER.exception("Write-behind to a sink failed")
+            return
+        self._done(callbacks)
+
+    @staticmethod
+    def _done(callbacks: Iterable[Callable[[], None]]) -> None:
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                LOGGER.exception("Write-behind callback \"{callback}\" failed".format(callback=callback))
+
+    def _work(self) -> None:
+        while True:
+            try:
+                task = self._queue.get(timeout=_IDLE_DRAIN_INTERVAL)
+            except Empty:
+                # Coalesced writes can be set aside just as the queue empties, so idle workers pick them up as well
+                self._drain_overflow()
+                continue
+
+            try:
+                if task is _STOP:
+                    return
+                self._write(*task)
+                self._drain_overflow()
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Blocks until every queued write has been carried out."""
+        self._queue.join()
+        self._drain_overflow()
+
+    def close(self) -> None:
+        """Carries out every queued write and stops the workers. Writes submitted after closing are carried out immediately by the caller."""
+        if self._closed:
+            return
+
+        self.flush()
+        self._closed = True
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+
+        # Anything that slipped into the queue while it was closing is written here
+        while True:
+            try:
+                task = self._queue.get_nowait()
+            except Empty:
+                break
+            if task is not _STOP:
+                self._write(*task)
+            self._queue.task_done()
+        self._drain_overflow()
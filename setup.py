@@ -29,9 +29,10 @@ setup(
     packages=find_packages(),
     zip_safe=True,
     install_requires=[
-        "merakicommons", "networkx"
+        "merakicommons"
     ],
     extras_require={
+        "networkx": ["networkx"],
         "testing": ["pytest", "flake8"]
     }
 )
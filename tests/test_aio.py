@@ -0,0 +1,392 @@
+import asyncio
+import random
+from typing import Type, TypeVar, Mapping, Any, Iterable, List
+
+import pytest
+
+from datapipelines import PipelineContext, NotFoundError, NoConversionError
+from datapipelines.aio import AsyncDataPipeline, AsyncDataSource, AsyncDataSink, AsyncDataTransformer, ExecutorDataSource, ExecutorDataSink, _transform
+
+from .test_pipelines import IntSource, FloatStore, IntFloatTransformer, FloatIntTransformer, StringTransformer, VALUE_KEY, COUNT_KEY, VALUES_COUNT, VALUES_MAX
+
+T = TypeVar("T")
+F = TypeVar("F")
+
+
+def _run(coroutine: Any) -> Any:
+    # asyncio.run is only available from Python 3.7 on
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+class AsyncIntSource(AsyncDataSource):
+    def __init__(self) -> None:
+        self.calls = 0
+
+    @AsyncDataSource.dispatch
+    async def get(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+        pass
+
+    @AsyncDataSource.dispatch
+    async def get_many(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[T]:
+        pass
+
+    @get.register(int)
+    async def get_int(self, query: Mapping[str, Any], context: PipelineContext = None) -> int:
+        self.calls += 1
+        await asyncio.sleep(0)
+        try:
+            return int(query.get(VALUE_KEY))
+        except ValueError:
+            raise NotFoundError("Couldn't cast the query value to \"int\"")
+
+    @get_many.register(int)
+    async def get_many_int(self, query: Mapping[str, Any], context: PipelineContext = None) -> List[int]:
+        self.calls += 1
+        await asyncio.sleep(0)
+        try:
+            value = int(query.get(VALUE_KEY))
+        except ValueError:
+            raise NotFoundError("Couldn't cast the query value to \"int\"")
+        return [value for _ in range(query.get(COUNT_KEY))]
+
+
+class AsyncFloatStore(AsyncDataSource, AsyncDataSink):
+    def __init__(self) -> None:
+        self.items = set()
+
+    @AsyncDataSink.dispatch
+    async def put(self, type: Type[T], item: T, context: PipelineContext = None) -> None:
+        pass
+
+    @AsyncDataSink.dispatch
+    async def put_many(self, type: Type[T], items: Iterable[T], context: PipelineContext = None) -> None:
+        pass
+
+    @put.register(float)
+    async def put_float(self, item: float, context: PipelineContext = None) -> None:
+        self.items.add(item)
+
+    @put_many.register(float)
+    async def put_many_float(self, items: Iterable[float], context: PipelineContext = None) -> None:
+        self.items.update(items)
+
+    @AsyncDataSource.dispatch
+    async def get(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+        pass
+
+    @AsyncDataSource.dispatch
+    async def get_many(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[T]:
+        pass
+
+    @get.register(float)
+    async def get_float(self, query: Mapping[str, Any], context: PipelineContext = None) -> float:
+        try:
+            value = float(query.get(VALUE_KEY))
+        except ValueError:
+            raise NotFoundError("Couldn't cast the query value to \"float\"")
+        if value not in self.items:
+            raise NotFoundError("Query value wasn't in store!")
+        return value
+
+    @get_many.register(float)
+    async def get_many_float(self, query: Mapping[str, Any], context: PipelineContext = None) -> List[float]:
+        try:
+            value = float(query.get(VALUE_KEY))
+        except ValueError:
+            raise NotFoundError("Couldn't cast the query value to \"float\"")
+        if value not in self.items:
+            raise NotFoundError("Query value wasn't in store!")
+        return [value for _ in range(query.get(COUNT_KEY))]
+
+
+class AsyncIntFloatTransformer(AsyncDataTransformer):
+    @AsyncDataTransformer.dispatch
+    async def transform(self, target_type: Type[T], value: F, context: PipelineContext = None) -> T:
+        pass
+
+    @transform.register(int, float)
+    async def int_to_float(self, value: int, context: PipelineContext = None) -> float:
+        await asyncio.sleep(0)
+        return float(value)
+
+
+def test_adapt_sync_elements():
+    int_source = IntSource()
+    float_store = FloatStore()
+
+    # noinspection PyTypeChecker
+    pipeline = AsyncDataPipeline([float_store, int_source], {IntFloatTransformer(), FloatIntTransformer(), StringTransformer()})
+
+    sources = [source for source, targets in pipeline._sources]
+    assert len(sources) == 2
+    assert all(type(source) is ExecutorDataSource for source in sources)
+    assert sources[0]._source is float_store
+    assert sources[1]._source is int_source
+
+    # The store's sink comes after its own source, so it only receives items from the int source
+    assert not pipeline._sources[0][1]
+    sink, = pipeline._sources[1][1]
+    assert type(sink) is ExecutorDataSink
+    assert sink._sink is float_store
+
+
+def test_get():
+    async def run():
+        int_source = AsyncIntSource()
+        float_store = AsyncFloatStore()
+
+        # noinspection PyTypeChecker
+        pipeline = AsyncDataPipeline([float_store, int_source], {AsyncIntFloatTransformer(), FloatIntTransformer(), StringTransformer()})
+
+        values = [str(random.randint(-VALUES_MAX, VALUES_MAX)) for _ in range(VALUES_COUNT)]
+        results = await asyncio.gather(*(pipeline.get(str, {VALUE_KEY: value}) for value in values))
+        assert results == values
+        assert float_store.items == {float(value) for value in values}
+
+        result = await pipeline.get(float, {VALUE_KEY: values[0]})
+        assert type(result) is float
+        assert result == float(values[0])
+
+        with pytest.raises(NotFoundError):
+            await pipeline.get(int, {VALUE_KEY: "cat"})
+
+        with pytest.raises(NoConversionError):
+            await pipeline.get(bytes, {VALUE_KEY: values[0]})
+
+    _run(run())
+
+
+def test_get_sync_elements():
+    async def run():
+        float_store = FloatStore()
+
+        # noinspection PyTypeChecker
+        pipeline = AsyncDataPipeline([float_store, IntSource()], {IntFloatTransformer(), FloatIntTransformer(), StringTransformer()})
+
+        values = [str(random.randint(-VALUES_MAX, VALUES_MAX)) for _ in range(VALUES_COUNT)]
+        results = await asyncio.gather(*(pipeline.get(int, {VALUE_KEY: value}) for value in values))
+        assert results == [int(value) for value in values]
+        assert float_store.items == {float(value) for value in values}
+
+    _run(run())
+
+
+def test_get_many():
+    async def run():
+        int_source = AsyncIntSource()
+        float_store = AsyncFloatStore()
+
+        # noinspection PyTypeChecker
+        pipeline = AsyncDataPipeline([float_store, int_source], {AsyncIntFloatTransformer(), FloatIntTransformer(), StringTransformer()})
+
+        value = str(random.randint(-VALUES_MAX, VALUES_MAX))
+        result = await pipeline.get_many(str, {VALUE_KEY: value, COUNT_KEY: VALUES_COUNT})
+        assert result == [value] * VALUES_COUNT
+        assert float(value) in float_store.items
+
+        value = str(random.randint(-VALUES_MAX, VALUES_MAX))
+        results = []
+        async for result in await pipeline.get_many(float, {VALUE_KEY: value, COUNT_KEY: VALUES_COUNT}, streaming=True):
+            assert float(value) in float_store.items
+            results.append(result)
+        assert results == [float(value)] * VALUES_COUNT
+
+    _run(run())
+
+
+def test_put():
+    async def run():
+        float_store = AsyncFloatStore()
+
+        # noinspection PyTypeChecker
+        pipeline = AsyncDataPipeline([float_store, AsyncIntSource()], {AsyncIntFloatTransformer(), FloatIntTransformer(), StringTransformer()})
+
+        await pipeline.put(int, 1)
+        await pipeline.put(str, "2.5")
+        await pipeline.put_many(int, (value for value in range(3, 6)))
+        assert float_store.items == {1.0, 2.5, 3.0, 4.0, 5.0}
+
+    _run(run())
+
+
+def test_transform():
+    # Synchronous transformers run inline in the async transform chain
+    async def run():
+        chain = [(AsyncIntFloatTransformer(), float), (StringTransformer(), str), (StringTransformer(), int)]
+        result = await _transform(chain, 1)
+        assert type(result) is int
+        assert result == 1
+
+    _run(run())
+
+
+def test_get_many_partial():
+    from datapipelines import MemoryCache
+    from .test_caches import IntSource as ListIntSource, int_query, expand_ints, residual_ints, VALUES_KEY
+
+    async def run():
+        cache = MemoryCache({int: int_query}, expand={int: expand_ints}, residuals={int: residual_ints})
+        cache.put(int, 2)
+        source = ListIntSource()
+        pipeline = AsyncDataPipeline([cache, source])
+
+        assert await pipeline.get_many(int, {VALUES_KEY: [1, 2, 3]}) == [1, 2, 3]
+        assert source.queries == [{VALUES_KEY: [1, 3]}]
+        assert [item async for item in await pipeline.get_many(int, {VALUES_KEY: [3, 2, 1, 0]}, streaming=True)] == [3, 2, 1, 0]
+        assert source.queries[-1] == {VALUES_KEY: [0]}
+
+    _run(run())
+
+
+def test_get_events():
+    from datapipelines import EventType
+
+    async def run():
+        events = []
+        pipeline = AsyncDataPipeline([AsyncFloatStore(), AsyncIntSource()], {AsyncIntFloatTransformer()}, subscribers=[events.append])
+
+        assert await pipeline.get(float, {VALUE_KEY: 1}) == 1.0
+        assert [event.type for event in events] == [EventType.GET_START, EventType.SOURCE_MISS, EventType.SOURCE_HIT, EventType.TRANSFORM, EventType.SINK_PUT, EventType.GET_END]
+        assert events[-1].result == 1.0
+
+    _run(run())
+
+
+def test_get_bulk_batching():
+    from datapipelines import BatchWindow, PartialResult
+    from .test_pipelines import BulkIntSource
+
+    async def run():
+        source = BulkIntSource(range(10))
+        pipeline = AsyncDataPipeline([source])
+
+        assert await pipeline.get_bulk(int, [{VALUE_KEY: 3}, {VALUE_KEY: 1}]) == [3, 1]
+        assert source.queries == [{BulkIntSource.VALUES_KEY: [3, 1]}]
+        with pytest.raises(PartialResult) as partial:
+            await pipeline.get_bulk(int, [{VALUE_KEY: 3}, {VALUE_KEY: 20}])
+        assert partial.value.residual == [{VALUE_KEY: 20}]
+
+        del source.queries[:]
+        pipeline = AsyncDataPipeline([source], batching={int: BatchWindow(delay=0.01)})
+        results = await asyncio.gather(*(pipeline.get(int, {VALUE_KEY: value}) for value in [1, 2, 20]), return_exceptions=True)
+        assert results[:2] == [1, 2]
+        assert isinstance(results[2], NotFoundError)
+        assert source.queries == [{BulkIntSource.VALUES_KEY: [1, 2, 20]}]
+
+    _run(run())
+
+
+def test_write_behind_unsupported():
+    from datapipelines import WriteBehindQueue
+
+    queue = WriteBehindQueue()
+    with pytest.raises(ValueError):
+        AsyncDataPipeline([AsyncIntSource()], write_behind=queue)
+    queue.close()
+
+
+def test_query_mode_unsupported():
+    from datapipelines import QueryMode
+
+    for query_mode in (QueryMode.HEDGED, QueryMode.SCATTER):
+        with pytest.raises(ValueError):
+            AsyncDataPipeline([AsyncIntSource()], query_mode=query_mode)
+    AsyncDataPipeline([AsyncIntSource()], query_mode=QueryMode.SEQUENTIAL)
+
+
+def test_coalesce():
+    async def run():
+        source = AsyncIntSource()
+        pipeline = AsyncDataPipeline([source], coalesce=True)
+
+        results = await asyncio.gather(*(pipeline.get(int, {VALUE_KEY: 1}) for _ in range(10)))
+        assert results == [1] * 10
+        assert source.calls == 1
+
+        # Every caller shares the same exception
+        results = await asyncio.gather(*(pipeline.get(int, {VALUE_KEY: "a"}) for _ in range(10)), return_exceptions=True)
+        assert all(result is results[0] for result in results)
+        assert isinstance(results[0], NotFoundError)
+        assert source.calls == 2
+
+        # Finished calls aren't shared with later ones, and a cancelled caller doesn't cancel the call the others are waiting on
+        first = asyncio.ensure_future(pipeline.get(int, {VALUE_KEY: 2}))
+        second = asyncio.ensure_future(pipeline.get(int, {VALUE_KEY: 2}))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == 2
+        assert source.calls == 3
+
+    _run(run())
+
+
+def test_negative_cache():
+    from datapipelines import NegativeCache, PartialResult, fingerprint
+
+    async def run():
+        float_store = FloatStore()
+        source = AsyncIntSource()
+        negative_cache = NegativeCache()
+        pipeline = AsyncDataPipeline([float_store, source], {IntFloatTransformer()}, negative_cache=negative_cache)
+
+        for _ in range(VALUES_COUNT):
+            with pytest.raises(NotFoundError):
+                await pipeline.get(float, {VALUE_KEY: "5.0"})
+        assert source.calls == 1
+        assert negative_cache.contains(float_store, float, fingerprint({VALUE_KEY: "5.0"}))
+
+        # Putting data into the synchronous store forgets its misses, even though its source and sink are adapted separately
+        await pipeline.put(float, 5.0)
+        assert not negative_cache.contains(float_store, float, fingerprint({VALUE_KEY: "5.0"}))
+        assert await pipeline.get(float, {VALUE_KEY: "5.0"}) == 5.0
+        assert source.calls == 1
+
+        # A result written back into the store forgets the store's miss of that query
+        assert await pipeline.get(float, {VALUE_KEY: 2}) == 2.0
+        assert not negative_cache.contains(float_store, float, fingerprint({VALUE_KEY: 2}))
+        assert source.calls == 2
+
+        # Bulk requests skip the misses too
+        for calls in (3, 3):
+            with pytest.raises(PartialResult):
+                await pipeline.get_bulk(float, [{VALUE_KEY: 2}, {VALUE_KEY: "6.0"}])
+            assert source.calls == calls
+
+    _run(run())
+
+
+def test_sync_import_skips_asyncio():
+    import subprocess
+    import sys
+
+    # Synchronous users shouldn't pay for importing asyncio
+    code = "import sys, datapipelines; sys.exit('asyncio' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
+
+
+def test_metrics():
+    from datapipelines import PipelineMetrics
+
+    async def run():
+        metrics = PipelineMetrics()
+        pipeline = AsyncDataPipeline([AsyncFloatStore(), AsyncIntSource()], [AsyncIntFloatTransformer()], metrics=metrics)
+
+        assert await pipeline.get(float, {VALUE_KEY: 1}) == 1.0
+        assert await pipeline.get_many(float, {VALUE_KEY: 2, COUNT_KEY: 3}) == [2.0, 2.0, 2.0]
+
+        snapshot = metrics.snapshot()
+        assert [(entry["many"], entry["requests"]) for entry in snapshot["gets"]] == [("false", 1), ("true", 1)]
+        sources = {entry["source"]: (entry["hits"], entry["misses"]) for entry in snapshot["sources"]}
+        assert sources == {"AsyncFloatStore": (0, 2), "AsyncIntSource": (2, 0)}
+        transformer, = snapshot["transformers"]
+        assert (transformer["calls"], transformer["items"]) == (2, 4)
+        sink, = snapshot["sinks"]
+        assert (sink["puts"], sink["items"]) == (2, 4)
+
+    _run(run())
@@ -0,0 +1,361 @@
+import time
+from datetime import datetime, timedelta
+from typing import Type, TypeVar, Mapping, Any, Iterable
+
+import pytest
+from datapipelines import DataPipeline, DataSource, MemoryCache, SQLiteCache, TieredCache, TierPolicy, PipelineContext, NotFoundError, UnsupportedError, Query
+from datapipelines.caches import NEVER
+
+T = TypeVar("T")
+
+VALUE_KEY = "value"
+VALUES_KEY = "values"
+
+
+def int_query(item: int) -> Mapping[str, Any]:
+    return {VALUE_KEY: item}
+
+
+def expand_ints(query: Mapping[str, Any]) -> Iterable[Mapping[str, Any]]:
+    return [{VALUE_KEY: value} for value in query[VALUES_KEY]]
+
+
+def residual_ints(query: Mapping[str, Any], missing: Iterable[Mapping[str, Any]]) -> Mapping[str, Any]:
+    return {VALUES_KEY: [single[VALUE_KEY] for single in missing]}
+
+
+class IntSource(DataSource):
+    def __init__(self) -> None:
+        self.calls = 0
+        self.queries = []
+
+    @DataSource.dispatch
+    def get(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+        pass
+
+    @DataSource.dispatch
+    def get_many(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[T]:
+        pass
+
+    @get.register(int)
+    def get_int(self, query: Mapping[str, Any], context: PipelineContext = None) -> int:
+        self.calls += 1
+        return query[VALUE_KEY]
+
+    @get_many.register(int)
+    def get_many_int(self, query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[int]:
+        self.calls += 1
+        self.queries.append(query)
+        return list(query[VALUES_KEY])
+
+
+def test_memory_cache():
+    cache = MemoryCache({int: int_query})
+
+    assert cache.provides == {int}
+    assert cache.accepts == {int}
+
+    with pytest.raises(NotFoundError):
+        cache.get(int, {VALUE_KEY: 1})
+
+    cache.put(int, 1)
+    cache.put_many(int, [2, 3])
+    assert len(cache) == 3
+    assert cache.get(int, {VALUE_KEY: 1}) == 1
+    assert cache.get(int, {VALUE_KEY: 3}) == 3
+    assert cache.hits == 2
+    assert cache.misses == 1
+
+    cache.delete(int, {VALUE_KEY: 1})
+    with pytest.raises(NotFoundError):
+        cache.get(int, {VALUE_KEY: 1})
+
+    cache.clear()
+    assert len(cache) == 0
+
+    with pytest.raises(UnsupportedError):
+        cache.get(str, {VALUE_KEY: "1"})
+    with pytest.raises(UnsupportedError):
+        cache.put(str, "1")
+
+    # Queries that can't be fingerprinted are misses
+    with pytest.raises(NotFoundError):
+        cache.get(int, {VALUE_KEY: [bytearray()]})
+
+
+def test_memory_cache_lru():
+    cache = MemoryCache({int: int_query}, max_size=3)
+    cache.put_many(int, [1, 2, 3])
+    assert cache.get(int, {VALUE_KEY: 1}) == 1
+
+    cache.put(int, 4)
+    assert len(cache) == 3
+    assert cache.evictions == 1
+    with pytest.raises(NotFoundError):
+        cache.get(int, {VALUE_KEY: 2})
+    for value in (1, 3, 4):
+        assert cache.get(int, {VALUE_KEY: value}) == value
+
+    with pytest.raises(ValueError):
+        MemoryCache({int: int_query}, max_size=0)
+
+
+def test_memory_cache_expiration():
+    cache = MemoryCache({int: int_query, float: int_query}, expirations={int: 0.05, float: 0})
+
+    cache.put(float, 1.0)
+    assert len(cache) == 0
+
+    cache.put(int, 1)
+    context = PipelineContext()
+    context[PipelineContext.Keys.EXPIRATION] = NEVER
+    cache.put(int, 2, context)
+    context[PipelineContext.Keys.EXPIRATION] = timedelta(seconds=-1)
+    cache.put(int, 3, context)
+    context[PipelineContext.Keys.EXPIRATION] = datetime.now() + timedelta(seconds=60)
+    cache.put(int, 4, context)
+
+    time.sleep(0.1)
+    with pytest.raises(NotFoundError):
+        cache.get(int, {VALUE_KEY: 1})
+    assert cache.expired == 1
+    assert cache.get(int, {VALUE_KEY: 2}) == 2
+    with pytest.raises(NotFoundError):
+        cache.get(int, {VALUE_KEY: 3})
+    assert cache.get(int, {VALUE_KEY: 4}) == 4
+
+
+def test_memory_cache_get_many():
+    cache = MemoryCache({int: int_query, float: int_query}, expand={int: expand_ints})
+    cache.put_many(int, [1, 2, 3])
+
+    assert cache.get_many(int, {VALUES_KEY: [3, 1]}) == [3, 1]
+    with pytest.raises(NotFoundError):
+        cache.get_many(int, {VALUES_KEY: [1, 4]})
+    with pytest.raises(NotFoundError):
+        cache.get_many(float, {VALUES_KEY: [1.0]})
+
+
+def test_memory_cache_validators():
+    validator = Query.has(VALUE_KEY).as_(int).also.can_have("region").with_default("NA")
+    cache = MemoryCache({int: lambda item: {VALUE_KEY: item}}, validators={int: validator})
+    cache.put(int, 1)
+
+    assert cache.get(int, {VALUE_KEY: 1, "region": "NA"}) == 1
+    with pytest.raises(NotFoundError):
+        cache.get(int, {VALUE_KEY: 1, "region": "EUW"})
+    with pytest.raises(NotFoundError):
+        cache.get(int, {VALUE_KEY: "1"})
+
+
+def test_memory_cache_pipeline():
+    cache = MemoryCache({int: int_query}, expand={int: expand_ints})
+    source = IntSource()
+    pipeline = DataPipeline([cache, source])
+
+    for _ in range(3):
+        assert pipeline.get(int, {VALUE_KEY: 1}) == 1
+    assert source.calls == 1
+    assert cache.hits == 2
+
+    assert pipeline.get_many(int, {VALUES_KEY: [1, 2]}) == [1, 2]
+    assert source.calls == 2
+    assert pipeline.get_many(int, {VALUES_KEY: [2, 1]}) == [2, 1]
+    assert source.calls == 2
+
+
+def test_sqlite_cache(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteCache(path, {int: int_query, str: lambda item: {VALUE_KEY: item}}, expand={int: expand_ints})
+
+    with pytest.raises(NotFoundError):
+        cache.get(int, {VALUE_KEY: 1})
+
+    cache.put(int, 1)
+    cache.put_many(int, range(2, 2000))
+    cache.put(str, "1")
+    assert len(cache) == 2000
+    assert cache.get(int, {VALUE_KEY: 1}) == 1
+    assert cache.get(str, {VALUE_KEY: "1"}) == "1"
+    assert cache.get_many(int, {VALUES_KEY: list(range(1999, 0, -1))}) == list(range(1999, 0, -1))
+    with pytest.raises(NotFoundError):
+        cache.get_many(int, {VALUES_KEY: [1, 2000]})
+    assert cache.hits == 2002
+    assert cache.misses == 2
+
+    cache.delete(int, {VALUE_KEY: 1})
+    with pytest.raises(NotFoundError):
+        cache.get(int, {VALUE_KEY: 1})
+    cache.close()
+
+    # The items survive reopening the database
+    cache = SQLiteCache(path, {int: int_query})
+    assert cache.get(int, {VALUE_KEY: 2}) == 2
+    cache.clear()
+    assert len(cache) == 0
+    cache.close()
+
+
+def test_sqlite_cache_expiration():
+    cache = SQLiteCache(":memory:", {int: int_query}, expirations={int: 0.05})
+    cache.put(int, 1)
+
+    context = PipelineContext()
+    context[PipelineContext.Keys.EXPIRATION] = NEVER
+    cache.put(int, 2, context)
+
+    time.sleep(0.1)
+    with pytest.raises(NotFoundError):
+        cache.get(int, {VALUE_KEY: 1})
+    assert cache.get(int, {VALUE_KEY: 2}) == 2
+    assert cache.purge() == 1
+    assert len(cache) == 1
+
+
+def test_sqlite_cache_serialization():
+    import json
+
+    cache = SQLiteCache(":memory:", {dict: lambda item: {VALUE_KEY: item["id"]}}, dumps=lambda item: json.dumps(item).encode("utf-8"), loads=json.loads)
+    cache.put(dict, {"id": 1, "name": "one"})
+    assert cache.get(dict, {VALUE_KEY: 1}) == {"id": 1, "name": "one"}
+    raw = cache._connection.execute("SELECT value FROM datapipelines_cache").fetchone()[0]
+    assert json.loads(raw) == {"id": 1, "name": "one"}
+
+
+def test_fingerprint_digest():
+    from datapipelines import fingerprint
+    from datapipelines.caches import _digest
+
+    assert _digest(fingerprint({"a": {1, 2}, "b": "x"})) == _digest(fingerprint({"b": "x", "a": {2, 1}}))
+    assert _digest(fingerprint({"a": 1})) != _digest(fingerprint({"a": "1"}))
+
+
+def test_tiered_cache_inclusive():
+    memory = MemoryCache({int: int_query}, max_size=2, expand={int: expand_ints})
+    disk = SQLiteCache(":memory:", {int: int_query})
+    cache = TieredCache(memory, disk)
+
+    cache.put_many(int, [1, 2, 3])
+    assert len(memory) == 2
+    assert len(disk) == 3
+    assert len(cache) == 3
+
+    # 1 was evicted from memory, and is promoted back from disk
+    assert cache.get(int, {VALUE_KEY: 1}) == 1
+    assert cache.promotions == 1
+    assert cache.demotions == 0
+    assert len(disk) == 3
+    assert memory.get(int, {VALUE_KEY: 1}) == 1
+
+    assert cache.get_many(int, {VALUES_KEY: [1, 2, 3]}) == [1, 2, 3]
+    assert cache.promotions == 2
+
+    cache.delete(int, {VALUE_KEY: 1})
+    with pytest.raises(NotFoundError):
+        cache.get(int, {VALUE_KEY: 1})
+    with pytest.raises(NotFoundError):
+        disk.get(int, {VALUE_KEY: 1})
+
+    # An exclusive cache takes over the memory tier's evictions, so the tier can't be shared
+    other = MemoryCache({int: int_query})
+    TieredCache(other, disk, TierPolicy.EXCLUSIVE)
+    with pytest.raises(ValueError):
+        TieredCache(other, disk)
+
+
+def test_tiered_cache_exclusive():
+    memory = MemoryCache({int: int_query}, max_size=2)
+    disk = SQLiteCache(":memory:", {int: int_query})
+    cache = TieredCache(memory, disk, TierPolicy.EXCLUSIVE)
+
+    cache.put_many(int, [1, 2])
+    assert len(disk) == 0
+
+    # Evicting 1 from memory demotes it to disk
+    cache.put(int, 3)
+    assert cache.demotions == 1
+    assert disk.get(int, {VALUE_KEY: 1}) == 1
+
+    # Finding 1 on disk moves it back into memory, which demotes 2
+    assert cache.get(int, {VALUE_KEY: 1}) == 1
+    assert cache.promotions == 1
+    assert cache.demotions == 2
+    assert len(memory) == 2
+    assert len(disk) == 1
+    assert len(cache) == 3
+    with pytest.raises(NotFoundError):
+        disk.get(int, {VALUE_KEY: 1})
+
+    cache.flush()
+    assert len(disk) == 3
+
+
+def test_tiered_cache_pipeline():
+    memory = MemoryCache({int: int_query})
+    disk = SQLiteCache(":memory:", {int: int_query})
+    source = IntSource()
+    pipeline = DataPipeline([TieredCache(memory, disk), source])
+
+    assert pipeline.get(int, {VALUE_KEY: 1}) == 1
+    assert len(memory) == 1
+    assert len(disk) == 1
+
+    memory.clear()
+    assert pipeline.get(int, {VALUE_KEY: 1}) == 1
+    assert source.calls == 1
+    assert len(memory) == 1
+
+
+def test_memory_cache_partial_get_many():
+    from datapipelines import PartialResult
+
+    cache = MemoryCache({int: int_query}, expand={int: expand_ints}, residuals={int: residual_ints})
+    cache.put_many(int, [1, 3])
+
+    with pytest.raises(PartialResult) as partial:
+        cache.get_many(int, {VALUES_KEY: [1, 2, 3, 4]})
+    assert partial.value.items == [1, PartialResult.MISSING, 3, PartialResult.MISSING]
+    assert partial.value.residual == {VALUES_KEY: [2, 4]}
+
+    # A complete miss is a plain miss
+    with pytest.raises(NotFoundError) as miss:
+        cache.get_many(int, {VALUES_KEY: [5, 6]})
+    assert not isinstance(miss.value, PartialResult)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_partial_get_many_pipeline(streaming):
+    cache = MemoryCache({int: int_query}, expand={int: expand_ints}, residuals={int: residual_ints})
+    source = IntSource()
+    pipeline = DataPipeline([cache, source])
+    cache.put_many(int, [2, 4])
+
+    assert list(pipeline.get_many(int, {VALUES_KEY: [1, 2, 3, 4, 5]}, streaming)) == [1, 2, 3, 4, 5]
+    assert source.queries == [{VALUES_KEY: [1, 3, 5]}]
+
+    # Only the newly fetched objects were written back, and now everything is cached
+    assert len(cache) == 5
+    assert list(pipeline.get_many(int, {VALUES_KEY: [5, 4, 3, 2, 1]}, streaming)) == [5, 4, 3, 2, 1]
+    assert source.calls == 1
+
+
+def test_partial_get_many_tiers():
+    from datapipelines import PartialResult
+
+    memory = MemoryCache({int: int_query}, expand={int: expand_ints}, residuals={int: residual_ints})
+    disk = MemoryCache({int: int_query}, expand={int: expand_ints}, residuals={int: residual_ints})
+    source = IntSource()
+    pipeline = DataPipeline([memory, disk, source])
+    memory.put(int, 1)
+    disk.put_many(int, [2, 3])
+
+    assert pipeline.get_many(int, {VALUES_KEY: [1, 2, 3, 4]}) == [1, 2, 3, 4]
+    assert source.queries == [{VALUES_KEY: [4]}]
+    assert len(memory) == 4
+    assert len(disk) == 3
+
+    # With no source for the rest, the partial result is raised to the caller
+    pipeline = DataPipeline([MemoryCache({int: int_query}, expand={int: expand_ints}, residuals={int: residual_ints}), memory])
+    with pytest.raises(PartialResult) as partial:
+        pipeline.get_many(int, {VALUES_KEY: [4, 5]})
+    assert partial.value.items == [4, PartialResult.MISSING]
@@ -0,0 +1,138 @@
+import time
+from threading import Thread, Barrier
+
+import pytest
+
+from datapipelines.common import _SingleFlight
+
+THREAD_COUNT = 32
+
+
+def test_single_flight():
+    flights = _SingleFlight()
+    barrier = Barrier(THREAD_COUNT)
+    calls = []
+    results = []
+
+    def work(value):
+        calls.append(value)
+        time.sleep(0.05)
+        return value
+
+    def run():
+        barrier.wait()
+        results.append(flights.do("key", work, 1))
+
+    threads = [Thread(target=run) for _ in range(THREAD_COUNT)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == [1] * THREAD_COUNT
+
+    # The flight is over, so a new call runs again
+    assert flights.do("key", work, 2) == 2
+    assert calls == [1, 2]
+
+
+def test_single_flight_error():
+    flights = _SingleFlight()
+    barrier = Barrier(THREAD_COUNT)
+    calls = []
+    errors = []
+
+    def work():
+        calls.append(None)
+        time.sleep(0.05)
+        raise KeyError("missing")
+
+    def run():
+        barrier.wait()
+        try:
+            flights.do("key", work)
+        except KeyError as error:
+            errors.append(error)
+
+    threads = [Thread(target=run) for _ in range(THREAD_COUNT)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(errors) == THREAD_COUNT
+
+    with pytest.raises(KeyError):
+        flights.do("key", work)
+
+
+def test_negative_cache():
+    from datapipelines import NegativeCache
+
+    cache = NegativeCache()
+    cache.add("source", int, "key")
+    cache.add("source", float, "key")
+    cache.add("other", int, "key")
+    cache.add("source", int, "other key")
+
+    assert len(cache) == 4
+    assert cache.contains("source", int, "key")
+    assert not cache.contains("source", str, "key")
+    assert not cache.contains("missing", int, "key")
+
+    cache.invalidate(["other"], "key")
+    assert not cache.contains("other", int, "key")
+    assert cache.contains("source", int, "key")
+
+    cache.invalidate(key="key")
+    assert not cache.contains("source", int, "key")
+    assert not cache.contains("source", float, "key")
+    assert cache.contains("source", int, "other key")
+
+    cache.add("other", int, "key")
+    cache.invalidate(["source"])
+    assert not cache.contains("source", int, "other key")
+    assert cache.contains("other", int, "key")
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_negative_cache_limits():
+    from datapipelines import NegativeCache
+
+    cache = NegativeCache(ttl=0.05, max_size=10)
+    for key in range(20):
+        cache.add("source", int, key)
+
+    assert len(cache) == 10
+    assert not cache.contains("source", int, 0)
+    assert cache.contains("source", int, 19)
+
+    time.sleep(0.1)
+    assert not cache.contains("source", int, 19)
+    cache.add("source", int, 20)
+    assert len(cache) == 1
+
+    with pytest.raises(ValueError):
+        NegativeCache(max_size=0)
+
+
+def test_partial_result():
+    from datapipelines import PartialResult, NotFoundError
+
+    MISSING = PartialResult.MISSING
+    partial = PartialResult([1, MISSING, 3, MISSING], {"values": [2, 4]})
+    assert isinstance(partial, NotFoundError)
+    assert partial.found == [1, 3]
+
+    replaced = partial.replace_found(["1", "3"])
+    assert replaced.items == ["1", MISSING, "3", MISSING]
+    assert replaced.residual is partial.residual
+
+    assert partial.merge([2, 4]) == [1, 2, 3, 4]
+    assert partial.merge([MISSING, 4]) == [1, MISSING, 3, 4]
+    with pytest.raises(ValueError):
+        partial.merge([2])
@@ -0,0 +1,81 @@
+import pytest
+
+from datapipelines import TypeGraph, NetworkXTypeGraph
+
+
+class A(object):
+    pass
+
+
+class B(object):
+    pass
+
+
+class C(object):
+    pass
+
+
+class D(object):
+    pass
+
+
+def build(graph_class):
+    graph = graph_class()
+    graph.add_node(A, sources={"source"})
+    graph.add_edge(A, B, cost=1)
+    graph.add_edge(B, C, cost=1)
+    graph.add_edge(A, C, cost=5)
+    graph.add_edge(C, A, cost=1)
+    graph.add_node(D)
+    return graph
+
+
+def test_nodes_and_edges():
+    graph = build(TypeGraph)
+
+    assert set(graph) == {A, B, C, D}
+    assert len(graph) == 4
+    assert A in graph
+    assert int not in graph
+    assert graph.nodes[A] == {"sources": {"source"}}
+    assert graph.nodes[B] == {}
+    assert set(graph.edges()) == {(A, B), (B, C), (A, C), (C, A)}
+    assert graph.adj[A][C] == {"cost": 5}
+
+    graph.add_edge(A, C, cost=2)
+    assert graph.adj[A][C] == {"cost": 2}
+
+
+def test_shortest_paths():
+    graph = build(TypeGraph)
+
+    distances, paths = graph.shortest_paths(A)
+    assert distances == {A: 0, B: 1, C: 2}
+    assert paths == {A: [A], B: [A, B], C: [A, B, C]}
+
+    distances, paths = graph.shortest_paths(A, reverse=True)
+    assert distances == {A: 0, C: 1, B: 2}
+    assert paths == {A: [A], C: [C, A], B: [B, C, A]}
+
+    distances, paths = graph.shortest_paths(D)
+    assert distances == {D: 0}
+    assert paths == {D: [D]}
+
+    distances, paths = graph.shortest_paths(int)
+    assert distances == {int: 0}
+    assert paths == {int: [int]}
+
+
+def test_networkx_backend():
+    pytest.importorskip("networkx")
+
+    graph = build(NetworkXTypeGraph)
+    expected = build(TypeGraph)
+
+    for origin in (A, B, C, D, int):
+        for reverse in (False, True):
+            assert graph.shortest_paths(origin, reverse) == expected.shortest_paths(origin, reverse)
+
+    networkx_graph = expected.to_networkx()
+    assert set(networkx_graph.nodes) == {A, B, C, D}
+    assert networkx_graph.adj[A][C]["cost"] == 5
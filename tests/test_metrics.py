@@ -0,0 +1,119 @@
+import pytest
+
+from datapipelines import DataPipeline, NotFoundError, PipelineMetrics, Histogram
+
+from .test_pipelines import IntSource, FloatStore, IntFloatTransformer, FloatIntTransformer, VALUE_KEY, COUNT_KEY
+
+
+def test_histogram():
+    histogram = Histogram([0.1, 1.0])
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.count == 4
+    assert histogram.snapshot() == {"buckets": {0.1: 2, 1.0: 3, float("inf"): 4}, "sum": pytest.approx(2.65), "count": 4}
+
+
+def test_pipeline_metrics():
+    metrics = PipelineMetrics()
+    pipeline = DataPipeline([FloatStore(), IntSource()], [IntFloatTransformer()], metrics=metrics)
+
+    assert pipeline.get(float, {VALUE_KEY: 1}) == 1.0
+    assert pipeline.get(float, {VALUE_KEY: 1}) == 1.0
+    assert pipeline.get_many(float, {VALUE_KEY: 2, COUNT_KEY: 3}) == [2.0, 2.0, 2.0]
+    with pytest.raises(NotFoundError):
+        pipeline.get(float, {VALUE_KEY: "a"})
+
+    snapshot = metrics.snapshot()
+    gets = {(entry["type"], entry["many"]): entry for entry in snapshot["gets"]}
+    assert gets["float", "false"]["requests"] == 3
+    assert gets["float", "false"]["errors"] == 1
+    assert gets["float", "false"]["latency"]["count"] == 3
+    assert gets["float", "true"]["requests"] == 1
+
+    sources = {(entry["source"], entry["type"]): entry for entry in snapshot["sources"]}
+    assert sources["FloatStore", "float"]["hits"] == 1
+    assert sources["FloatStore", "float"]["misses"] == 3
+    assert sources["IntSource", "int"]["hits"] == 2
+    assert sources["IntSource", "int"]["misses"] == 1
+
+    transformer, = snapshot["transformers"]
+    assert (transformer["transformer"], transformer["from_type"], transformer["to_type"]) == ("IntFloatTransformer", "int", "float")
+    assert transformer["calls"] == 2
+    assert transformer["items"] == 4
+
+    sinks = {(entry["sink"], entry["type"]): entry for entry in snapshot["sinks"]}
+    assert sinks["FloatStore", "float"]["puts"] == 2
+    assert sinks["FloatStore", "float"]["items"] == 4
+
+    metrics.reset()
+    assert metrics.snapshot() == {"gets": [], "sources": [], "transformers": [], "sinks": []}
+
+    with pytest.raises(ValueError):
+        PipelineMetrics([1.0, 0.1])
+
+
+def test_pipeline_metrics_prometheus():
+    metrics = PipelineMetrics([0.5], label=lambda element: "store \"{name}\"".format(name=element.__class__.__name__))
+    pipeline = DataPipeline([FloatStore(), IntSource()], [IntFloatTransformer()], metrics=metrics)
+    pipeline.get(float, {VALUE_KEY: 1})
+
+    text = metrics.to_prometheus()
+    lines = text.splitlines()
+    assert "# TYPE datapipelines_sources_hits_total counter" in lines
+    assert "datapipelines_sources_hits_total{source=\"store \\\"IntSource\\\"\",type=\"int\"} 1" in lines
+    assert "datapipelines_sources_misses_total{source=\"store \\\"FloatStore\\\"\",type=\"float\"} 1" in lines
+    assert "# TYPE datapipelines_gets_latency_seconds histogram" in lines
+    assert "datapipelines_gets_latency_seconds_bucket{type=\"float\",many=\"false\",le=\"+Inf\"} 1" in lines
+    assert "datapipelines_gets_latency_seconds_count{type=\"float\",many=\"false\"} 1" in lines
+    assert text.endswith("\n")
+
+
+def test_pipeline_metrics_chain_edges():
+    from datapipelines.pipelines import _meter, _traced_transform
+
+    metrics = PipelineMetrics()
+    pipeline = DataPipeline([IntSource()], [IntFloatTransformer(), FloatIntTransformer()], metrics=metrics)
+
+    # Every edge of a chain records into its own series
+    transform, _ = pipeline._chain([int, float, int])
+    metered = _meter(metrics, transform, False)
+    assert metered(data=1) == 1
+    assert _meter(metrics, transform.many, True)(data=[1, 2]) == [1, 2]
+    edges = [(entry["from_type"], entry["to_type"], entry["calls"], entry["items"]) for entry in metrics.snapshot()["transformers"]]
+    assert sorted(edges) == [("float", "int", 2, 3), ("int", "float", 2, 3)]
+
+    # Edges are still recorded once each while the pipeline is traced
+    events = []
+    pipeline.subscribe(events.append)
+    assert _traced_transform(pipeline._tracer, metered, 1, None, False) == 1
+    edges = [(entry["from_type"], entry["to_type"], entry["calls"]) for entry in metrics.snapshot()["transformers"]]
+    assert sorted(edges) == [("float", "int", 3), ("int", "float", 3)]
+    assert len(events) == 2
+
+
+def test_pipeline_metrics_without_tracing(monkeypatch):
+    from datapipelines.tracing import Tracer
+
+    def emit(*args, **kwargs):
+        raise AssertionError("Metrics shouldn't build tracing events")
+
+    monkeypatch.setattr(Tracer, "emit", emit)
+
+    metrics = PipelineMetrics()
+    pipeline = DataPipeline([FloatStore(), IntSource()], [IntFloatTransformer()], metrics=metrics)
+    assert pipeline.get(float, {VALUE_KEY: 1}) == 1.0
+    pipeline.put(float, 2.0)
+
+    snapshot = metrics.snapshot()
+    assert [entry["requests"] for entry in snapshot["gets"]] == [1]
+    assert sum(entry["hits"] for entry in snapshot["sources"]) == 1
+    assert [entry["calls"] for entry in snapshot["transformers"]] == [1]
+    assert [entry["puts"] for entry in snapshot["sinks"]] == [2]
+
+    # Resetting zeroes the series the pipeline's handlers hold, which keep recording afterwards
+    metrics.reset()
+    assert metrics.snapshot() == {"gets": [], "sources": [], "transformers": [], "sinks": []}
+    assert pipeline.get(float, {VALUE_KEY: 1}) == 1.0
+    assert [entry["requests"] for entry in metrics.snapshot()["gets"]] == [1]
@@ -1,10 +1,10 @@
+import json
 import random
-from typing import Type, TypeVar, Mapping, Any, Iterable, Generator
+from typing import Type, TypeVar, Mapping, Any, Iterable, Generator, List
 
 import pytest
-from networkx import DiGraph
-
-from datapipelines import DataPipeline, DataSource, DataSink, DataTransformer, PipelineContext, NotFoundError, NoConversionError
+from datapipelines import DataPipeline, DataSource, DataSink, DataTransformer, PipelineContext, NotFoundError, NoConversionError, Query
+from datapipelines.graphs import TypeGraph
 from datapipelines.pipelines import _build_type_graph, _pairwise, _identity, _transform, _SinkHandler, _SourceHandler
 
 T = TypeVar("T")
@@ -175,7 +175,7 @@ def test_build_type_graph():
     sinks = {float_store}
     transformers = {int_float, float_int, string}
 
-    expected = DiGraph()
+    expected = TypeGraph()
     expected.add_node(str)
     expected.add_node(int, sources={int_source})
     expected.add_node(float, sources={float_store}, sinks={float_store})
@@ -189,17 +189,17 @@ def test_build_type_graph():
     # noinspection PyTypeChecker
     actual = _build_type_graph(sources, sinks, transformers)
 
-    for node in expected.nodes():
-        assert expected.node[node] == actual.node[node]
+    for node in expected.nodes:
+        assert expected.nodes[node] == actual.nodes[node]
 
     for source, target in expected.edges():
-        assert expected.edge[source][target] == actual.edge[source][target]
+        assert expected.adj[source][target] == actual.adj[source][target]
 
-    for node in actual.nodes():
-        assert expected.node[node] == actual.node[node]
+    for node in actual.nodes:
+        assert expected.nodes[node] == actual.nodes[node]
 
     for source, target in actual.edges():
-        assert expected.edge[source][target] == actual.edge[source][target]
+        assert expected.adj[source][target] == actual.adj[source][target]
 
 
 #####################
@@ -821,3 +821,772 @@ def test_put_many():
 
         assert result is None
         assert float(value) in float_store.items
+
+
+def test_compile():
+    int_source = IntSource()
+    float_store = FloatStore()
+    int_float = IntFloatTransformer()
+    float_int = FloatIntTransformer()
+    string = StringTransformer()
+
+    elements = [float_store, int_source]
+    transformers = {int_float, float_int, string}
+
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline(elements, transformers)
+
+    assert pipeline.types == {int, float, str}
+    for t in pipeline.types:
+        assert t in pipeline._get_types
+        assert t in pipeline._put_types
+
+    assert type(pipeline._get_types[str]) is tuple
+    assert type(pipeline._put_types[str]) is frozenset
+
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline(elements, transformers, compile_plans=False)
+    assert not pipeline._get_types
+    assert not pipeline._put_types
+
+    pipeline.compile(types=[int])
+    assert set(pipeline._get_types) == {int}
+    assert set(pipeline._put_types) == {int}
+
+
+def test_put_uses_put_plans():
+    int_source = IntSource()
+    float_store = FloatStore()
+    int_float = IntFloatTransformer()
+
+    elements = [float_store, int_source]
+    transformers = {int_float}
+
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline(elements, transformers, compile_plans=False)
+
+    pipeline.put(int, 1)
+    pipeline.put_many(float, [2.0])
+
+    assert int in pipeline._put_types
+    assert float in pipeline._put_types
+    assert int not in pipeline._get_types
+    assert float not in pipeline._get_types
+    assert float_store.items == {1.0, 2.0}
+
+
+def test_shortest_paths_single_search():
+    int_source = IntSource()
+    float_store = FloatStore()
+    int_float = IntFloatTransformer()
+    float_int = FloatIntTransformer()
+    string = StringTransformer()
+
+    elements = [float_store, int_source]
+    transformers = {int_float, float_int, string}
+
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline(elements, transformers, compile_plans=False)
+
+    searches = []
+    search = pipeline._type_graph.shortest_paths
+
+    def counting_search(origin, reverse=False):
+        searches.append(origin)
+        return search(origin, reverse)
+
+    pipeline._type_graph.shortest_paths = counting_search
+
+    transform, to_type, cost = pipeline._best_transform_from(str, [int, float])
+    assert cost == 1
+    pipeline._transform(str, int)
+    pipeline._transform(str, float)
+    assert searches == [str]
+
+    transform, from_type, cost = pipeline._best_transform_to(str, [int, float])
+    assert cost == 1
+    pipeline._best_transform_to(str, [float])
+    assert searches == [str, str]
+
+    distances, paths = pipeline._shortest_paths(float)
+    assert distances[int] == 2
+    assert paths[int] == [float, str, int]
+
+    distances, paths = pipeline._shortest_paths(int, reverse=True)
+    assert distances[float] == 2
+    assert paths[float] == [float, str, int]
+
+
+def test_concurrent_plan_construction():
+    import time
+    from threading import Thread, Barrier
+
+    thread_count = 32
+
+    int_source = IntSource()
+    float_store = FloatStore()
+    int_float = IntFloatTransformer()
+    float_int = FloatIntTransformer()
+    string = StringTransformer()
+
+    elements = [float_store, int_source]
+    transformers = {int_float, float_int, string}
+
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline(elements, transformers, compile_plans=False)
+
+    builds = []
+    create_source_handlers = pipeline._create_source_handlers
+    create_sink_handlers = pipeline._create_sink_handlers
+
+    def counting_source_handlers(type):
+        builds.append((DataSource, type))
+        time.sleep(0.05)  # Give the other threads time to pile up on the cold type
+        return create_source_handlers(type)
+
+    def counting_sink_handlers(type, targets):
+        if targets is pipeline._sinks:
+            builds.append((DataSink, type))
+        return create_sink_handlers(type, targets)
+
+    pipeline._create_source_handlers = counting_source_handlers
+    pipeline._create_sink_handlers = counting_sink_handlers
+
+    barrier = Barrier(thread_count)
+    results = []
+
+    def run(value):
+        barrier.wait()
+        results.append(pipeline.get(str, {VALUE_KEY: value}))
+        pipeline.put(str, value)
+
+    values = [str(random.randint(-VALUES_MAX, VALUES_MAX)) for _ in range(thread_count)]
+    threads = [Thread(target=run, args=(value,)) for value in values]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == sorted(values)
+    assert sorted(builds, key=lambda build: build[0].__name__) == [(DataSink, str), (DataSource, str)]
+
+
+class DelayedIntSource(DataSource):
+    def __init__(self, delay: float, offset: int = 0, found: bool = True) -> None:
+        self.delay = delay
+        self.offset = offset
+        self.found = found
+        self.calls = 0
+
+    @DataSource.dispatch
+    def get(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+        pass
+
+    @DataSource.dispatch
+    def get_many(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[T]:
+        pass
+
+    @get.register(int)
+    def get_int(self, query: Mapping[str, Any], context: PipelineContext = None) -> int:
+        import time
+        self.calls += 1
+        time.sleep(self.delay)
+        if not self.found:
+            raise NotFoundError("Not found!")
+        return int(query.get(VALUE_KEY)) + self.offset
+
+
+def test_get_hedged():
+    import time
+    from datapipelines import QueryMode
+
+    float_store = FloatStore()
+    slow = DelayedIntSource(0.5, offset=1)
+    fast = DelayedIntSource(0.0, offset=2)
+
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline([float_store, slow, fast], {IntFloatTransformer()}, query_mode=QueryMode.HEDGED, hedge_delay=0.05)
+
+    start = time.perf_counter()
+    result = pipeline.get(int, {VALUE_KEY: 10})
+    assert time.perf_counter() - start < 0.4
+    assert result == 12
+    assert slow.calls == 1
+    assert fast.calls == 1
+    assert float_store.items == {12.0}
+
+    # A quick source wins before the next one is hedged
+    slow.delay = 0.0
+    result = pipeline.get(int, {VALUE_KEY: 20})
+    assert result == 21
+    assert slow.calls == 2
+    assert fast.calls == 1
+
+    # A miss moves on to the next source without waiting out the hedge delay
+    slow.found = False
+    pipeline = DataPipeline([float_store, slow, fast], {IntFloatTransformer()}, query_mode=QueryMode.HEDGED, hedge_delay=10)
+    start = time.perf_counter()
+    assert pipeline.get(int, {VALUE_KEY: 30}) == 32
+    assert time.perf_counter() - start < 1
+
+    fast.found = False
+    with pytest.raises(NotFoundError):
+        pipeline.get(int, {VALUE_KEY: 40})
+
+
+def test_get_scatter():
+    from concurrent.futures import ThreadPoolExecutor
+    from datapipelines import QueryMode
+
+    float_store = FloatStore()
+    first = DelayedIntSource(0.5, offset=1)
+    second = DelayedIntSource(0.1, offset=2)
+    third = DelayedIntSource(0.0, offset=3, found=False)
+
+    # Every source is queried at once, so the second one wins even though the first one comes before it. The third one misses before the second
+    # one is done, so it always runs.
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline([float_store, first, second, third], {IntFloatTransformer()}, query_mode=QueryMode.SCATTER, executor=ThreadPoolExecutor(3))
+
+    assert pipeline.get(int, {VALUE_KEY: 10}) == 12
+    assert first.calls == second.calls == third.calls == 1
+    assert float_store.items == {12.0}
+
+    second.found = False
+    assert pipeline.get(int, {VALUE_KEY: 20}) == 21
+    assert float_store.items == {12.0, 21.0}
+
+
+def test_concurrent_executor_creation(monkeypatch):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    import datapipelines.pipelines
+    from datapipelines import QueryMode
+
+    executors = []
+
+    class CountingExecutor(ThreadPoolExecutor):
+        def __init__(self, *args, **kwargs) -> None:
+            import time
+            executors.append(self)
+            # Widens the window in which other threads could start their own pool
+            time.sleep(0.05)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(datapipelines.pipelines, "ThreadPoolExecutor", CountingExecutor)
+
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline([DelayedIntSource(0.01), DelayedIntSource(0.0, offset=1)], query_mode=QueryMode.SCATTER)
+    barrier = threading.Barrier(8)
+
+    def get() -> None:
+        barrier.wait()
+        pipeline.get(int, {VALUE_KEY: 1})
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(executors) == 1
+
+    pipeline.close()
+    assert executors[0]._shutdown
+
+
+def test_write_behind():
+    import time
+    from datapipelines import WriteBehindQueue
+
+    class SlowFloatStore(FloatStore):
+        @DataSink.dispatch
+        def put(self, type: Type[T], item: T, context: PipelineContext = None) -> None:
+            pass
+
+        @DataSink.dispatch
+        def put_many(self, type: Type[T], items: Iterable[T], context: PipelineContext = None) -> None:
+            pass
+
+        @put.register(float)
+        def put_float(self, item: float, context: PipelineContext = None) -> None:
+            time.sleep(0.2)
+            self.items.add(item)
+
+        @put_many.register(float)
+        def put_many_float(self, items: Iterable[float], context: PipelineContext = None) -> None:
+            time.sleep(0.2)
+            self.items.update(items)
+
+    float_store = SlowFloatStore()
+    queue = WriteBehindQueue()
+
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline([float_store, IntSource()], {IntFloatTransformer(), FloatIntTransformer(), StringTransformer()}, write_behind=queue)
+
+    start = time.perf_counter()
+    assert pipeline.get(int, {VALUE_KEY: "1"}) == 1
+    assert pipeline.get_many(str, {VALUE_KEY: "2", COUNT_KEY: VALUES_COUNT}) == ["2"] * VALUES_COUNT
+    assert list(pipeline.get_many(int, {VALUE_KEY: "3", COUNT_KEY: 1}, streaming=True)) == [3]
+    assert time.perf_counter() - start < 0.2
+
+    pipeline.flush()
+    assert float_store.items == {1.0, 2.0, 3.0}
+
+    # Explicit puts don't go through the queue
+    pipeline.put(int, 4)
+    assert 4.0 in float_store.items
+
+    # The queue belongs to the caller, so it's flushed but left open
+    pipeline.put(int, 5)
+    pipeline.get(int, {VALUE_KEY: "6"})
+    pipeline.close()
+    assert 6.0 in float_store.items
+    assert not queue.closed
+    queue.close()
+
+
+def test_coalesce():
+    from threading import Thread, Barrier
+
+    thread_count = 32
+
+    source = DelayedIntSource(0.1)
+    float_store = FloatStore()
+
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline([float_store, source], {IntFloatTransformer()}, coalesce=True)
+
+    barrier = Barrier(thread_count)
+    results = []
+    errors = []
+
+    def run(query):
+        barrier.wait()
+        try:
+            results.append(pipeline.get(int, query))
+        except NotFoundError as error:
+            errors.append(error)
+
+    def run_all(queries):
+        threads = [Thread(target=run, args=(query,)) for query in queries]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    run_all([{VALUE_KEY: 10} for _ in range(thread_count)])
+    assert results == [10] * thread_count
+    assert source.calls == 1
+    assert float_store.items == {10.0}
+
+    # Different queries aren't coalesced
+    results.clear()
+    run_all([{VALUE_KEY: value % 2} for value in range(thread_count)])
+    assert sorted(results) == sorted(value % 2 for value in range(thread_count))
+    assert source.calls == 3
+
+    # Misses are shared too
+    source.found = False
+    run_all([{VALUE_KEY: 10} for _ in range(thread_count)])
+    assert len(errors) == thread_count
+    assert source.calls == 4
+
+
+def test_negative_cache():
+    from datapipelines import NegativeCache
+
+    class CountingFloatStore(FloatStore):
+        def __init__(self) -> None:
+            super().__init__()
+            self.calls = 0
+
+        @DataSource.dispatch
+        def get(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+            pass
+
+        @get.register(float)
+        def get_float(self, query: Mapping[str, Any], context: PipelineContext = None) -> float:
+            self.calls += 1
+            return FloatStore.get_float(self, query, context)
+
+    float_store = CountingFloatStore()
+    source = DelayedIntSource(0.0, found=False)
+    negative_cache = NegativeCache()
+
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline([float_store, source], {IntFloatTransformer()}, negative_cache=negative_cache)
+
+    for _ in range(VALUES_COUNT):
+        with pytest.raises(NotFoundError):
+            pipeline.get(float, {VALUE_KEY: 1})
+    assert float_store.calls == 1
+    assert source.calls == 1
+
+    # Putting data into the store forgets its misses, but not the int source's
+    pipeline.put(float, 1.0)
+    assert pipeline.get(float, {VALUE_KEY: 1}) == 1.0
+    assert float_store.calls == 2
+    assert source.calls == 1
+
+    # A result written back into the store forgets the store's miss of that query
+    with pytest.raises(NotFoundError):
+        pipeline.get(float, {VALUE_KEY: 2})
+    assert float_store.calls == 3
+    source.found = True
+    negative_cache.invalidate([source])
+    assert pipeline.get(float, {VALUE_KEY: 2}) == 2.0
+    assert float_store.calls == 3
+    assert source.calls == 3
+    assert pipeline.get(float, {VALUE_KEY: 2}) == 2.0
+    assert float_store.calls == 4
+    assert source.calls == 3
+
+
+def test_negative_cache_write_behind():
+    from threading import Event
+    from datapipelines import NegativeCache, WriteBehindQueue
+
+    class GatedFloatStore(FloatStore):
+        def __init__(self) -> None:
+            super().__init__()
+            self.calls = 0
+            self.gate = Event()
+
+        @DataSource.dispatch
+        def get(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+            pass
+
+        @DataSink.dispatch
+        def put(self, type: Type[T], item: T, context: PipelineContext = None) -> None:
+            pass
+
+        @get.register(float)
+        def get_float(self, query: Mapping[str, Any], context: PipelineContext = None) -> float:
+            self.calls += 1
+            return FloatStore.get_float(self, query, context)
+
+        @put.register(float)
+        def put_float(self, item: float, context: PipelineContext = None) -> None:
+            self.gate.wait()
+            self.items.add(item)
+
+    float_store = GatedFloatStore()
+    source = DelayedIntSource(0.0)
+    queue = WriteBehindQueue()
+
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline([float_store, source], {IntFloatTransformer()}, write_behind=queue, negative_cache=NegativeCache())
+
+    assert pipeline.get(float, {VALUE_KEY: 1}) == 1.0
+    assert float_store.calls == 1
+    assert source.calls == 1
+
+    # The store misses again while the write-back is still queued
+    source.found = False
+    with pytest.raises(NotFoundError):
+        pipeline.get(float, {VALUE_KEY: 1})
+    assert float_store.calls == 2
+    assert source.calls == 2
+
+    # Once the write-back lands, the store's miss is forgotten
+    float_store.gate.set()
+    queue.flush()
+    assert pipeline.get(float, {VALUE_KEY: 1}) == 1.0
+    assert float_store.calls == 3
+    assert source.calls == 2
+    queue.close()
+
+
+def test_negative_cache_composite():
+    from datapipelines import NegativeCache, CompositeDataSource, fingerprint
+
+    float_store = FloatStore()
+    composite_cache = NegativeCache()
+    composite = CompositeDataSource([float_store], composite_cache)
+    negative_cache = NegativeCache()
+
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline([composite, float_store], negative_cache=negative_cache)
+
+    with pytest.raises(NotFoundError):
+        pipeline.get(float, {VALUE_KEY: 1})
+    assert composite_cache.contains(float_store, float, fingerprint({VALUE_KEY: 1}))
+    assert negative_cache.contains(composite, float, fingerprint({VALUE_KEY: 1}))
+
+    # Putting data into a member of the composite forgets the composite's misses as well as the member's
+    pipeline.put(float, 1.0)
+    assert not composite_cache.contains(float_store, float, fingerprint({VALUE_KEY: 1}))
+    assert not negative_cache.contains(composite, float, fingerprint({VALUE_KEY: 1}))
+    assert pipeline.get(float, {VALUE_KEY: 1}) == 1.0
+
+    # Without a pipeline, the composite's misses are forgotten explicitly
+    with pytest.raises(NotFoundError):
+        composite.get(float, {VALUE_KEY: 2})
+    float_store.items.add(2.0)
+    composite.invalidate([float_store])
+    assert composite.get(float, {VALUE_KEY: 2}) == 2.0
+
+
+def test_unfingerprintable_query_logging(caplog):
+    import logging
+    from datapipelines import NegativeCache
+
+    class Unhashable(object):
+        __hash__ = None
+
+        def __init__(self) -> None:
+            self.formatted = 0
+
+        def __repr__(self) -> str:
+            self.formatted += 1
+            return "Unhashable()"
+
+    source = DelayedIntSource(0.0, found=False)
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline([source], negative_cache=NegativeCache())
+
+    # The query is only formatted when the message is actually logged
+    value = Unhashable()
+    with caplog.at_level(logging.WARNING, "datapipelines"):
+        with pytest.raises(NotFoundError):
+            pipeline.get(int, {VALUE_KEY: value})
+    assert value.formatted == 0
+
+    with caplog.at_level(logging.INFO, "datapipelines"):
+        with pytest.raises(NotFoundError):
+            pipeline.get(int, {VALUE_KEY: value})
+    assert value.formatted > 0
+    assert any("can't be fingerprinted" in message for message in caplog.messages)
+
+
+def test_validators():
+    from datapipelines import NegativeCache
+
+    source = DelayedIntSource(0.0, found=False)
+    validator = Query.has(VALUE_KEY).also.can_have(COUNT_KEY).with_default(1)
+
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline([source], negative_cache=NegativeCache(), validators={int: validator})
+
+    with pytest.raises(NotFoundError):
+        pipeline.get(int, {VALUE_KEY: 1})
+    with pytest.raises(NotFoundError):
+        pipeline.get(int, {VALUE_KEY: 1, COUNT_KEY: 1, "ignored": True})
+    assert source.calls == 1
+
+    with pytest.raises(NotFoundError):
+        pipeline.get(int, {VALUE_KEY: 1, COUNT_KEY: 2})
+    assert source.calls == 2
+
+    # Queries the validator rejects aren't cached, but are still sent to the sources
+    with pytest.raises(NotFoundError):
+        pipeline.get(int, {COUNT_KEY: 1})
+    with pytest.raises(NotFoundError):
+        pipeline.get(int, {COUNT_KEY: 1})
+    assert source.calls == 4
+
+
+def test_get_many_transform_many():
+    from datapipelines.pipelines import _transform_many
+
+    class BatchIntFloatTransformer(IntFloatTransformer):
+        def __init__(self) -> None:
+            self.batches = []
+
+        def transform_many(self, target_type: Type[T], values: List[F], context: PipelineContext = None) -> List[T]:
+            self.batches.append(len(values))
+            return super().transform_many(target_type, values, context)
+
+    transformer = BatchIntFloatTransformer()
+    assert _transform_many([(transformer, float), (FloatIntTransformer(), int)], [1, 2, 3]) == [1, 2, 3]
+    assert transformer.batches == [3]
+
+    transformer.batches.clear()
+    float_store = FloatStore()
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline([float_store, IntSource()], {transformer})
+
+    result = pipeline.get_many(float, {VALUE_KEY: 1, COUNT_KEY: VALUES_COUNT})
+    assert result == [1.0] * VALUES_COUNT
+    # The whole batch is converted at once, and the converted batch is also what the float store receives
+    assert transformer.batches == [VALUES_COUNT]
+    assert float_store.items == {1.0}
+
+    pipeline.put_many(int, [2, 3])
+    assert transformer.batches[-1] == 2
+    assert float_store.items == {1.0, 2.0, 3.0}
+
+
+def test_compiled_chain(monkeypatch):
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline([FloatStore(), IntSource()], {IntFloatTransformer(), FloatIntTransformer(), StringTransformer()})
+    int_to_float, _ = pipeline._transform(int, float)
+    float_to_int, _ = pipeline._transform(float, int)
+
+    def dispatched(*args, **kwargs):
+        raise AssertionError("Compiled chains shouldn't dispatch")
+
+    # The implementations were resolved when the chains were compiled, so the dispatching wrappers aren't used
+    monkeypatch.setattr(IntFloatTransformer, "transform", dispatched)
+    monkeypatch.setattr(StringTransformer, "transform", dispatched)
+
+    assert int_to_float(data=1) == 1.0
+    assert type(int_to_float(data=1)) is float
+    assert float_to_int(data=2.0) == 2
+    assert type(float_to_int(data=2.0)) is int
+    assert float_to_int.many(data=[1.0, 2.0]) == [1, 2]
+
+
+def test_sources_cant_change_queries():
+    class MutatingSource(DataSource):
+        @DataSource.dispatch
+        def get(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+            pass
+
+        @DataSource.dispatch
+        def get_many(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[T]:
+            pass
+
+        @get.register(int)
+        def get_int(self, query: Mapping[str, Any], context: PipelineContext = None) -> int:
+            # Sources are handed real dicts, which they can type check and JSON encode
+            assert type(query) is dict
+            assert json.loads(json.dumps(query)) == query
+            query[VALUE_KEY] = "not a number"
+            raise NotFoundError()
+
+        @get_many.register(int)
+        def get_many_int(self, query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[int]:
+            query["values"].clear()
+            del query[VALUE_KEY]
+            raise NotFoundError()
+
+    pipeline = DataPipeline([MutatingSource(), IntSource()])
+
+    query = {VALUE_KEY: 1}
+    assert pipeline.get(int, query) == 1
+    assert query == {VALUE_KEY: 1}
+
+    query = {VALUE_KEY: 2, COUNT_KEY: 2, "values": [1, 2]}
+    assert pipeline.get_many(int, query) == [2, 2]
+    assert query == {VALUE_KEY: 2, COUNT_KEY: 2, "values": [1, 2]}
+
+
+class BulkIntSource(DataSource):
+    VALUES_KEY = "values"
+
+    def __init__(self, values: Iterable[int]) -> None:
+        self.values = set(values)
+        self.queries = []
+
+    def combine(self, type: Type[T], queries: List[Mapping[str, Any]]) -> Mapping[str, Any]:
+        if type is not int:
+            return None
+        return {BulkIntSource.VALUES_KEY: [query[VALUE_KEY] for query in queries]}
+
+    @DataSource.dispatch
+    def get(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+        pass
+
+    @DataSource.dispatch
+    def get_many(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[T]:
+        pass
+
+    @get.register(int)
+    def get_int(self, query: Mapping[str, Any], context: PipelineContext = None) -> int:
+        self.queries.append(query)
+        if query[VALUE_KEY] not in self.values:
+            raise NotFoundError()
+        return query[VALUE_KEY]
+
+    @get_many.register(int)
+    def get_many_int(self, query: Mapping[str, Any], context: PipelineContext = None) -> Iterable[int]:
+        from datapipelines import PartialResult
+
+        self.queries.append(query)
+        values = query[BulkIntSource.VALUES_KEY]
+        items = [value if value in self.values else PartialResult.MISSING for value in values]
+        if PartialResult.MISSING in items:
+            raise PartialResult(items, {BulkIntSource.VALUES_KEY: [value for value in values if value not in self.values]})
+        return items
+
+
+def test_get_bulk():
+    from datapipelines import PartialResult
+
+    class CountingStore(FloatStore):
+        def __init__(self) -> None:
+            super().__init__()
+            self.puts = 0
+
+        @DataSink.dispatch
+        def put_many(self, type: Type[T], items: Iterable[float], context: PipelineContext = None) -> None:
+            pass
+
+        @put_many.register(float)
+        def put_many_float(self, items: Iterable[float], context: PipelineContext = None) -> None:
+            self.puts += 1
+            self.items.update(items)
+
+    store = CountingStore()
+    source = BulkIntSource(range(10))
+    pipeline = DataPipeline([store, source], [IntFloatTransformer()])
+
+    assert pipeline.get_bulk(float, [{VALUE_KEY: value} for value in [3, 1, 2]]) == [3.0, 1.0, 2.0]
+    assert source.queries == [{BulkIntSource.VALUES_KEY: [3, 1, 2]}]
+    assert store.items == {1.0, 2.0, 3.0}
+    assert store.puts == 1
+
+    # Later sources are only sent what the earlier ones didn't find
+    del source.queries[:]
+    assert pipeline.get_bulk(float, [{VALUE_KEY: value} for value in [1, 4, 2, 5]]) == [1.0, 4.0, 2.0, 5.0]
+    assert source.queries == [{BulkIntSource.VALUES_KEY: [4, 5]}]
+    assert store.items == {1.0, 2.0, 3.0, 4.0, 5.0}
+    assert store.puts == 2
+
+    with pytest.raises(PartialResult) as partial:
+        pipeline.get_bulk(float, [{VALUE_KEY: 20}, {VALUE_KEY: 1}, {VALUE_KEY: 30}])
+    assert partial.value.items == [PartialResult.MISSING, 1.0, PartialResult.MISSING]
+    assert partial.value.residual == [{VALUE_KEY: 20}, {VALUE_KEY: 30}]
+
+    with pytest.raises(NotFoundError) as error:
+        pipeline.get_bulk(float, [{VALUE_KEY: 20}])
+    assert not isinstance(error.value, PartialResult)
+    assert pipeline.get_bulk(float, []) == []
+
+    # Sources which can't combine queries are sent them one at a time
+    source = BulkIntSource(range(10))
+    pipeline = DataPipeline([source])
+    source.combine = lambda type, queries: None
+    assert pipeline.get_bulk(int, [{VALUE_KEY: 1}, {VALUE_KEY: 2}]) == [1, 2]
+    assert source.queries == [{VALUE_KEY: 1}, {VALUE_KEY: 2}]
+
+
+def test_batching():
+    from concurrent.futures import ThreadPoolExecutor
+    from datapipelines import BatchWindow
+
+    source = BulkIntSource(range(10))
+    pipeline = DataPipeline([source], batching={int: BatchWindow(delay=5.0, max_size=4)})
+
+    def get(value: int) -> Any:
+        try:
+            return pipeline.get(int, {VALUE_KEY: value})
+        except NotFoundError as error:
+            return error
+
+    # A full batch is fetched right away, with a single call to the source
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(get, [1, 2, 20, 3]))
+    assert results[:2] == [1, 2] and results[3] == 3
+    assert isinstance(results[2], NotFoundError)
+    assert len(source.queries) == 1
+    assert sorted(source.queries[0][BulkIntSource.VALUES_KEY]) == [1, 2, 3, 20]
+
+    # A batch which doesn't fill up is fetched once its window closes
+    pipeline = DataPipeline([source], batching={int: BatchWindow(delay=0.01)})
+    assert pipeline.get(int, {VALUE_KEY: 5}) == 5
+    assert source.queries[-1] == {BulkIntSource.VALUES_KEY: [5]}
+
+    with pytest.raises(ValueError):
+        BatchWindow(max_size=0)
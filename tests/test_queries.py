@@ -1,6 +1,6 @@
 import pytest
 
-from datapipelines import Query, QueryValidationError, QueryValidatorStructureError, validate_query
+from datapipelines import Query, QueryValidationError, QueryValidatorStructureError, validate_query, fingerprint, FrozenQuery
 
 
 def test_has():
@@ -530,3 +530,182 @@ def test_validate_decorator():
         get(None, {"test1": "one"})
 
     assert get(None, {"test0": "1"}) == 1
+
+
+def test_fingerprint():
+    query = {"a": 1, "b": [1, 2, {"c": {3, 4}}], "d": ("x", "y")}
+    same = {"d": ("x", "y"), "b": [1, 2, {"c": {4, 3}}], "a": 1}
+
+    assert hash(fingerprint(query)) == hash(fingerprint(same))
+    assert fingerprint(query) == fingerprint(same)
+    assert fingerprint(Query(query)) == fingerprint(query)
+
+    assert fingerprint({"a": 1}) != fingerprint({"a": 2})
+    assert fingerprint({"a": [1, 2]}) != fingerprint({"a": [2, 1]})
+    assert fingerprint({"a": 1}) != fingerprint({"b": 1})
+
+    # Containers and values of different types don't collide, even when they're equal
+    assert fingerprint({"a": {"b": 1}}) != fingerprint({"a": {("b", 1)}})
+    assert fingerprint({"a": {"b": 1}}) != fingerprint({"a": frozenset({("b", 1)})})
+    assert fingerprint({"a": True}) != fingerprint({"a": 1})
+    assert fingerprint({"a": 1.0}) != fingerprint({"a": 1})
+    assert fingerprint({"a": [1]}) != fingerprint({"a": {1}})
+    assert fingerprint({"a": (1,)}) == fingerprint({"a": [1]})
+
+    with pytest.raises(TypeError):
+        fingerprint({"a": bytearray(b"unhashable")})
+
+
+def test_validator_keys():
+    valid = Query.has("a").as_(int).or_("b").also.can_have("c").and_("d").also.can_have("e").with_default(0)
+    assert valid.keys == {"a", "b", "c", "d", "e"}
+
+    valid.also.has("f")
+    assert valid.keys == {"a", "b", "c", "d", "e", "f"}
+
+
+def test_fingerprint_validator():
+    from enum import Enum
+
+    class Color(Enum):
+        red = "red"
+        blue = "blue"
+
+    valid = Query.has("id").as_(int).also.can_have("color").with_default(Color.red).also.can_have("limit").with_default(10)
+
+    query = {"id": 1}
+    assert fingerprint(query, valid) == fingerprint({"id": 1, "color": Color.red, "limit": 10}, valid)
+    assert fingerprint(query, valid) == fingerprint({"id": 1, "color": "red"}, valid)
+    assert fingerprint(query, valid) == fingerprint({"id": 1, "ignored": "key"}, valid)
+    assert fingerprint(query, valid) != fingerprint({"id": 1, "color": "blue"}, valid)
+    assert fingerprint(query, valid) != fingerprint({"id": 2}, valid)
+
+    # The query itself isn't modified
+    assert query == {"id": 1}
+
+    with pytest.raises(QueryValidationError):
+        fingerprint({"color": "red"}, valid)
+
+
+def test_frozen_query():
+    query = {"ids": [1, 2], "name": "a"}
+    frozen = FrozenQuery(query)
+    query["ids"].append(3)
+    query["name"] = "b"
+
+    assert frozen == {"ids": [1, 2, 3], "name": "a"}
+    frozen["ids"].append(4)
+    assert frozen["ids"] == [1, 2, 3]
+    with pytest.raises(TypeError):
+        frozen["name"] = "c"
+
+    assert frozen == FrozenQuery({"name": "a", "ids": [1, 2, 3]})
+    assert hash(frozen) == hash(FrozenQuery({"name": "a", "ids": [1, 2, 3]}))
+    assert fingerprint(frozen) == fingerprint({"name": "a", "ids": [1, 2, 3]})
+    assert len({frozen: 1, FrozenQuery(frozen): 2}) == 1
+
+    with pytest.raises(TypeError):
+        hash(FrozenQuery({"ids": [bytearray()]}))
+
+
+def test_compiled_validator():
+    import random
+    from enum import Enum
+    from typing import List
+
+    class Color(Enum):
+        red = "red"
+        blue = "blue"
+
+    def outcome(validate, query):
+        query = dict(query)
+        try:
+            return validate(query), query
+        except Exception as error:
+            return error.__class__, str(error)
+
+    keys = ["a", "b", "c", "d"]
+    values = [None, 1, "1", "red", "green", 1.5, [1], Color.blue]
+    generator = random.Random(0)
+    for _ in range(300):
+        validator = Query.has(keys[0]) if generator.random() < 0.5 else Query.can_have(keys[0])
+        for key in keys[1:]:
+            step = generator.choice(["also", "or", "and", "as"])
+            if step == "as":
+                validator = validator.as_any_of(generator.sample([int, str, Color, List[int]], 2))
+                step = generator.choice(["also", "or", "and"])
+            if step == "also":
+                validator = validator.also.has(key) if generator.random() < 0.5 else validator.also.can_have(key)
+            elif step == "or":
+                validator = validator.or_(key)
+            else:
+                validator = validator.and_(key)
+        validator.compile()
+
+        for _ in range(10):
+            query = {key: generator.choice(values) for key in keys if generator.random() < 0.6}
+            assert outcome(validator, query) == outcome(validator._root.evaluate, query)
+
+    # Changing a validator recompiles it
+    valid = Query.can_have("a").as_(int)
+    assert valid({"a": 1})
+    valid.also.has("b")
+    with pytest.raises(QueryValidationError):
+        valid({"a": 1})
+
+
+def test_validate_many():
+    import random
+
+    valid = Query.has("a").as_(int).also.can_have("b").with_default(2).also.has("c").or_("d")
+    queries = [{"a": 1, "c": 1}, {"a": "1", "c": 1}, {"c": 1}, {"a": 1, "d": 1, "b": 3}, {"a": 2, "c": 2}]
+    errors = valid.validate_many(queries)
+    assert sorted(errors) == [1, 2]
+    assert all(isinstance(error, QueryValidationError) for error in errors.values())
+    assert queries[0] == {"a": 1, "b": 2, "c": 1}
+    assert queries[3] == {"a": 1, "b": 3, "d": 1}
+    assert queries[4] == {"a": 2, "b": 2, "c": 2}
+
+    def to_int(query):
+        query["a"] = int(query["a"])
+
+    queries = [{"a": "1", "c": 1}, {"a": "x", "c": 1}]
+    errors = valid.validate_many(queries, pre_transforms=[to_int])
+    assert list(errors) == [1]
+    assert queries[0] == {"a": 1, "b": 2, "c": 1}
+
+    # Validating a batch does the same as validating each query
+    keys = ["a", "b", "c", "d"]
+    values = [1, "1", 1.5]
+    generator = random.Random(0)
+    for _ in range(200):
+        required = generator.random() < 0.5
+        validator = Query.has(keys[0]) if required else Query.can_have(keys[0])
+        for key in keys[1:]:
+            step = generator.choice(["also", "or", "and", "as", "default"])
+            if step == "as":
+                validator = validator.as_any_of(generator.sample([int, str, float], 2))
+                step = generator.choice(["also", "or", "and"])
+            elif step == "default":
+                if not required:
+                    validator = validator.with_default(0)
+                step = "also"
+            if step == "also":
+                required = generator.random() < 0.5
+                validator = validator.also.has(key) if required else validator.also.can_have(key)
+            elif step == "or":
+                validator = validator.or_(key)
+            else:
+                validator = validator.and_(key)
+
+        queries = [{key: generator.choice(values) for key in keys if generator.random() < 0.6} for _ in range(20)]
+        expected_queries = [dict(query) for query in queries]
+        expected = {}
+        for index, query in enumerate(expected_queries):
+            try:
+                validator(query)
+            except QueryValidationError as error:
+                expected[index] = (error.__class__, str(error))
+        errors = validator.validate_many(queries)
+        assert {index: (error.__class__, str(error)) for index, error in errors.items()} == expected
+        assert queries == expected_queries
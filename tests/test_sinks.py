@@ -3,7 +3,7 @@ from typing import Type, TypeVar, Iterable
 
 import pytest
 
-from datapipelines import DataSink, CompositeDataSink, PipelineContext
+from datapipelines import DataSink, CompositeDataSink, BufferedDataSink, PipelineContext, TYPE_WILDCARD
 
 #######################################
 # Create simple DataSinks for testing #
@@ -331,3 +331,184 @@ def test_composite_put_many_unsupported():
 
     with pytest.raises(UnsupportedError):
         sink.put_many(bytes, (bytes() for _ in range(VALUES_COUNT)))
+
+
+class CountingIntFloatDataSink(IntFloatDataSink):
+    def __init__(self) -> None:
+        super().__init__()
+        self.put_many_calls = 0
+
+    @DataSink.dispatch
+    def put(self, type: Type[T], item: T, context: PipelineContext = None) -> None:
+        pass
+
+    @DataSink.dispatch
+    def put_many(self, type: Type[T], items: Iterable[T], context: PipelineContext = None) -> None:
+        pass
+
+    @put.register(int)
+    def put_int(self, item: int, context: PipelineContext = None) -> None:
+        raise AssertionError("Buffered sinks should only receive put_many calls")
+
+    @put_many.register(int)
+    def put_many_int(self, items: Iterable[int], context: PipelineContext = None) -> None:
+        self.put_many_calls += 1
+        self.items[int].update(items)
+
+    @put_many.register(float)
+    def put_many_float(self, items: Iterable[float], context: PipelineContext = None) -> None:
+        self.put_many_calls += 1
+        self.items[float].update(items)
+
+
+def test_buffered_accepts():
+    int_float = IntFloatDataSink()
+    assert BufferedDataSink(int_float).accepts == int_float.accepts
+
+    wildcard = SimpleWildcardDataSink()
+    assert BufferedDataSink(wildcard).accepts is TYPE_WILDCARD
+
+
+def test_buffered_put_size():
+    sink = CountingIntFloatDataSink()
+    buffered = BufferedDataSink(sink, max_size=10)
+
+    for value in range(VALUES_COUNT + 5):
+        buffered.put(int, value)
+
+    assert sink.put_many_calls == VALUES_COUNT // 10
+    assert sink.items[int] == set(range(VALUES_COUNT))
+
+    buffered.put_many(float, [1.0, 2.0])
+    assert sink.items[float] == set()
+
+    buffered.flush(int)
+    assert sink.items[int] == set(range(VALUES_COUNT + 5))
+    assert sink.items[float] == set()
+
+    buffered.close()
+    assert sink.items[float] == {1.0, 2.0}
+    assert sink.put_many_calls == VALUES_COUNT // 10 + 2
+
+
+def test_buffered_put_age():
+    import time
+
+    sink = CountingIntFloatDataSink()
+    buffered = BufferedDataSink(sink, max_size=VALUES_COUNT, max_age=0.05)
+
+    buffered.put(int, 1)
+    buffered.put(int, 2)
+    assert sink.items[int] == set()
+
+    time.sleep(0.2)
+    assert sink.items[int] == {1, 2}
+    assert sink.put_many_calls == 1
+
+
+def test_buffered_put_expirations():
+    from datapipelines import MemoryCache, PipelineContext
+
+    cache = MemoryCache({int: lambda item: {"value": item}})
+    buffered = BufferedDataSink(cache, max_size=VALUES_COUNT)
+
+    # Each item is written with the expiration it was put with, rather than the last one's
+    buffered.put(int, 1, PipelineContext({PipelineContext.Keys.EXPIRATION: 0}))
+    buffered.put(int, 2, PipelineContext({PipelineContext.Keys.EXPIRATION: 60}))
+    buffered.put(int, 3, PipelineContext({PipelineContext.Keys.EXPIRATION: 0}))
+    buffered.flush()
+    assert len(cache) == 1
+    assert cache.get(int, {"value": 2}) == 2
+
+
+class PutOnlyDataSink(DataSink):
+    def __init__(self, failures: int = 0) -> None:
+        self.items = []
+        self.failures = failures
+
+    @DataSink.dispatch
+    def put(self, type: Type[T], item: T, context: PipelineContext = None) -> None:
+        pass
+
+    @DataSink.dispatch
+    def put_many(self, type: Type[T], items: Iterable[T], context: PipelineContext = None) -> None:
+        pass
+
+    @put.register(int)
+    def put_int(self, item: int, context: PipelineContext = None) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("Can't store anything yet!")
+        self.items.append(item)
+
+
+def test_buffered_put_only():
+    sink = PutOnlyDataSink()
+    buffered = BufferedDataSink(sink, max_size=3)
+
+    # A type the wrapped sink only registers for put is written item by item
+    for value in range(5):
+        buffered.put(int, value)
+    assert sink.items == [0, 1, 2]
+    buffered.flush()
+    assert sink.items == [0, 1, 2, 3, 4]
+
+
+def test_buffered_put_failure():
+    sink = PutOnlyDataSink(failures=1)
+    buffered = BufferedDataSink(sink, max_size=2)
+
+    # A failed write keeps its items, which are written with the buffer's next write
+    buffered.put(int, 1)
+    with pytest.raises(RuntimeError):
+        buffered.put(int, 2)
+    assert sink.items == []
+
+    buffered.put(int, 3)
+    assert sink.items == [1, 2, 3]
+
+
+def test_buffered_put_age_failure(caplog):
+    import time
+
+    sink = PutOnlyDataSink(failures=1)
+    buffered = BufferedDataSink(sink, max_size=VALUES_COUNT, max_age=0.05)
+
+    # A write triggered by the timer is logged when it fails, and its items stay buffered
+    buffered.put(int, 1)
+    time.sleep(0.2)
+    assert sink.items == []
+    assert any("failed" in message for message in caplog.messages)
+
+    buffered.flush()
+    assert sink.items == [1]
+
+
+def test_buffered_put_unsupported():
+    from datapipelines import UnsupportedError
+
+    buffered = BufferedDataSink(IntFloatDataSink())
+
+    with pytest.raises(UnsupportedError):
+        buffered.put(str, "test")
+
+    with pytest.raises(UnsupportedError):
+        buffered.put_many(str, ["test"])
+
+
+def test_buffered_pipeline():
+    from datapipelines import DataPipeline
+
+    from .test_pipelines import IntSource, VALUE_KEY
+
+    sink = CountingIntFloatDataSink()
+    buffered = BufferedDataSink(sink, max_size=10)
+
+    # noinspection PyTypeChecker
+    pipeline = DataPipeline([buffered, IntSource()])
+
+    for value in range(VALUES_COUNT):
+        assert pipeline.get(int, {VALUE_KEY: value}) == value
+
+    assert sink.put_many_calls == VALUES_COUNT // 10
+    assert sink.items[int] == set(range(VALUES_COUNT))
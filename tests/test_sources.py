@@ -380,3 +380,35 @@ def test_composite_get_many_unsupported():
 
     with pytest.raises(UnsupportedError):
         source.get_many(bytes, query)
+
+
+def test_composite_get_negative_cache():
+    from datapipelines import NegativeCache
+
+    class CountingIntDataSource(IntFloatDataSource):
+        def __init__(self) -> None:
+            self.calls = 0
+
+        def get(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+            self.calls += 1
+            return super().get(type, query, context)
+
+    missing = CountingIntDataSource()
+    negative_cache = NegativeCache()
+    source = CompositeDataSource([missing, StringDataSource()], negative_cache)
+
+    # "cat" can't be cast to an int, so only the first lookup asks the int source
+    assert source.get(str, {VALUE_KEY: "cat"}) == "cat"
+    for _ in range(VALUES_COUNT):
+        with pytest.raises(NotFoundError):
+            source.get(int, {VALUE_KEY: "cat"})
+    assert missing.calls == 1
+    assert len(negative_cache) == 1
+
+    assert source.get(int, {VALUE_KEY: "1"}) == 1
+    assert missing.calls == 2
+
+    negative_cache.clear()
+    with pytest.raises(NotFoundError):
+        source.get(int, {VALUE_KEY: "cat"})
+    assert missing.calls == 3
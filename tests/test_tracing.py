@@ -0,0 +1,88 @@
+import logging
+
+import pytest
+
+from datapipelines import DataPipeline, NotFoundError, Event, EventType, Tracer, LoggingSubscriber
+
+from .test_pipelines import IntSource, FloatStore, IntFloatTransformer, VALUE_KEY, COUNT_KEY
+
+
+def test_tracer():
+    tracer = Tracer()
+    assert not tracer.active
+
+    events = []
+    tracer.subscribe(events.append)
+    assert tracer.active
+    tracer.emit(EventType.SINK_PUT, sink="sink", data_type=int, value=1, many=False)
+    assert len(events) == 1
+    assert events[0].type is EventType.SINK_PUT
+    assert events[0].value == 1
+    assert str(events[0]) == "Put \"1\" into sink \"sink\""
+    with pytest.raises(AttributeError):
+        events[0].result
+
+    # A failing subscriber doesn't stop the others
+    def fail(event: Event) -> None:
+        raise RuntimeError()
+
+    tracer.unsubscribe(events.append)
+    tracer.subscribe(fail)
+    tracer.subscribe(events.append)
+    tracer.emit(EventType.SINK_PUT, sink="sink", data_type=int, value=2, many=False)
+    assert len(events) == 2
+
+    tracer.unsubscribe(fail)
+    tracer.unsubscribe(events.append)
+    assert not tracer.active
+    with pytest.raises(ValueError):
+        tracer.unsubscribe(fail)
+
+
+def test_pipeline_events():
+    events = []
+    store = FloatStore()
+    pipeline = DataPipeline([store, IntSource()], [IntFloatTransformer()], subscribers=[events.append])
+
+    assert pipeline.get(float, {VALUE_KEY: 1}) == 1.0
+    assert [event.type for event in events] == [EventType.GET_START, EventType.SOURCE_MISS, EventType.SOURCE_HIT, EventType.TRANSFORM, EventType.SINK_PUT, EventType.GET_END]
+    miss, hit, transform, put, end = events[1:]
+    assert miss.source is store
+    assert isinstance(miss.error, NotFoundError)
+    assert hit.data_type is int and hit.result == 1
+    assert transform.value == 1 and transform.result == 1.0
+    assert put.sink is store and put.value == 1.0
+    assert end.result == 1.0 and end.elapsed >= 0
+
+    del events[:]
+    assert pipeline.get_many(float, {VALUE_KEY: 2, COUNT_KEY: 3}) == [2.0, 2.0, 2.0]
+    assert all(event.many for event in events)
+    assert events[-1].type is EventType.GET_END
+
+    del events[:]
+    with pytest.raises(NotFoundError):
+        pipeline.get(float, {VALUE_KEY: "a"})
+    assert isinstance(events[-1].error, NotFoundError)
+
+    del events[:]
+    pipeline.unsubscribe(events.append)
+    pipeline.get(float, {VALUE_KEY: 3})
+    pipeline.put(float, 4.0)
+    assert events == []
+
+
+def test_logging_subscriber(caplog):
+    class Unprintable(object):
+        def __str__(self) -> str:
+            raise AssertionError("Formatted an event nobody logs")
+
+    logger = logging.getLogger("datapipelines.test_tracing")
+    tracer = Tracer([LoggingSubscriber(logger, logging.DEBUG)])
+
+    with caplog.at_level(logging.INFO, logger.name):
+        tracer.emit(EventType.SINK_PUT, sink="sink", data_type=object, value=Unprintable(), many=False)
+    assert not caplog.records
+
+    with caplog.at_level(logging.DEBUG, logger.name):
+        tracer.emit(EventType.SINK_PUT, sink="sink", data_type=int, value=1, many=False)
+    assert caplog.messages == ["Put \"1\" into sink \"sink\""]
@@ -1,4 +1,4 @@
-from typing import Type, TypeVar
+from typing import Type, TypeVar, List
 
 import pytest
 
@@ -54,6 +54,32 @@ class FloatIntTransformer(DataTransformer):
         return int(value)
 
 
+class BatchTransformer(DataTransformer):
+    def __init__(self) -> None:
+        self.batches = 0
+
+    @DataTransformer.dispatch
+    def transform(self, target_type: Type[T], value: F, context: PipelineContext = None) -> T:
+        pass
+
+    @DataTransformer.dispatch_many
+    def transform_many(self, target_type: Type[T], values: List[F], context: PipelineContext = None) -> List[T]:
+        pass
+
+    @transform.register(int, float)
+    def int_to_float(self, value: int, context: PipelineContext = None) -> float:
+        return float(value)
+
+    @transform.register(float, int)
+    def float_to_int(self, value: float, context: PipelineContext = None) -> int:
+        return int(value)
+
+    @transform_many.register(int, float)
+    def int_to_float_many(self, values: List[int], context: PipelineContext = None) -> List[float]:
+        self.batches += 1
+        return [float(value) for value in values]
+
+
 ########################
 # Unsupported Function #
 ########################
@@ -141,3 +167,65 @@ def test_composite_transform_unsupported():
     value = 0
     with pytest.raises(UnsupportedError):
         transformer.transform(str, value)
+
+
+def test_transform_many():
+    transformer = IntFloatTransformer()
+    assert transformer.transform_many(float, [0, 1, 2]) == [0.0, 1.0, 2.0]
+    assert all(type(value) is float for value in transformer.transform_many(float, [0, 1, 2]))
+    assert transformer.transform_many(float, []) == []
+
+
+def test_transform_many_dispatch():
+    transformer = BatchTransformer()
+    assert transformer.transforms == {int: {float}, float: {int}}
+
+    assert transformer.transform_many(float, [0, 1, 2]) == [0.0, 1.0, 2.0]
+    assert transformer.batches == 1
+
+    # Conversions without a batch implementation are transformed one at a time
+    result = transformer.transform_many(int, [0.0, 1.0])
+    assert result == [0, 1]
+    assert all(type(value) is int for value in result)
+    assert transformer.batches == 1
+
+
+def test_composite_transform_many():
+    from datapipelines import UnsupportedError
+    batch = BatchTransformer()
+    transformer = CompositeDataTransformer({batch, FloatIntTransformer()})
+
+    assert transformer.transform_many(float, [0, 1]) == [0.0, 1.0]
+    assert batch.batches == 1
+    assert transformer.transform_many(int, [0.0, 1.0]) == [0, 1]
+    assert transformer.transform_many(int, []) == []
+
+    with pytest.raises(UnsupportedError):
+        transformer.transform_many(str, [0])
+
+
+def test_resolve():
+    from datapipelines import UnsupportedError
+    transformer = SimpleDataTransformer()
+
+    int_to_float = transformer.resolve(int, float)
+    assert type(int_to_float(1)) is float
+    assert int_to_float(1, PipelineContext()) == 1.0
+
+    with pytest.raises(UnsupportedError):
+        transformer.resolve(int, str)(1)
+
+    assert transformer.resolve_many(str, int)(["1", "2"]) == [1, 2]
+
+    batch = BatchTransformer()
+    assert batch.resolve_many(int, float)([1, 2]) == [1.0, 2.0]
+    assert batch.batches == 1
+    assert batch.resolve_many(float, int)([1.0]) == [1]
+    assert batch.batches == 1
+
+    composite = CompositeDataTransformer({batch, FloatIntTransformer()})
+    assert composite.resolve(float, int)(1.0) == 1
+    assert composite.resolve_many(int, float)([1]) == [1.0]
+    assert batch.batches == 2
+    with pytest.raises(UnsupportedError):
+        composite.resolve(str, int)("1")
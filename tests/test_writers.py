@@ -0,0 +1,172 @@
+import time
+from threading import Event
+from typing import Any, Iterable, List
+
+import pytest
+
+from datapipelines import WriteBehindQueue, OverflowPolicy, PipelineContext
+
+VALUES_COUNT = 100
+
+
+class RecordingSink(object):
+    def __init__(self, gate: Event = None, delay: float = 0.0) -> None:
+        self.gate = gate
+        self.delay = delay
+        self.puts = []  # type: List[Any]
+        self.put_manys = []  # type: List[List[Any]]
+
+    def _wait(self) -> None:
+        if self.gate is not None:
+            self.gate.wait()
+        time.sleep(self.delay)
+
+    @property
+    def items(self) -> List[Any]:
+        return self.puts + [item for items in self.put_manys for item in items]
+
+    def put(self, item: Any, context: PipelineContext = None) -> None:
+        self._wait()
+        self.puts.append(item)
+
+    def put_many(self, items: Iterable[Any], context: PipelineContext = None) -> None:
+        self._wait()
+        self.put_manys.append(list(items))
+
+
+class FailingSink(object):
+    def put(self, item: Any, context: PipelineContext = None) -> None:
+        raise RuntimeError("Can't store anything!")
+
+    def put_many(self, items: Iterable[Any], context: PipelineContext = None) -> None:
+        raise RuntimeError("Can't store anything!")
+
+
+def test_put_and_flush():
+    queue = WriteBehindQueue(workers=2)
+    sink = RecordingSink(delay=0.001)
+
+    for value in range(VALUES_COUNT):
+        queue.put(sink, value)
+    queue.put_many(sink, (value for value in range(VALUES_COUNT, 2 * VALUES_COUNT)))
+
+    queue.flush()
+    assert sorted(sink.items) == list(range(2 * VALUES_COUNT))
+    queue.close()
+
+
+def wait_for_worker(queue: WriteBehindQueue) -> None:
+    # Waits until a worker has taken the queued write, which leaves room for exactly one more
+    while not queue._queue.empty():
+        time.sleep(0.001)
+
+
+def test_drop():
+    gate = Event()
+    queue = WriteBehindQueue(max_size=1, overflow=OverflowPolicy.DROP)
+    sink = RecordingSink(gate)
+
+    queue.put(sink, 0)
+    wait_for_worker(queue)
+    for value in range(1, VALUES_COUNT):
+        queue.put(sink, value)
+
+    # One write is being carried out and one is waiting in the queue
+    assert queue.dropped == VALUES_COUNT - 2
+    gate.set()
+    queue.close()
+    assert len(sink.items) == VALUES_COUNT - queue.dropped
+
+
+def test_coalesce():
+    gate = Event()
+    queue = WriteBehindQueue(max_size=1, overflow=OverflowPolicy.COALESCE)
+    sink = RecordingSink(gate)
+
+    queue.put(sink, 0)
+    wait_for_worker(queue)
+    for value in range(1, VALUES_COUNT):
+        queue.put(sink, value)
+    queue.put_many(sink, [VALUES_COUNT, VALUES_COUNT + 1])
+
+    gate.set()
+    queue.flush()
+    assert queue.dropped == 0
+    assert sorted(sink.items) == list(range(VALUES_COUNT + 2))
+    # Everything after the first two writes overflowed and was written in a single batch
+    assert sink.puts == [0, 1]
+    assert sink.put_manys == [list(range(2, VALUES_COUNT + 2))]
+    queue.close()
+
+
+def test_coalesce_expirations():
+    class ContextRecordingSink(RecordingSink):
+        def __init__(self, gate: Event = None) -> None:
+            super().__init__(gate)
+            self.contexts = []  # type: List[PipelineContext]
+
+        def put_many(self, items: Iterable[Any], context: PipelineContext = None) -> None:
+            super().put_many(items, context)
+            self.contexts.append(context)
+
+    gate = Event()
+    queue = WriteBehindQueue(max_size=1, overflow=OverflowPolicy.COALESCE)
+    sink = ContextRecordingSink(gate)
+    short = PipelineContext({PipelineContext.Keys.EXPIRATION: 1})
+    long = PipelineContext({PipelineContext.Keys.EXPIRATION: 60})
+
+    queue.put(sink, 0)
+    wait_for_worker(queue)
+    queue.put(sink, 1)
+    for value in range(2, 6):
+        queue.put(sink, value, short if value % 2 else long)
+
+    gate.set()
+    queue.flush()
+    # The overflow was coalesced per expiration
+    assert sorted(sink.put_manys) == [[2, 4], [3, 5]]
+    assert {tuple(items): context for items, context in zip(sink.put_manys, sink.contexts)} == {(2, 4): long, (3, 5): short}
+    queue.close()
+
+
+def test_errors():
+    queue = WriteBehindQueue()
+    queue.put(FailingSink(), 1)
+    queue.put_many(FailingSink(), [1, 2])
+    queue.flush()
+    assert queue.errors == 2
+    queue.close()
+
+    # Workers failing at the same time all get counted
+    queue = WriteBehindQueue(workers=4)
+    for value in range(VALUES_COUNT):
+        queue.put(FailingSink(), value)
+    queue.flush()
+    assert queue.errors == VALUES_COUNT
+    queue.close()
+
+
+def test_close():
+    queue = WriteBehindQueue()
+    sink = RecordingSink(delay=0.01)
+    for value in range(10):
+        queue.put(sink, value)
+
+    queue.close()
+    assert queue.closed
+    assert sorted(sink.items) == list(range(10))
+
+    # Writes after closing happen immediately
+    queue.put(sink, 10)
+    assert 10 in sink.items
+
+    with pytest.raises(RuntimeError):
+        queue.put(FailingSink(), 1)
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        WriteBehindQueue(max_size=0)
+
+    with pytest.raises(ValueError):
+        WriteBehindQueue(workers=0)